@@ -0,0 +1,48 @@
+"""Benchmark: Kaltstart des DataManagers (Laden + Validieren + Indizieren).
+
+Aufruf: python bench_load.py [Anzahl Patienten] [Anteil ausgeblendet]
+"""
+import os
+import sys
+import tempfile
+import time
+from data_manager import DataManager, Patient, open_storage
+
+def make_records(count, hidden_share):
+    verlauf = "\n".join(f"[{day:02d}.03.] Kreislauf stabil, Weaning begonnen, Laktat rückläufig" for day in range(1, 6))
+    return [
+        Patient(
+            name=f"Mustermann, Max {i}",
+            bettplatz=f"ITS{i % 3 + 1} {i}",
+            diagnosen="Septischer Schock bei Pneumonie\nARDS",
+            antiinfektiva="Meropenem 1 g 3x täglich",
+            verlauf=verlauf,
+            hidden=i >= count * (1 - hidden_share),
+            invasive_beatmung=i % 2 == 0,
+        ).model_dump()
+        for i in range(count)
+    ]
+
+def measure(filename, rounds=3, snapshot_dir=None):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        DataManager(filename, snapshot_dir=snapshot_dir)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    hidden_share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "patients.yaml")
+        open_storage(filename).save(make_records(count, hidden_share))
+        elapsed = measure(filename)
+        snapshot_dir = os.path.join(tmp, "cache")
+        # Erster Start legt den Snapshot an, die gemessenen Starts lesen ihn
+        DataManager(filename, snapshot_dir=snapshot_dir)
+        from_snapshot = measure(filename, snapshot_dir=snapshot_dir)
+    print(f"{count} Patienten ({hidden_share:.0%} ausgeblendet): Kaltstart {elapsed * 1000:.0f} ms, aus Snapshot {from_snapshot * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark: PDF-Erzeugung mit Layout-Stufe vs. bisherigem multi_cell(split_only=True).
+
+Aufruf: python bench_pdf.py [Anzahl Patienten]
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+from fpdf import FPDF
+from data_manager import Patient
+from utils import create_patient_pdf, create_station_pdf, create_station_pdfs, format_patient_export, sanitize_for_pdf
+
+FIELDS = ["name", "bettplatz", "unterstuetzung", "diagnosen", "nebendiagnosen", "operationen",
+          "kardiale_funktion", "antiinfektiva", "verlauf", "uebergabe"]
+
+def make_patients(count):
+    verlauf = "\n".join(
+        f"[{day:02d}.03.] Kreislauf stabil unter Noradrenalin 0,1 µg/kg/min, Weaning begonnen, "
+        f"Spontanatmungsversuch über 2 h gut toleriert, Laktat rückläufig"
+        for day in range(1, 6)
+    )
+    return [
+        Patient(
+            name=f"Mustermann, Max {i}",
+            bettplatz=f"ITS{i % 3 + 1} {i}",
+            diagnosen="Septischer Schock bei Pneumonie\nARDS\nAKI KDIGO III",
+            nebendiagnosen="aHT, DM II, COPD GOLD III",
+            operationen="Z.n. Aortenklappenersatz (biologisch) und ACVB x3",
+            kardiale_funktion="LVEF 35 %, RV mittelgradig eingeschränkt",
+            antiinfektiva="Meropenem 1 g 3x täglich seit 01.03., Vancomycin nach Spiegel",
+            verlauf=verlauf,
+            uebergabe="Angehörige informieren, Tracheotomie planen",
+            invasive_beatmung=True,
+            vasopressoren=True,
+        )
+        for i in range(count)
+    ]
+
+def legacy_create_patient_pdf(patients, fields_to_include, filepath):
+    """Bisherige Implementierung (Messung je Zeile mit multi_cell, Schriftwechsel je Zeile)."""
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    line_height = 5
+    page_height = 297 - 20
+    pdf.set_font("helvetica", style="B", size=14)
+    pdf.cell(0, 10, f"Patientenliste - Stand {datetime.now().strftime('%d.%m.%Y %H:%M')}", ln=True)
+    pdf.ln(5)
+    for patient in patients:
+        lines = sanitize_for_pdf(format_patient_export(patient, fields_to_include)).splitlines()
+        needed_height = 0
+        formatted_lines = []
+        for line in lines:
+            w = pdf.w - 2 * pdf.l_margin
+            for w_line in pdf.multi_cell(w, line_height, line, split_only=True):
+                formatted_lines.append(w_line)
+                needed_height += line_height
+        needed_height += 5
+        if needed_height > (page_height - 20):
+            if pdf.get_y() > 30:
+                pdf.add_page()
+        elif pdf.get_y() + needed_height > page_height:
+            pdf.add_page()
+        for i, line in enumerate(formatted_lines):
+            pdf.set_font("helvetica", style="B" if i == 0 else "", size=10)
+            pdf.cell(0, line_height, line, ln=True)
+        pdf.set_draw_color(200, 200, 200)
+        pdf.line(pdf.l_margin, pdf.get_y() + 2, pdf.w - pdf.r_margin, pdf.get_y() + 2)
+        pdf.ln(5)
+    pdf.output(filepath)
+
+def measure(func, patients, filepath, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(patients, FIELDS, filepath)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    patients = make_patients(count)
+    warnings.simplefilter("ignore", DeprecationWarning)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = measure(legacy_create_patient_pdf, patients, os.path.join(tmp, "legacy.pdf"))
+        layout = measure(create_patient_pdf, patients, os.path.join(tmp, "layout.pdf"))
+        merged = measure(create_station_pdf, patients, os.path.join(tmp, "stations.pdf"))
+        files = measure(lambda p, f, _: create_station_pdfs(p, f, tmp), patients, None)
+    print(f"{count} Patienten")
+    print(f"  multi_cell(split_only): {legacy * 1000:8.1f} ms")
+    print(f"  Layout-Stufe:           {layout * 1000:8.1f} ms")
+    print(f"  Speedup:                {legacy / layout:8.1f}x")
+    print("Nach Stationen")
+    print(f"  ein Dokument:           {merged * 1000:8.1f} ms")
+    print(f"  je Station:             {files * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import flet as ft
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+def update_if_mounted(control: ft.Control):
+    """Sendet ein Update nur, wenn das Control bereits auf der Seite aktiv ist."""
+    try:
+        if control.page:
+            control.update()
+    except Exception:
+        pass
+
+class KeyedList:
+    """Hält genau ein Control pro Schlüssel (z.B. Patienten-ID) in einem Container.
+
+    Bei jedem reconcile() werden nur Einträge neu gebaut, deren Signatur sich
+    geändert hat; alle anderen Controls werden wiederverwendet und lediglich
+    umsortiert, eingefügt oder entfernt. Dadurch bleibt der an den Client
+    gesendete Flet-Diff proportional zur Änderung.
+
+    Ist patch angegeben, wird ein geänderter Eintrag im bestehenden Control
+    aktualisiert statt neu gebaut.
+
+    Mit page_size wird die Liste virtualisiert: Es werden nur die ersten
+    page_size Einträge gebaut, weitere Seiten folgen beim Scrollen (on_scroll
+    des Containers) oder über den "weitere laden"-Eintrag am Listenende.
+    """
+
+    def __init__(
+        self,
+        container: ft.Control,
+        build: Callable[[Any], ft.Control],
+        signature: Callable[[Any], Hashable],
+        key: Callable[[Any], Hashable] = lambda item: item.id,
+        patch: Optional[Callable[[ft.Control, Any], None]] = None,
+        page_size: Optional[int] = None,
+        scroll_threshold: float = 300,
+    ):
+        self.container = container
+        self.build = build
+        self.signature = signature
+        self.key = key
+        self.patch = patch
+        self.page_size = page_size
+        self.scroll_threshold = scroll_threshold
+        self._rows: Dict[Hashable, Tuple[Hashable, ft.Control]] = {}
+        self._items: Sequence[Any] = []
+        self._limit = page_size
+        self._more_button: Optional[ft.TextButton] = None
+        if page_size:
+            self.container.on_scroll = self._on_scroll
+            self.container.scroll_interval = 100
+
+    @property
+    def remaining(self) -> int:
+        """Anzahl der Einträge, für die noch keine Controls gebaut wurden."""
+        if self._limit is None:
+            return 0
+        return max(0, len(self._items) - self._limit)
+
+    def reconcile(self, items: Iterable[Any], reset: bool = False) -> bool:
+        """Gleicht die Controls mit items ab. Gibt True zurück, wenn sich die Liste der Controls geändert hat.
+
+        reset=True springt bei virtualisierten Listen auf die erste Seite zurück
+        (z.B. bei einer neuen Suchanfrage).
+        """
+        self._items = items if isinstance(items, (list, tuple)) else list(items)
+        if reset:
+            self._limit = self.page_size
+        visible = self._items if self._limit is None else self._items[:self._limit]
+
+        rows: Dict[Hashable, Tuple[Hashable, ft.Control]] = {}
+        controls: List[ft.Control] = []
+        for item in visible:
+            k = self.key(item)
+            sig = self.signature(item)
+            cached = self._rows.get(k)
+            if cached is None:
+                cached = (sig, self.build(item))
+            elif cached[0] != sig:
+                if self.patch:
+                    self.patch(cached[1], item)
+                    cached = (sig, cached[1])
+                    self._update_control(cached[1])
+                else:
+                    cached = (sig, self.build(item))
+            rows[k] = cached
+            controls.append(cached[1])
+        self._rows = rows
+        if self.remaining:
+            controls.append(self._get_more_button())
+
+        current = self.container.controls
+        if len(current) == len(controls) and all(a is b for a, b in zip(current, controls)):
+            return False
+        self.container.controls = controls
+        self._update_control(self.container)
+        return True
+
+    def load_more(self) -> bool:
+        """Baut die nächste Seite. Gibt False zurück, wenn bereits alles angezeigt wird."""
+        if not self.remaining:
+            return False
+        self._limit += self.page_size
+        return self.reconcile(self._items)
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        # Kurz vor dem Listenende die nächste Seite nachladen
+        if e.max_scroll_extent - e.pixels <= self.scroll_threshold:
+            self.load_more()
+
+    def _get_more_button(self) -> ft.TextButton:
+        if self._more_button is None:
+            self._more_button = ft.TextButton(on_click=lambda _: self.load_more())
+        self._more_button.content = f"{self.remaining} weitere laden"
+        return self._more_button
+
+    @staticmethod
+    def _update_control(control: ft.Control):
+        update_if_mounted(control)
@@ -0,0 +1,71 @@
+import threading
+from typing import Callable, List, Optional
+from data_manager import DataManager, Patient
+from search_index import query_extends
+
+class SearchPipeline:
+    """Entprellte, abbrechbare Suche während der Eingabe.
+
+    Jede neue Eingabe verwirft die noch wartende bzw. laufende Suche der
+    vorherigen Eingabe; Ergebnisse veralteter Anfragen werden nie ausgeliefert.
+    Verlängert die neue Anfrage die vorherige, wird nur innerhalb der
+    vorherigen Treffer gesucht.
+    """
+
+    def __init__(
+        self,
+        dm: DataManager,
+        on_results: Callable[[str, Optional[List[Patient]]], None],
+        debounce: float = 0.15,
+    ):
+        self.dm = dm
+        self.on_results = on_results
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._deliver_lock = threading.Lock()
+        self._generation = 0
+        self._timer: Optional[threading.Timer] = None
+        self._last_query = ""
+        self._last_ids: List[str] = []
+
+    def submit(self, query: str):
+        """Nimmt eine neue Eingabe entgegen; ältere, noch offene Anfragen werden verworfen."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if self.debounce > 0:
+                self._timer = threading.Timer(self.debounce, self._run, args=(generation, query))
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self._run(generation, query)
+
+    def cancel(self):
+        """Verwirft alle offenen Anfragen und die gemerkten Treffer (z.B. nach Datenänderungen)."""
+        with self._lock:
+            self._generation += 1
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._last_query = ""
+            self._last_ids = []
+
+    def _run(self, generation: int, query: str):
+        if generation != self._generation:
+            return
+        if not query:
+            results = None
+        else:
+            within = self._last_ids if query_extends(self._last_query, query) else None
+            results = self.dm.search_patients(query, within=within)
+        with self._deliver_lock:
+            with self._lock:
+                # Während der Suche kam eine neuere Eingabe -> Ergebnis verwerfen
+                if generation != self._generation:
+                    return
+                self._last_query = query
+                self._last_ids = [p.id for p in results] if results is not None else []
+            self.on_results(query, results)
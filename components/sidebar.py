@@ -1,6 +1,7 @@
 import flet as ft
 from data_manager import DataManager
 from typing import Callable
+from components.station_groups import StationGroups
 
 class Sidebar(ft.Column):
     def __init__(self, dm: DataManager, on_navigate: Callable, on_add_patient: Callable):
@@ -8,10 +9,26 @@ class Sidebar(ft.Column):
         self.dm = dm
         self.on_navigate = on_navigate
         self.on_add_patient = on_add_patient
-        
-        self.sidebar_fixed = ft.Column()
-        self.sidebar_scrollable = ft.Column(scroll=ft.ScrollMode.AUTO, expand=True)
-        
+
+        # Der feste Kopfbereich wird nur einmal gebaut
+        self.sidebar_fixed = ft.Column([
+            self._create_sidebar_item(ft.Icons.HOME, "Übersicht", lambda _: self.on_navigate("home")),
+            ft.Divider(),
+            self._create_sidebar_item(ft.Icons.ADD, "Patient hinzufügen", lambda _: self.on_add_patient()),
+            ft.Divider(),
+            ft.Text("Aktive Patienten", size=12, weight=ft.FontWeight.BOLD),
+        ])
+        self.sidebar_scrollable = ft.ListView(expand=True)
+        # Zusammenklappbare Gruppen je Station; Einträge entstehen erst beim Aufklappen.
+        # Ein Eintrag pro Patient; bei Namens-/Bettplatzänderung wird nur dessen Label aktualisiert
+        self.patient_items = StationGroups(
+            self.sidebar_scrollable,
+            build=self._create_patient_item,
+            signature=lambda p: (p.name, p.bettplatz),
+            patch=self._patch_patient_item,
+            page_size=100
+        )
+
         self.controls = [
             self.sidebar_fixed,
             self.sidebar_scrollable
@@ -20,57 +37,46 @@ class Sidebar(ft.Column):
         self.update_sidebar()
 
     def update_sidebar(self):
-        active_patients = self.dm.get_active_patients()
-        sorted_patients = self.dm.sort_patients(active_patients)
-        
-        def on_sidebar_hover(e, container):
-            container.bgcolor = ft.Colors.BLACK12 if e.data == "true" else None
-            try:
-                if container.page:
-                    container.update()
-            except Exception:
-                pass
+        # Nur Name und Bettplatz nötig -> Übersichtsdaten genügen
+        self.patient_items.reconcile(
+            self.dm.get_stations(),
+            lambda station: self.dm.iter_station_patients(station, summary=True)
+        )
 
-        def create_sidebar_item(icon_name, text, on_tap_handler):
-            c = ft.Container(
-                content=ft.Row([
-                    ft.Icon(icon_name, size=18) if icon_name else ft.Container(),
-                    ft.Text(text, size=13)
-                ], spacing=10),
-                padding=ft.padding.symmetric(vertical=3, horizontal=8),
-                border_radius=8,
-            )
-            c.on_hover = lambda e: on_sidebar_hover(e, c)
-            return ft.GestureDetector(
-                content=c,
-                on_tap=on_tap_handler,
-                mouse_cursor=ft.MouseCursor.CLICK
-            )
-        
-        fixed_items = [
-            create_sidebar_item(ft.Icons.HOME, "Übersicht", lambda _: self.on_navigate("home")),
-            ft.Divider(),
-            create_sidebar_item(ft.Icons.ADD, "Patient hinzufügen", lambda _: self.on_add_patient()),
-            ft.Divider(),
-            ft.Text("Aktive Patienten", size=12, weight=ft.FontWeight.BOLD),
-        ]
-        
-        patient_items = []
-        for p in sorted_patients:
-            patient_items.append(
-                create_sidebar_item(
-                    None, 
-                    f"{p.name} ({p.bettplatz})", 
-                    lambda _, pid=p.id: self.on_navigate("patient", pid)
-                )
-            )
-            
-        self.sidebar_fixed.controls = fixed_items
-        self.sidebar_scrollable.controls = patient_items
-        
-        # Nur updaten, wenn das Control bereits auf der Seite aktiv ist
+    def _create_patient_item(self, p):
+        return self._create_sidebar_item(
+            None,
+            f"{p.name} ({p.bettplatz})",
+            lambda _, pid=p.id: self.on_navigate("patient", pid)
+        )
+
+    @staticmethod
+    def _patch_patient_item(item, p):
+        # Nur das Label austauschen; Position regelt die KeyedList
+        label = item.content.content.controls[1]
+        label.value = f"{p.name} ({p.bettplatz})"
+
+    def _create_sidebar_item(self, icon_name, text, on_tap_handler):
+        c = ft.Container(
+            content=ft.Row([
+                ft.Icon(icon_name, size=18) if icon_name else ft.Container(),
+                ft.Text(text, size=13)
+            ], spacing=10),
+            padding=ft.padding.symmetric(vertical=3, horizontal=8),
+            border_radius=8,
+        )
+        c.on_hover = lambda e: self._on_sidebar_hover(e, c)
+        return ft.GestureDetector(
+            content=c,
+            on_tap=on_tap_handler,
+            mouse_cursor=ft.MouseCursor.CLICK
+        )
+
+    @staticmethod
+    def _on_sidebar_hover(e, container):
+        container.bgcolor = ft.Colors.BLACK12 if e.data == "true" else None
         try:
-            if self.page:
-                self.update()
+            if container.page:
+                container.update()
         except Exception:
             pass
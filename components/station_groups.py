@@ -0,0 +1,96 @@
+import flet as ft
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from components.keyed_list import KeyedList, update_if_mounted
+
+class _Group:
+    def __init__(self, control: ft.Control, icon: ft.Icon, title: ft.Text, rows: KeyedList, body: ft.Column):
+        self.control = control
+        self.icon = icon
+        self.title = title
+        self.rows = rows
+        self.body = body
+
+class StationGroups:
+    """Zusammenklappbare Gruppen je Station in einem Container.
+
+    Jede Gruppe besteht aus einer Kopfzeile (Station, Anzahl) und einer
+    KeyedList für ihre Zeilen. Zeilen werden erst gebaut, wenn die Gruppe
+    aufgeklappt wird, und beim Zuklappen wieder verworfen; zugeklappte
+    Gruppen kosten nur ihre Kopfzeile. Gibt es nur eine Station, ist sie
+    immer aufgeklappt.
+
+    expanded enthält die aufgeklappten Stationen und kann von außen
+    übergeben werden, damit der Zustand einen Neuaufbau der Ansicht übersteht.
+    """
+
+    def __init__(
+        self,
+        container: ft.Control,
+        build: Callable[[Any], ft.Control],
+        signature: Callable[[Any], Hashable],
+        patch: Optional[Callable[[ft.Control, Any], None]] = None,
+        expanded: Optional[Set[str]] = None,
+        page_size: Optional[int] = None,
+        title_size: float = 12,
+    ):
+        self.container = container
+        self.build = build
+        self.signature = signature
+        self.patch = patch
+        self.expanded = expanded if expanded is not None else set()
+        self.page_size = page_size
+        self.title_size = title_size
+        self._groups: Dict[str, _Group] = {}
+        self._counts: Dict[str, int] = {}
+        self._load: Callable[[str], Iterable[Any]] = lambda station: ()
+
+    def reconcile(self, stations: Iterable[Tuple[str, int]], load: Callable[[str], Iterable[Any]]):
+        """Gleicht die Gruppen ab.
+
+        stations: (Station, Anzahl) in Anzeigereihenfolge; load(station) liefert
+        die Einträge einer Station und wird nur für aufgeklappte Gruppen aufgerufen.
+        """
+        self._load = load
+        self._counts = dict(stations)
+        groups: Dict[str, _Group] = {}
+        controls: List[ft.Control] = []
+        for station, count in self._counts.items():
+            group = self._groups.get(station) or self._build_group(station)
+            group.title.value = f"{station or 'Ohne Station'} ({count})"
+            self._apply(station, group)
+            groups[station] = group
+            controls.append(group.control)
+        self._groups = groups
+        self.container.controls = controls
+        update_if_mounted(self.container)
+
+    def is_expanded(self, station: str) -> bool:
+        return len(self._counts) == 1 or station in self.expanded
+
+    def toggle(self, station: str):
+        """Klappt eine Gruppe auf bzw. zu; gebaut bzw. verworfen werden nur deren Zeilen."""
+        self.expanded.symmetric_difference_update({station})
+        group = self._groups.get(station)
+        if group is not None:
+            self._apply(station, group)
+            update_if_mounted(group.control)
+
+    def _apply(self, station: str, group: _Group):
+        is_open = self.is_expanded(station)
+        group.icon.icon = ft.Icons.EXPAND_MORE if is_open else ft.Icons.CHEVRON_RIGHT
+        group.body.visible = is_open
+        group.rows.reconcile(self._load(station) if is_open else [], reset=not is_open)
+
+    def _build_group(self, station: str) -> _Group:
+        icon = ft.Icon(ft.Icons.CHEVRON_RIGHT, size=18)
+        title = ft.Text(station, size=self.title_size, weight=ft.FontWeight.BOLD)
+        body = ft.Column(spacing=5, visible=False)
+        rows = KeyedList(body, build=self.build, signature=self.signature, patch=self.patch, page_size=self.page_size)
+        header = ft.Container(
+            content=ft.Row([icon, title], spacing=5),
+            padding=ft.Padding.symmetric(vertical=3, horizontal=4),
+            border_radius=8,
+            ink=True,
+            on_click=lambda _: self.toggle(station),
+        )
+        return _Group(ft.Column([header, body], spacing=5), icon, title, rows, body)
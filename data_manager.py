@@ -1,9 +1,20 @@
-import yaml
+import hashlib
 import os
+import pickle
 import uuid
-from typing import List, Optional, Any
-from pydantic import BaseModel, Field, model_validator
-from utils import get_resource_path, natural_sort_key
+from array import array
+import threading
+import time
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+from typing import List, Optional, Any, Callable, Dict, Iterable, Iterator, Set, Tuple
+from pydantic import BaseModel, Field, PrivateAttr, ValidationInfo, model_validator
+from utils import MEDICAL_FIELDS, SUPPORT_BITS, SUPPORT_FLAGS, get_resource_path, natural_sort_key, parse_bettplatz, support_mask
+from search_index import SearchIndex, TrigramIndex, field_value
+from storage import FORMAT_VERSION, PatientArchive, ShardedStorage, SqliteStorage, StorageBackend, YamlStorage, file_signature
+
+# Validierungskontext für Daten, die bereits im aktuellen Format gespeichert wurden
+MIGRATED = {"migrated": True}
 
 class Patient(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -32,9 +43,40 @@ class Patient(BaseModel):
     ihd: bool = False
     sedierung: bool = False
 
+    # Seit dem letzten update_patient geänderte Felder (nicht Teil der gespeicherten Daten)
+    _dirty: Set[str] = PrivateAttr(default_factory=set)
+
+    def __setattr__(self, name: str, value: Any):
+        if name in Patient.model_fields and getattr(self, name) != value:
+            self._dirty.add(name)
+        super().__setattr__(name, value)
+
+    def __eq__(self, other: Any) -> bool:
+        # Nur die Daten vergleichen, nicht den Änderungsstand
+        return type(other) is type(self) and self.__dict__ == other.__dict__
+
+    @property
+    def support_mask(self) -> int:
+        """Unterstützungs-Flags als Bitmaske (Bit i = SUPPORT_FLAGS[i])."""
+        return support_mask(self)
+
+    @property
+    def dirty_fields(self) -> frozenset:
+        """Felder, die seit dem letzten update_patient geändert wurden."""
+        return frozenset(self._dirty)
+
+    def pop_dirty_fields(self) -> Set[str]:
+        """Gibt die geänderten Felder zurück und setzt den Änderungsstand zurück."""
+        fields = self._dirty
+        self._dirty = set()
+        return fields
+
     @model_validator(mode='before')
     @classmethod
-    def migrate_station(cls, data: Any) -> Any:
+    def migrate_station(cls, data: Any, info: ValidationInfo) -> Any:
+        # Dateien ab FORMAT_VERSION sind bereits migriert
+        if info.context and info.context.get("migrated"):
+            return data
         if isinstance(data, dict) and "station" in data and data["station"]:
             station = data.pop("station")
             bettplatz = data.get("bettplatz", "")
@@ -44,64 +86,1228 @@ class Patient(BaseModel):
                 data["bettplatz"] = f"{station} {bettplatz}".strip()
         return data
 
+class PatientList(Sequence):
+    """Patientenliste, deren Einträge auch noch unvalidierte Rohdaten (dict) sein dürfen.
+
+    Nach außen eine Sequenz von Patienten: Rohdaten werden beim ersten Zugriff (Index,
+    Iteration, reversed, pop, in, index ...) validiert und in der Liste ersetzt;
+    Teil-Datensätze werden dabei über resolve vervollständigt. Bewusst keine list-Unterklasse,
+    damit keine geerbte Methode (remove, sort, * ...) Rohdaten herausgibt.
+    iter_raw(), is_hidden() und summary() lesen, ohne zu validieren.
+    """
+
+    __slots__ = ("_items", "_resolve")
+
+    def __init__(self, items: Iterable[Any] = (), resolve: Optional[Callable[[dict], dict]] = None):
+        self._items: List[Any] = list(items)
+        self._resolve = resolve
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        item = self._items[i]
+        if isinstance(item, dict):
+            item = Patient.model_validate(self._resolve(item) if self._resolve else item, context=MIGRATED)
+            self._items[i] = item
+        return item
+
+    def __setitem__(self, i: int, patient: Patient):
+        if not isinstance(patient, Patient):
+            raise TypeError("PatientList nimmt nur Patienten auf (Rohdaten über set_raw)")
+        self._items[i] = patient
+
+    def __delitem__(self, i: int):
+        del self._items[i]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self[i]
+
+    def __contains__(self, item):
+        return self.count(item) > 0
+
+    def __eq__(self, other):
+        if not isinstance(other, (PatientList, list, tuple)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self) -> str:
+        return f"PatientList({list(self)!r})"
+
+    def _candidates(self, item, start: int = 0, stop: Optional[int] = None) -> Iterator[int]:
+        """Positionen, die item sein könnten; Rohdaten mit anderer id werden nicht validiert."""
+        pid = getattr(item, "id", None)
+        for i in range(*slice(start, stop).indices(len(self))):
+            raw = self._items[i]
+            if not isinstance(raw, dict) or field_value(raw, "id") == pid:
+                yield i
+
+    def index(self, item, start: int = 0, stop: Optional[int] = None) -> int:
+        for i in self._candidates(item, start, stop):
+            if self[i] == item:
+                return i
+        raise ValueError(f"{item!r} is not in list")
+
+    def count(self, item) -> int:
+        return sum(1 for i in self._candidates(item) if self[i] == item)
+
+    def append(self, item: Any):
+        """Hängt einen Patienten oder noch unvalidierte Rohdaten an."""
+        self._items.append(item)
+
+    def pop(self, i: int = -1) -> Patient:
+        item = self[i]
+        del self._items[i]
+        return item
+
+    def copy(self) -> List[Patient]:
+        return list(self)
+
+    def iter_raw(self) -> Iterator[Any]:
+        return iter(self._items)
+
+    def raw(self, i: int) -> Any:
+        return self._items[i]
+
+    def set_raw(self, i: int, item: Any):
+        """Ersetzt einen Eintrag (Patient oder Rohdaten), ohne zu validieren."""
+        self._items[i] = item
+
+    def is_hidden(self, i: int) -> bool:
+        return bool(field_value(self._items[i], "hidden"))
+
+    def resolve_raw(self, i: int) -> Any:
+        """Vollständige Rohdaten (bzw. den Patienten), ohne zu validieren."""
+        item = self._items[i]
+        if isinstance(item, dict) and self._resolve:
+            full = self._resolve(item)
+            if full is not item:
+                self._items[i] = full
+            return full
+        return item
+
+    def summary(self, i: int) -> Patient:
+        """Patient für Listenansichten; Rohdaten werden weder vervollständigt noch validiert.
+
+        Nicht geladene Felder haben ihren Standardwert – für Änderungen immer
+        den vollständigen Patienten (Index-Zugriff) verwenden.
+        """
+        item = self._items[i]
+        return Patient.model_construct(**item) if isinstance(item, dict) else item
+
+# Platzhalter für "vorheriger Wert" eines bereits einmal erneut geschriebenen Felds (siehe _lost_writes)
+_REAPPLIED = object()
+
+# Felder, die in die Flag-Bitmengen des DataManagers eingehen
+FLAG_FIELDS = frozenset((*SUPPORT_FLAGS, "hidden"))
+
+def _delete_bit(bits: int, i: int) -> int:
+    """Entfernt Bit i aus einer Bitmenge; höhere Bits rücken nach (wie del list[i])."""
+    return (bits & ((1 << i) - 1)) | ((bits >> (i + 1)) << i)
+
+def _iter_bits(bits: int) -> Iterator[int]:
+    """Positionen der gesetzten Bits, aufsteigend."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+def _remove_entry(entries: List[Tuple[tuple, int, str]], entry: Tuple[tuple, int, str]):
+    """Entfernt einen Eintrag aus einer sortierten Liste (binäre Suche)."""
+    i = bisect_left(entries, entry)
+    if i < len(entries) and entries[i] == entry:
+        del entries[i]
+
+# Wartezeit bis zum erneuten Schreibversuch nach einem Fehler (verdoppelt sich bis zum Maximum)
+SAVE_RETRY_DELAY = 1.0
+SAVE_RETRY_MAX_DELAY = 30.0
+
+# Version des Start-Snapshots; bei Änderungen an den gespeicherten Strukturen erhöhen
+SNAPSHOT_VERSION = 1
+# Abgeleitete Strukturen, die der Snapshot neben den Datensätzen enthält. Der Volltextindex
+# fehlt bewusst: er entsteht wie bei Teil-Datensätzen erst bei der ersten Suche.
+SNAPSHOT_STATE = (
+    "_fuzzy_index", "_sorted", "_sort_entries", "_sort_seq", "_bed_keys", "_station_sorted",
+    "_support_masks", "_flag_bits", "_hidden_bits",
+)
+
+# Dateiendungen, für die das SQLite-Backend verwendet wird
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+# Verzeichnis mit einer Datei je Patient
+SHARDED_SUFFIX = ".d"
+# Felder im Index der Einzeldatei-Ablage (alles, was Listen und Sidebar anzeigen)
+SUMMARY_FIELDS = ["id", "name", "bettplatz", "hidden", *MEDICAL_FIELDS]
+
+def open_storage(filename: str, journal: bool = False, journal_max_bytes: int = 256 * 1024) -> StorageBackend:
+    """Wählt das Backend anhand des Pfads (SQLite für .db/.sqlite, Verzeichnis *.d, sonst YAML)."""
+    if filename.endswith(SHARDED_SUFFIX) or os.path.isdir(filename):
+        return ShardedStorage(filename, index_fields=SUMMARY_FIELDS)
+    if filename.lower().endswith(SQLITE_EXTENSIONS):
+        return SqliteStorage(
+            filename,
+            fields=list(Patient.model_fields),
+            bool_fields=[name for name, info in Patient.model_fields.items() if info.annotation is bool],
+            indexed_fields=["bettplatz", "hidden", *MEDICAL_FIELDS]
+        )
+    return YamlStorage(filename, journal=journal, journal_max_bytes=journal_max_bytes)
+
+def archive_filename(filename: str) -> str:
+    """Archivdatei für ausgeblendete Patienten neben der Patientendatei."""
+    return os.path.splitext(filename)[0] + ".archive.jsonl.gz"
+
+def iter_stored_patients(filename: str, include_archive: bool = True) -> Iterator[Patient]:
+    """Iteriert über die gespeicherten Patienten in gespeicherter Reihenfolge (inkl. Journal und Archiv).
+
+    Es wird jeweils nur ein Patient im Speicher gehalten (plus die Deltas des
+    Journals, dessen Größe durch die Kompaktierung begrenzt ist). Gedacht für
+    den Export ohne DataManager, z.B. über die Kommandozeile.
+    """
+    storage = open_storage(filename)
+    seen = set()
+    try:
+        for record in storage.iter_records():
+            context = MIGRATED if storage.format_version >= FORMAT_VERSION else None
+            patient = Patient.model_validate(record, context=context)
+            seen.add(patient.id)
+            yield patient
+    finally:
+        storage.close()
+    if include_archive:
+        for record in PatientArchive(archive_filename(filename)).load():
+            if record["id"] not in seen:
+                yield Patient.model_validate(record, context=MIGRATED)
+
+def convert_storage(source: str, target: str) -> int:
+    """Überträgt alle Patienten (inkl. Archiv) zwischen zwei Dateien/Backends (z.B. YAML -> SQLite und zurück)."""
+    records = [p.model_dump() for p in iter_stored_patients(source)]
+    target_storage = open_storage(target)
+    try:
+        target_storage.save(records)
+    finally:
+        target_storage.close()
+    return len(records)
+
 class DataManager:
-    def __init__(self, filename: str = "patients.yaml"):
+    def __init__(
+        self,
+        filename: str = "patients.yaml",
+        write_delay: float = 0.0,
+        max_write_delay: float = 5.0,
+        journal: bool = False,
+        journal_max_bytes: int = 256 * 1024,
+        storage: Optional[StorageBackend] = None,
+        archive: bool = False,
+        snapshot_dir: Optional[str] = None,
+    ):
         if not os.path.isabs(filename):
             self.filename = get_resource_path(filename)
         else:
             self.filename = filename
-        self.patients: List[Patient] = []
+        self.patients = PatientList()
+        # Index id -> Position in self.patients für O(1)-Zugriffe
+        self._index: Dict[str, int] = {}
+        # Volltextindex über alle Textfelder
+        self._search_index = SearchIndex()
+        # Bei Teil-Datensätzen (Einzeldatei-Ablage) wird der Volltextindex erst bei der ersten Suche aufgebaut
+        self._search_ready = True
+        # Fehlertoleranter Trigramm-Index über Name und Bettplatz
+        self._fuzzy_index = TrigramIndex()
+        # Nach Bettplatz sortierte Reihenfolge mit zwischengespeicherten Sortierschlüsseln.
+        # Einträge: (Sortierschlüssel, Einfügereihenfolge, id) -> stabil wie sorted()
+        self._sorted: List[Tuple[tuple, int, str]] = []
+        self._sort_entries: Dict[str, Tuple[str, Tuple[tuple, int, str]]] = {}
+        self._sort_seq = 0
+        # Zerlegter Bettplatz (Station, Zimmer, Bett) je Patient und je Station die
+        # sortierten Einträge (Teilindex von _sorted) für die Stationsgruppen
+        self._bed_keys: Dict[str, Tuple[str, str, str]] = {}
+        self._station_sorted: Dict[str, List[Tuple[tuple, int, str]]] = {}
+        # Änderungszähler je Patient (für Caches, z.B. Export-Vorschau)
+        self._revisions: Dict[str, int] = {}
+        # Unterstützungs-Flags spaltenweise: Bitmaske je Position in self.patients und
+        # je Flag eine Bitmenge über alle Positionen (Bit i = Patient an Position i).
+        # Kohorten und Zählungen laufen damit als Bitoperationen über den ganzen Bestand.
+        self._support_masks = array('H')
+        self._flag_bits: Dict[str, int] = dict.fromkeys(SUPPORT_FLAGS, 0)
+        self._hidden_bits = 0
+
+        # Persistenz: YAML (optional mit Journal) oder SQLite, je nach Dateiendung
+        self.storage = storage or open_storage(self.filename, journal=journal, journal_max_bytes=journal_max_bytes)
+        self.journal = journal
+        self.journal_filename = self.filename + ".journal"
+        # Zuletzt persistierter Stand je Patient (Basis für Deltas)
+        self._persisted: Dict[str, dict] = {}
+        # Geänderte, noch nicht geschriebene Patienten und je Patient deren geänderte Felder
+        self._dirty_ids: set = set()
+        self._dirty_fields: Dict[str, Set[str]] = {}
+        # Selbst geschriebene, beim Einlesen noch nicht bestätigte Felder: id -> Feld -> (vorher, nachher)
+        self._written: Dict[str, Dict[str, Tuple[Any, Any]]] = {}
+        # Archiv: Ausgeblendete Patienten liegen komprimiert in einer eigenen Datei und
+        # werden erst geladen, wenn Suche oder Einblenden sie brauchen (load_archive).
+        self.archive = PatientArchive(archive_filename(self.filename)) if archive else None
+        self._archived: set = set()
+        self._archive_loaded = False
+        # Start-Snapshot: validierte Daten samt Indizes als Pickle in einem lokalen Verzeichnis
+        # (nicht auf dem Netzlaufwerk), gültig solange die Patientendatei unverändert ist
+        self.snapshot_filename = None
+        if snapshot_dir:
+            name = hashlib.blake2b(os.path.abspath(self.filename).encode("utf-8"), digest_size=8).hexdigest()
+            self.snapshot_filename = os.path.join(snapshot_dir, f"{name}.snapshot")
+        self.loaded_from_snapshot = False
+        # Fremde Änderungen (andere Arbeitsplätze auf derselben Datei): zuletzt bekanntes
+        # Änderungsmerkmal der Dateien, Beobachter und optionaler Polling-Thread
+        self._known_signature: Optional[tuple] = None
+        self._listeners: List[Callable[[set], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
+
+        # Write-behind: Änderungen werden gesammelt und erst nach einer Ruhephase
+        # (write_delay) bzw. spätestens nach max_write_delay gemeinsam geschrieben.
+        # write_delay = 0 bedeutet sofortiges Speichern wie bisher.
+        self.write_delay = write_delay
+        self.max_write_delay = max_write_delay
+        self._lock = threading.RLock()
+        # Reentrant: _persist hält die Sperre vom Einmischen fremder Änderungen bis zum Schreiben
+        self._io_lock = threading.RLock()
+        self._writer_wakeup = threading.Condition(self._lock)
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        self._pending_writes = 0
+        self._first_pending: Optional[float] = None
+        self._last_pending: Optional[float] = None
+        # Fehler beim Schreiben im Hintergrund (z.B. Netzlaufwerk nicht erreichbar): Änderungen
+        # bleiben ausstehend, der Writer versucht es erneut; Beobachter zeigen den Fehler an
+        self.last_save_error: Optional[Exception] = None
+        self._error_listeners: List[Callable[[Exception], None]] = []
+
         self.load()
 
     def load(self):
-        """Lädt Patienten aus der YAML-Datei."""
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f) or []
-                self.patients = [Patient.model_validate(p) for p in data]
+        """Lädt Patienten aus dem Storage-Backend (inkl. Journal, falls vorhanden) bzw. aus dem Snapshot."""
+        self._archived = set()
+        self._archive_loaded = False
+        self.loaded_from_snapshot = self._load_snapshot()
+        if self.loaded_from_snapshot:
+            self._remember_signature()
+            return
+        if self.storage.exists():
+            data = self.storage.load()
+            if self.storage.format_version >= FORMAT_VERSION:
+                # Schneller Weg: bereits migrierte Daten, ausgeblendete Patienten (bzw. alle
+                # Teil-Datensätze) bleiben Rohdaten und werden erst beim ersten Zugriff validiert
+                lazy = self.storage.partial_records
+                self.patients = self._patient_list(
+                    r if lazy or r.get("hidden") else Patient.model_validate(r, context=MIGRATED) for r in data
+                )
+                self._persisted = {r["id"]: r for r in data}
+            else:
+                self.patients = self._patient_list(Patient.model_validate(r) for r in data)
+                self._persisted = {p.id: p.model_dump() for p in self.patients}
+            self._dirty_ids = set()
+            # Neu geladene Objekte -> Revision erhöhen, damit Caches verworfen werden
+            for pid in self._persisted:
+                self._bump_revision(pid)
         else:
-            self.patients = []
+            self.patients = self._patient_list()
+            self.save()
+        archived_on_load = self._archive_hidden_on_load()
+        self._rebuild_indexes()
+        if archived_on_load:
             self.save()
+        self._remember_signature()
+        self._write_snapshot()
+
+    def _snapshot_key(self) -> Optional[tuple]:
+        """Schlüssel des Snapshots: Dateistand (mtime/Größe), Inhalts-Prüfsumme und Modellfelder."""
+        digest = self.storage.content_digest()
+        if digest is None:
+            return None
+        return (SNAPSHOT_VERSION, tuple(Patient.model_fields), self.storage.signature(), digest)
+
+    def _load_snapshot(self) -> bool:
+        """Übernimmt Datensätze und Indizes aus dem Snapshot, falls dieser zur Patientendatei passt."""
+        if not self.snapshot_filename or not self.storage.exists():
+            return False
+        key = self._snapshot_key()
+        if key is None:
+            return False
+        try:
+            with open(self.snapshot_filename, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            # Fehlender oder unlesbarer Snapshot -> normal laden
+            return False
+        if not isinstance(snapshot, dict) or snapshot.get("key") != key:
+            return False
+        records = snapshot["records"]
+        # Datensätze bleiben Rohdaten und werden erst beim Zugriff validiert
+        self.patients = self._patient_list(records)
+        self._persisted = {r["id"]: r for r in records}
+        self._dirty_ids = set()
+        self._dirty_fields = {}
+        self._index = {r["id"]: i for i, r in enumerate(records)}
+        self._search_index.clear()
+        self._search_ready = False
+        for name in SNAPSHOT_STATE:
+            setattr(self, name, snapshot[name])
+        for pid in self._persisted:
+            self._bump_revision(pid)
+        return True
+
+    def _write_snapshot(self):
+        """Schreibt den Snapshot, sofern der Speicherstand genau der Patientendatei entspricht."""
+        if not self.snapshot_filename:
+            return
+        with self._io_lock:
+            # Fremde, noch nicht eingemischte Änderungen -> Stand passt nicht zur Datei
+            if self._storage_signature() != self._known_signature:
+                return
+            key = self._snapshot_key()
+            if key is None:
+                return
+            with self._lock:
+                # Nur ein vollständig geschriebener Stand
+                if self._dirty_ids:
+                    return
+                # Nachgeladene Archiv-Patienten gehören nicht zur Patientendatei
+                positions = [
+                    i for i, p in enumerate(self.patients.iter_raw()) if field_value(p, "id") not in self._archived
+                ]
+                records = [self._persisted.get(field_value(self.patients.raw(i), "id")) for i in positions]
+                if None in records:
+                    return
+                snapshot = {"key": key, "records": records, **self._snapshot_state(positions)}
+                data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_filename), exist_ok=True)
+            tmp_filename = self.snapshot_filename + ".tmp"
+            with open(tmp_filename, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_filename, self.snapshot_filename)
+        except OSError:
+            # Der Snapshot ist nur ein Cache
+            pass
+
+    def _snapshot_state(self, positions: List[int]) -> dict:
+        """Abgeleitete Strukturen (SNAPSHOT_STATE) für die Patienten an positions.
+
+        Ohne nachgeladenes Archiv sind das die aktuellen Strukturen; sonst werden
+        Sortierung und Stationen gefiltert und Trigramm-Index und Flags für die
+        neuen Positionen aufgebaut.
+        """
+        if len(positions) == len(self.patients):
+            return {name: getattr(self, name) for name in SNAPSHOT_STATE}
+        ids = {field_value(self.patients.raw(i), "id") for i in positions}
+        fuzzy_index = TrigramIndex()
+        support_masks = array('H', (self._support_masks[i] for i in positions))
+        flag_bits = dict.fromkeys(SUPPORT_FLAGS, 0)
+        hidden_bits = 0
+        for j, i in enumerate(positions):
+            raw = self.patients.raw(i)
+            fuzzy_index.update(raw)
+            for flag, flag_bit in SUPPORT_BITS.items():
+                if support_masks[j] & flag_bit:
+                    flag_bits[flag] |= 1 << j
+            if field_value(raw, "hidden"):
+                hidden_bits |= 1 << j
+        station_sorted = {}
+        for station, entries in self._station_sorted.items():
+            kept = [entry for entry in entries if entry[2] in ids]
+            if kept:
+                station_sorted[station] = kept
+        return {
+            "_fuzzy_index": fuzzy_index,
+            "_sorted": [entry for entry in self._sorted if entry[2] in ids],
+            "_sort_entries": {pid: entry for pid, entry in self._sort_entries.items() if pid in ids},
+            "_sort_seq": self._sort_seq,
+            "_bed_keys": {pid: key for pid, key in self._bed_keys.items() if pid in ids},
+            "_station_sorted": station_sorted,
+            "_support_masks": support_masks,
+            "_flag_bits": flag_bits,
+            "_hidden_bits": hidden_bits,
+        }
+
+    def _patient_list(self, items: Iterable[Any] = ()) -> PatientList:
+        return PatientList(items, resolve=self._resolve_record)
+
+    def _resolve_record(self, record: dict) -> dict:
+        full = self.storage.resolve_record(record)
+        # Vollständiger Datensatz frisch von der Platte -> auch als Basis für Deltas und Zusammenführung
+        if full is not record and self._persisted.get(full["id"]) == record:
+            self._persisted[full["id"]] = dict(full)
+        return full
+
+    def _archive_hidden_on_load(self) -> bool:
+        """Verschiebt noch in der Patientendatei stehende ausgeblendete Patienten ins Archiv."""
+        if self.archive is None:
+            return False
+        hidden = [i for i in range(len(self.patients)) if self.patients.is_hidden(i)]
+        if not hidden:
+            return False
+        raw = [self.patients.resolve_raw(i) for i in hidden]
+        self.archive.put([p if isinstance(p, dict) else p.model_dump() for p in raw])
+        hidden_set = set(hidden)
+        self.patients = self._patient_list(p for i, p in enumerate(self.patients.iter_raw()) if i not in hidden_set)
+        for p in raw:
+            self._persisted.pop(field_value(p, "id"), None)
+        return True
+
+    def load_archive(self):
+        """Lädt das Archiv der ausgeblendeten Patienten (einmalig) und nimmt sie in die Indizes auf."""
+        if self.archive is None or self._archive_loaded:
+            return
+        with self._lock:
+            if self._archive_loaded:
+                return
+            self._add_archived(self.archive.load())
+            self._archive_loaded = True
+
+    def _add_archived(self, records: Iterable[dict]) -> set:
+        """Nimmt noch nicht bekannte Archiv-Einträge als Rohdaten auf; validiert wird erst beim Zugriff."""
+        added = set()
+        for record in records:
+            pid = record["id"]
+            if pid in self._index:
+                continue
+            self._index[pid] = len(self.patients)
+            self.patients.append(record)
+            self._index_patient(record)
+            self._bump_revision(pid)
+            self._archived.add(pid)
+            added.add(pid)
+        return added
+
+    def _sync_archive(self) -> bool:
+        """Verschiebt geänderte Patienten zwischen Patientendatei und Archiv.
+
+        Ausgeblendete (bzw. im Archiv bearbeitete) Patienten werden ins Archiv
+        geschrieben, eingeblendete daraus entfernt. Gibt True zurück, wenn die
+        Patientendatei dafür vollständig neu geschrieben werden muss.
+        """
+        if self.archive is None:
+            return False
+        with self._io_lock:
+            with self._lock:
+                to_archive, to_restore = [], []
+                for pid in self._dirty_ids:
+                    i = self._index.get(pid)
+                    if i is None:
+                        continue
+                    if self.patients.is_hidden(i):
+                        to_archive.append(pid)
+                    elif pid in self._archived:
+                        to_restore.append(pid)
+                if not to_archive and not to_restore:
+                    return False
+                records = [self.patients[self._index[pid]].model_dump() for pid in to_archive]
+                moved_out = [pid for pid in to_archive if pid in self._persisted]
+                self._archived.update(to_archive)
+                self._archived.difference_update(to_restore)
+                self._dirty_ids.difference_update(to_archive)
+                for pid in to_archive:
+                    self._dirty_fields.pop(pid, None)
+                for pid in moved_out:
+                    self._persisted.pop(pid, None)
+            self.archive.put(records)
+            self.archive.remove(to_restore)
+            # Wieder eingeblendete Patienten gelangen als neue Einträge (Delta mit allen Feldern) zurück
+            needs_full_save = False
+            for pid in moved_out:
+                if not self.storage.delete(pid):
+                    needs_full_save = True
+            self._remember_signature()
+        return needs_full_save
+
+    def _reindex(self, start: int = 0):
+        """Aktualisiert den id-Index ab Position start (nach Löschen oder Umsortieren)."""
+        if start == 0:
+            self._index = {}
+        for i in range(start, len(self.patients)):
+            self._index[field_value(self.patients.raw(i), "id")] = i
+
+    def _rebuild_indexes(self):
+        """Baut id-, Such-, Sortier-, Stations- und Flag-Indizes vollständig neu auf (nach dem Laden)."""
+        self._reindex()
+        self._search_index.clear()
+        self._search_ready = not self.storage.partial_records
+        self._fuzzy_index.clear()
+        self._sorted = []
+        self._sort_entries = {}
+        self._sort_seq = 0
+        self._bed_keys = {}
+        self._station_sorted = {}
+        self._support_masks = array('H')
+        self._flag_bits = dict.fromkeys(SUPPORT_FLAGS, 0)
+        self._hidden_bits = 0
+        for p in self.patients.iter_raw():
+            self._index_patient(p)
+
+    def _index_patient(self, patient: Patient, fields: Optional[Set[str]] = None):
+        """Aktualisiert Such- und Sortierindizes für einen (neuen oder geänderten) Patienten bzw. dessen Rohdaten.
+
+        fields beschränkt die Aktualisierung auf diese geänderten Felder.
+        """
+        if self._search_ready and (fields is None or not fields.isdisjoint(self._search_index.fields)):
+            self._search_index.update(patient, fields)
+        if fields is None or not fields.isdisjoint(self._fuzzy_index.fields):
+            self._fuzzy_index.update(patient)
+        patient_id = field_value(patient, "id")
+        if fields is None or not fields.isdisjoint(FLAG_FIELDS):
+            self._set_flags(self._index[patient_id], patient)
+        bettplatz = field_value(patient, "bettplatz")
+        entry = self._sort_entries.get(patient_id)
+        if entry is not None:
+            if entry[0] == bettplatz:
+                return
+            self._remove_sorted(entry[1])
+            seq = entry[1][1]
+        else:
+            seq = self._sort_seq
+            self._sort_seq += 1
+        # Nur der geänderte Patient wird neu einsortiert
+        new_entry = (tuple(natural_sort_key(bettplatz)), seq, patient_id)
+        insort(self._sorted, new_entry)
+        self._sort_entries[patient_id] = (bettplatz, new_entry)
+        bed_key = parse_bettplatz(bettplatz)
+        self._bed_keys[patient_id] = bed_key
+        insort(self._station_sorted.setdefault(bed_key[0], []), new_entry)
+
+    def _set_flags(self, i: int, patient: Patient):
+        """Schreibt Bitmaske und Flag-Bitmengen für Position i (i == Länge: neuer Eintrag)."""
+        mask = support_mask(patient)
+        if i == len(self._support_masks):
+            self._support_masks.append(mask)
+            changed = mask
+        else:
+            changed = self._support_masks[i] ^ mask
+            self._support_masks[i] = mask
+        bit = 1 << i
+        if changed:
+            for flag, flag_bit in SUPPORT_BITS.items():
+                if changed & flag_bit:
+                    self._flag_bits[flag] ^= bit
+        if field_value(patient, "hidden"):
+            self._hidden_bits |= bit
+        else:
+            self._hidden_bits &= ~bit
+
+    def _delete_flags(self, i: int):
+        del self._support_masks[i]
+        for flag, bits in self._flag_bits.items():
+            self._flag_bits[flag] = _delete_bit(bits, i)
+        self._hidden_bits = _delete_bit(self._hidden_bits, i)
+
+    def _build_search_index(self):
+        """Baut den Volltextindex nachträglich auf (liest dafür alle Patientendateien, ohne zu validieren)."""
+        if self._search_ready:
+            return
+        for i in range(len(self.patients)):
+            self._search_index.update(self.patients.resolve_raw(i))
+        self._search_ready = True
+
+    def _unindex_patient(self, patient_id: str):
+        self._search_index.remove(patient_id)
+        self._fuzzy_index.remove(patient_id)
+        entry = self._sort_entries.pop(patient_id, None)
+        if entry is not None:
+            self._remove_sorted(entry[1])
+
+    def _remove_sorted(self, entry: Tuple[tuple, int, str]):
+        _remove_entry(self._sorted, entry)
+        bed_key = self._bed_keys.pop(entry[2], None)
+        if bed_key is not None:
+            station_entries = self._station_sorted[bed_key[0]]
+            _remove_entry(station_entries, entry)
+            if not station_entries:
+                del self._station_sorted[bed_key[0]]
 
     def save(self):
-        """Speichert Patienten in die YAML-Datei."""
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            data = [p.model_dump() for p in self.patients]
-            yaml.dump(data, f, allow_unicode=True, sort_keys=False, default_flow_style=False)
+        """Speichert alle (nicht archivierten) Patienten als vollständigen Snapshot."""
+        self._sync_archive()
+        with self._io_lock:
+            with self._lock:
+                # Noch unvalidierte Rohdaten unverändert übernehmen
+                data = [
+                    p if isinstance(p, dict) else p.model_dump() for p in self.patients.iter_raw()
+                    if field_value(p, "id") not in self._archived
+                ]
+                unsaved = (dict(self._persisted), self._dirty_ids, self._dirty_fields)
+                self._persisted = {d["id"]: d for d in data}
+                self._dirty_ids = set()
+                self._dirty_fields = {}
+                written = self._pending_writes
+            try:
+                self.storage.save(data)
+            except Exception:
+                self._restore_unsaved(*unsaved)
+                raise
+            # Der eigene Stand steht jetzt vollständig in der Datei
+            self._written = {}
+            self._remember_signature()
+            self._mark_written(written)
+
+    def _restore_unsaved(self, persisted: Dict[str, dict], dirty_ids: set, dirty_fields: Dict[str, Set[str]]):
+        """Nach einem Schreibfehler: Änderungen wieder als ausstehend markieren (Aufrufer hält _io_lock)."""
+        with self._lock:
+            self._persisted = persisted
+            self._dirty_ids |= dirty_ids
+            for pid, fields in dirty_fields.items():
+                self._dirty_fields.setdefault(pid, set()).update(fields)
+
+    def compact(self):
+        """Führt das Journal in den YAML-Snapshot zusammen."""
+        self.save()
+
+    def _write_changes(self):
+        """Schreibt die geänderten Felder aller geänderten Patienten (Journal bzw. Zeilen-Update)."""
+        with self._io_lock:
+            with self._lock:
+                unsaved = (dict(self._persisted), self._dirty_ids, self._dirty_fields)
+                changes = {}
+                for pid in self._dirty_ids:
+                    patient = self.get_patient_by_id(pid)
+                    if patient is None:
+                        continue
+                    previous = self._persisted.get(pid)
+                    fields = self._dirty_fields.get(pid)
+                    if previous is None or fields is None:
+                        # Neuer (bzw. anderswo gelöschter) Patient -> alle Felder
+                        current = patient.model_dump()
+                        delta = {k: v for k, v in current.items() if (previous or {}).get(k) != v}
+                        self._persisted[pid] = current
+                    else:
+                        # Nur die geänderten Felder lesen und vergleichen
+                        delta = {f: getattr(patient, f) for f in fields if previous.get(f) != getattr(patient, f)}
+                        if delta:
+                            self._persisted[pid] = {**previous, **delta}
+                    if delta:
+                        changes[pid] = delta
+                        own = self._written.setdefault(pid, {})
+                        for f, v in delta.items():
+                            before = own[f][0] if f in own else (previous or {}).get(f)
+                            own[f] = (before, v)
+                self._dirty_ids = set()
+                self._dirty_fields = {}
+                written = self._pending_writes
+            try:
+                needs_compaction = self.storage.write_changes(changes) if changes else False
+            except Exception:
+                self._restore_unsaved(*unsaved)
+                raise
+            self._remember_signature()
+            self._mark_written(written)
+        if needs_compaction:
+            self.compact()
+
+    def _persist(self):
+        """Schreibt ausstehende Änderungen je nach Backend als Delta oder als Snapshot.
+
+        Zuvor werden fremde Änderungen eingemischt, damit ein Snapshot sie nicht überschreibt.
+        Die Sperre des Backends hält andere Arbeitsplätze vom Einmischen bis zum Schreiben fern.
+        """
+        with self._io_lock, self.storage.lock():
+            changed = self._merge_external()
+            if not self.storage.incremental or self._sync_archive():
+                self.save()
+            else:
+                self._write_changes()
+        self._notify(changed)
+
+    def _storage_signature(self) -> tuple:
+        signature = self.storage.signature()
+        if self.archive is not None:
+            signature += (file_signature(self.archive.filename),)
+        return signature
+
+    def _remember_signature(self):
+        """Merkt sich den Dateistand nach eigenem Lesen/Schreiben (nur Änderungen danach gelten als fremd)."""
+        self._known_signature = self._storage_signature()
+
+    def add_change_listener(self, callback: Callable[[set], None]):
+        """Registriert einen Beobachter für fremde Änderungen; er erhält die IDs der betroffenen Patienten."""
+        self._listeners.append(callback)
+
+    def _notify(self, changed: set):
+        if not changed:
+            return
+        for callback in list(self._listeners):
+            callback(changed)
+
+    def check_external_changes(self) -> set:
+        """Prüft (per mtime/Größe), ob andere die Dateien geändert haben, und mischt die Änderungen ein.
+
+        Gibt die IDs der geänderten, neuen und entfernten Patienten zurück.
+        """
+        with self._io_lock:
+            changed = self._merge_external()
+            # Verloren gegangene eigene Schreibvorgänge (siehe _lost_writes) erneut schreiben
+            resave = bool(self._dirty_ids) and not self._pending_writes
+        if resave:
+            self._request_save()
+        self._notify(changed)
+        return changed
+
+    def start_watching(self, interval: float = 2.0):
+        """Prüft im Hintergrund alle interval Sekunden auf fremde Änderungen (siehe check_external_changes)."""
+        if self._watcher is not None:
+            return
+        self._watch_stop.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, args=(interval,), name="DataManagerWatcher", daemon=True)
+        self._watcher.start()
+
+    def _watch_loop(self, interval: float):
+        while not self._watch_stop.wait(interval):
+            try:
+                self.check_external_changes()
+            except Exception:
+                # Netzlaufwerk kurz weg o.ä. -> beim nächsten Intervall erneut versuchen
+                continue
+
+    def _merge_external(self) -> set:
+        """Liest geänderte Dateien erneut und mischt sie ein (Aufrufer hält _io_lock)."""
+        signature = self._storage_signature()
+        if signature == self._known_signature:
+            return set()
+        try:
+            # Unter der Sperre: nie ein halb kompaktierter Stand (Snapshot neu, Journal noch da)
+            with self.storage.lock():
+                records = self.storage.load_changes() if self.storage.exists() else []
+        except Exception:
+            # Datei evtl. gerade in Bearbeitung -> beim nächsten Mal erneut versuchen
+            return set()
+        with self._lock:
+            changed = self._merge_records(records)
+            if self.archive is not None and self._archive_loaded and signature[-1] != self._known_signature[-1]:
+                changed |= self._add_archived(self.archive.load())
+        self._known_signature = signature
+        return changed
+
+    def _merge_records(self, records: List[dict]) -> set:
+        """Mischt den Stand einer anderen Instanz je Patient-ID und Feld ein (Drei-Wege-Vergleich).
+
+        Basis ist der zuletzt gelesene/geschriebene Stand (_persisted). Fremd geänderte
+        Felder werden übernommen, solange sie lokal unverändert sind; bei gleichzeitiger
+        Änderung desselben Felds bleibt die lokale Eingabe und wird beim nächsten
+        Speichern geschrieben. Als lokal geändert gelten auch Felder, die bereits
+        gesetzt, aber noch nicht an update_patient übergeben wurden (Patient.dirty_fields).
+        Unveränderte Patienten werden nicht angefasst.
+        """
+        disk = {r["id"]: r for r in records}
+        changed = set()
+        for pid in [pid for pid in self._persisted if pid not in disk]:
+            if pid in self._dirty_ids:
+                # Fremd gelöscht, aber lokal bearbeitet -> beim Speichern vollständig neu anlegen
+                self._persisted.pop(pid)
+            elif self._drop_patient(pid):
+                changed.add(pid)
+        for pid, theirs in disk.items():
+            base = self._persisted.get(pid)
+            if base is not None and all(base.get(k) == v for k, v in theirs.items()):
+                continue
+            base = base or {}
+            i = self._index.get(pid)
+            if i is None:
+                self._index[pid] = len(self.patients)
+                self.patients.append(theirs)
+                self._index_patient(theirs)
+            else:
+                # Anderswo wieder eingeblendet -> steht wieder in der Patientendatei
+                self._archived.discard(pid)
+                current = self.patients.raw(i)
+                if isinstance(current, dict) and pid not in self._dirty_ids:
+                    merged = {**current, **theirs}
+                    self.patients.set_raw(i, merged)
+                    self._index_patient(merged)
+                else:
+                    patient = self.patients[i]
+                    mine = patient.model_dump()
+                    # Eigene geschriebene Werte, die in der Datei fehlen -> wie lokale Änderungen behandeln
+                    lost = self._lost_writes(pid, theirs, mine)
+                    if lost:
+                        self._dirty_ids.add(pid)
+                        self._dirty_fields.setdefault(pid, set()).update(lost)
+                    local = pid in self._dirty_ids
+                    # Bereits gesetzte, aber noch nicht per update_patient übernommene Eingaben
+                    editing = patient.dirty_fields | lost
+                    for k, v in theirs.items():
+                        if k == "id" or k not in mine or (k in base and base[k] == v):
+                            continue
+                        # Fremd geändert: übernehmen, sofern lokal unverändert
+                        if k not in editing and (not local or mine[k] == base.get(k)):
+                            # Direkt setzen: fremde Änderungen zählen nicht als lokal geändert
+                            patient.__dict__[k] = v
+                    self._index_patient(patient)
+            self._persisted[pid] = {**base, **theirs}
+            self._bump_revision(pid)
+            changed.add(pid)
+        return changed
+
+    def _lost_writes(self, patient_id: str, theirs: dict, mine: dict) -> Set[str]:
+        """Felder, die diese Instanz geschrieben hat, deren Wert in der Datei aber fehlt.
+
+        Steht dort wieder der Wert von vor dem eigenen Schreiben (z.B. weil das Journal
+        samt der eigenen Deltas verworfen wurde), ist der Schreibvorgang verloren und der
+        eigene Wert gilt weiter – je Schreibvorgang nur einmal, damit zwei Arbeitsplätze
+        nicht endlos gegeneinander schreiben. Steht dort der eigene Wert, ist er
+        bestätigt; steht dort ein dritter Wert, wurde er anderswo bewusst überschrieben.
+        """
+        own = self._written.get(patient_id)
+        if not own:
+            return set()
+        lost = set()
+        for field, (before, after) in list(own.items()):
+            if field not in theirs:
+                continue
+            if theirs[field] == before and before != after and mine.get(field) == after:
+                lost.add(field)
+                own[field] = (_REAPPLIED, after)
+            else:
+                del own[field]
+        if not own:
+            del self._written[patient_id]
+        return lost
+
+    def _drop_patient(self, patient_id: str) -> bool:
+        """Entfernt einen Patienten nur aus dem Speicher und den Indizes."""
+        i = self._index.pop(patient_id, None)
+        if i is None:
+            return False
+        del self.patients[i]
+        self._delete_flags(i)
+        self._unindex_patient(patient_id)
+        self._revisions.pop(patient_id, None)
+        self._persisted.pop(patient_id, None)
+        self._dirty_ids.discard(patient_id)
+        self._dirty_fields.pop(patient_id, None)
+        self._reindex(i)
+        return True
+
+    def _mark_written(self, count: int):
+        """Zieht geschriebene Änderungen von den ausstehenden ab."""
+        with self._lock:
+            self._pending_writes = max(0, self._pending_writes - count)
+            if not self._pending_writes:
+                self._first_pending = None
+                self._last_pending = None
+
+    @property
+    def pending_writes(self) -> int:
+        """Anzahl der Änderungen, die noch nicht in die Datei geschrieben wurden."""
+        return self._pending_writes
+
+    def flush(self):
+        """Schreibt ausstehende Änderungen sofort in die Datei."""
+        if self._pending_writes or self._dirty_ids:
+            self._persist()
+
+    def close(self):
+        """Beendet den Hintergrund-Writer und schreibt ausstehende Änderungen."""
+        self._watch_stop.set()
+        if self._watcher and self._watcher is not threading.current_thread():
+            self._watcher.join()
+        with self._lock:
+            self._closed = True
+            self._writer_wakeup.notify_all()
+        if self._writer and self._writer is not threading.current_thread():
+            self._writer.join()
+        try:
+            self.flush()
+            self._write_snapshot()
+        finally:
+            self.storage.close()
+
+    def add_save_error_listener(self, callback: Callable[[Exception], None]):
+        """Registriert einen Beobachter für Schreibfehler des Hintergrund-Writers."""
+        self._error_listeners.append(callback)
+
+    def _request_save(self):
+        """Speichert sofort oder merkt die Änderung für den Hintergrund-Writer vor."""
+        if self.write_delay <= 0 or self._closed:
+            self._persist()
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._pending_writes += 1
+            if self._first_pending is None:
+                self._first_pending = now
+            self._last_pending = now
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="DataManagerWriter", daemon=True)
+                self._writer.start()
+            self._writer_wakeup.notify()
+
+    def _writer_loop(self):
+        retry_delay = SAVE_RETRY_DELAY
+        while True:
+            with self._lock:
+                while not self._pending_writes and not self._closed:
+                    self._writer_wakeup.wait()
+                if self._closed:
+                    return
+                # Warten, bis die Ruhephase vorbei oder die maximale Verzögerung erreicht ist
+                while self._pending_writes and not self._closed:
+                    deadline = min(
+                        self._last_pending + self.write_delay,
+                        self._first_pending + self.max_write_delay
+                    )
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._writer_wakeup.wait(remaining)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as ex:
+                # Änderungen bleiben ausstehend -> nach einer Pause erneut versuchen
+                self.last_save_error = ex
+                for callback in list(self._error_listeners):
+                    callback(ex)
+                retry_at = time.monotonic() + retry_delay
+                with self._lock:
+                    while not self._closed and time.monotonic() < retry_at:
+                        self._writer_wakeup.wait(retry_at - time.monotonic())
+                retry_delay = min(retry_delay * 2, SAVE_RETRY_MAX_DELAY)
+            else:
+                self.last_save_error = None
+                retry_delay = SAVE_RETRY_DELAY
 
     def add_patient(self, patient: Patient):
         """Fügt einen neuen Patienten hinzu und speichert."""
-        self.patients.append(patient)
-        self.save()
+        with self._lock:
+            self._index[patient.id] = len(self.patients)
+            self.patients.append(patient)
+            self._index_patient(patient)
+            self._bump_revision(patient.id)
+            self._dirty_ids.add(patient.id)
+            patient.pop_dirty_fields()
+        self._request_save()
+
+    def remove_patient(self, patient_id: str) -> bool:
+        """Entfernt einen Patienten endgültig und speichert."""
+        with self._io_lock, self.storage.lock():
+            # Fremde Änderungen zuerst einmischen, damit ein Snapshot sie nicht überschreibt
+            changed = self._merge_external()
+            with self._lock:
+                archived = patient_id in self._archived
+                removed = self._drop_patient(patient_id)
+                self._archived.discard(patient_id)
+            if removed:
+                if archived:
+                    self.archive.remove([patient_id])
+                elif not self.storage.delete(patient_id):
+                    # Löschungen lassen sich im Journal nicht als Delta ausdrücken -> vollständiger Snapshot
+                    self.save()
+                self._remember_signature()
+        self._notify(changed - {patient_id})
+        return removed
 
     def get_patient_by_id(self, patient_id: str) -> Optional[Patient]:
         """Sucht einen Patienten anhand seiner ID."""
-        return next((p for p in self.patients if p.id == patient_id), None)
+        i = self._index.get(patient_id)
+        return self.patients[i] if i is not None else None
 
     def update_patient(self, patient: Patient) -> bool:
-        """Aktualisiert die Daten eines Patienten."""
-        for i, p in enumerate(self.patients):
-            if p.id == patient.id:
+        """Übernimmt die Änderungen eines Patienten.
+
+        Beim gespeicherten Objekt selbst zählen die seit dem letzten Aufruf gesetzten
+        Felder (Patient.dirty_fields), bei einem Ersatzobjekt die Unterschiede zum
+        bisherigen Stand. Indizes, Revision und Speichern betreffen nur diese Felder;
+        ohne Änderung passiert nichts.
+        """
+        with self._lock:
+            i = self._index.get(patient.id)
+            if i is None:
+                return False
+            current = self.patients.raw(i)
+            if current is patient:
+                fields = patient.pop_dirty_fields()
+            else:
+                old = current if isinstance(current, dict) else current.__dict__
+                fields = {f for f, v in patient.__dict__.items() if old.get(f) != v}
+                patient.pop_dirty_fields()
                 self.patients[i] = patient
-                self.save()
+            if not fields:
                 return True
-        return False
+            self._index_patient(patient, fields)
+            self._bump_revision(patient.id)
+            self._dirty_ids.add(patient.id)
+            self._dirty_fields.setdefault(patient.id, set()).update(fields)
+        self._request_save()
+        return True
+
+    def get_revision(self, patient_id: str) -> int:
+        """Gibt den Änderungszähler eines Patienten zurück (steigt bei jeder Änderung über update_patient)."""
+        return self._revisions.get(patient_id, 0)
+
+    def get_dirty_fields(self, patient_id: str) -> Set[str]:
+        """Geänderte, noch nicht geschriebene Felder eines Patienten."""
+        with self._lock:
+            return set(self._dirty_fields.get(patient_id, ()))
+
+    def _bump_revision(self, patient_id: str):
+        self._revisions[patient_id] = self._revisions.get(patient_id, 0) + 1
 
     def get_active_patients(self) -> List[Patient]:
         """Gibt alle nicht-versteckten Patienten zurück."""
-        return [p for p in self.patients if not p.hidden]
+        return [self.patients[i] for i in range(len(self.patients)) if not self.patients.is_hidden(i)]
+
+    def search_patients(self, query: str, fuzzy: bool = True, within: Optional[Iterable[str]] = None) -> List[Patient]:
+        """Volltextsuche über alle Textfelder (Präfix, z.B. "mero" oder "antiinfektiva:mero").
+
+        Exakte Treffer sind nach Bettplatz sortiert. Mit fuzzy=True werden ähnliche
+        Namen/Bettplätze (Tippfehler) nach Ähnlichkeit sortiert angehängt.
+        within beschränkt die exakte Suche auf diese IDs (z.B. vorherige Treffer).
+        Archivierte Patienten werden dafür bei Bedarf nachgeladen. Eine Anfrage ohne
+        Suchbegriff liefert wie ohne Suche die aktiven Patienten nach Bettplatz.
+        """
+        if not self._search_index.has_terms(query):
+            return list(self.iter_sorted_patients())
+        self.load_archive()
+        with self._lock:
+            self._build_search_index()
+            ids = self._search_index.search(query, within)
+            results = self.sort_patients(self.patients[self._index[pid]] for pid in ids)
+            if fuzzy and ":" not in query:
+                results.extend(p for p in self.fuzzy_search_patients(query) if p.id not in ids)
+            return results
+
+    def fuzzy_search_patients(self, query: str, limit: int = 20) -> List[Patient]:
+        """Fehlertolerante Suche über Name und Bettplatz, nach Ähnlichkeit sortiert."""
+        self.load_archive()
+        with self._lock:
+            return [self.patients[self._index[pid]] for pid, _ in self._fuzzy_index.search(query, limit)]
+
+    def iter_sorted_patients(self, include_hidden: bool = False, summary: bool = False) -> Iterator[Patient]:
+        """Iteriert in Bettplatz-Reihenfolge über die aktiven (bzw. alle, inkl. Archiv) Patienten.
+
+        Mit summary=True werden noch nicht geladene Patienten nur mit den Feldern
+        der Rohdaten bzw. des Index geliefert (PatientList.summary) – genug für
+        Listen und Sidebar, ohne Patientendateien zu lesen.
+        """
+        if include_hidden:
+            self.load_archive()
+        get = self.patients.summary if summary else self.patients.__getitem__
+        with self._lock:
+            # Ausgeblendete Rohdaten werden dabei nicht validiert
+            ordered = [
+                get(i) for i in (self._index[pid] for _, _, pid in self._sorted)
+                if include_hidden or not self.patients.is_hidden(i)
+            ]
+        yield from ordered
+
+    def _support_bits(self, any_of: Iterable[str] = (), all_of: Iterable[str] = (), none_of: Iterable[str] = (),
+                      include_hidden: bool = False) -> int:
+        """Positionen (als Bitmenge) der Patienten, die den Flag-Bedingungen genügen (Aufrufer hält _lock)."""
+        for flag in (*any_of, *all_of, *none_of):
+            if flag not in self._flag_bits:
+                raise ValueError(f"Unbekanntes Unterstützungs-Flag: {flag}")
+        bits = (1 << len(self.patients)) - 1
+        if not include_hidden:
+            bits &= ~self._hidden_bits
+        if any_of:
+            union = 0
+            for flag in any_of:
+                union |= self._flag_bits[flag]
+            bits &= union
+        for flag in all_of:
+            bits &= self._flag_bits[flag]
+        for flag in none_of:
+            bits &= ~self._flag_bits[flag]
+        return bits
+
+    def find_by_support(self, any_of: Iterable[str] = (), all_of: Iterable[str] = (), none_of: Iterable[str] = (),
+                        include_hidden: bool = False, summary: bool = False) -> List[Patient]:
+        """Patienten nach Unterstützung, nach Bettplatz sortiert.
 
-    def search_patients(self, query: str) -> List[Patient]:
-        """Sucht Patienten nach Name (case-insensitive)."""
-        query = query.lower()
-        return [
-            p for p in self.patients 
-            if query in p.name.lower()
-        ]
+        any_of: mindestens eines der Flags (z.B. ECMO oder Impella), all_of: alle,
+        none_of: keines (z.B. beatmet, aber nicht sediert). Mit include_hidden
+        werden ausgeblendete Patienten einschließlich Archiv berücksichtigt.
+        """
+        get = self.patients.summary if summary else self.patients.__getitem__
+        with self._lock:
+            ids = sorted(self.support_ids(any_of, all_of, none_of, include_hidden), key=lambda pid: self._sort_entries[pid][1])
+            return [get(self._index[pid]) for pid in ids]
 
-    def sort_patients(self, patients_list: List[Patient]) -> List[Patient]:
+    def support_ids(self, any_of: Iterable[str] = (), all_of: Iterable[str] = (), none_of: Iterable[str] = (),
+                    include_hidden: bool = False) -> Set[str]:
+        """IDs der Patienten nach Unterstützung (Bedingungen wie bei find_by_support), z.B. als Filter für Suchtreffer."""
+        if include_hidden:
+            self.load_archive()
+        with self._lock:
+            bits = self._support_bits(any_of, all_of, none_of, include_hidden)
+            return {field_value(self.patients.raw(i), "id") for i in _iter_bits(bits)}
+
+    def count_support(self, any_of: Iterable[str] = (), all_of: Iterable[str] = (), none_of: Iterable[str] = (),
+                      include_hidden: bool = False) -> Dict[str, int]:
+        """Anzahl Patienten je Flag (optional innerhalb einer Kohorte wie bei find_by_support)."""
+        if include_hidden:
+            self.load_archive()
+        with self._lock:
+            bits = self._support_bits(any_of, all_of, none_of, include_hidden)
+            return {flag: (bits & flag_bits).bit_count() for flag, flag_bits in self._flag_bits.items()}
+
+    def get_bed_key(self, patient_id: str) -> Optional[Tuple[str, str, str]]:
+        """Zerlegter Bettplatz (Station, Zimmer, Bett) aus dem Cache."""
+        return self._bed_keys.get(patient_id)
+
+    def get_stations(self, include_hidden: bool = False) -> List[Tuple[str, int]]:
+        """Stationen (natürlich sortiert) mit der Anzahl ihrer aktiven (bzw. aller) Patienten.
+
+        Stationen ohne aktive Patienten entfallen, außer mit include_hidden.
+        """
+        if include_hidden:
+            self.load_archive()
+        with self._lock:
+            stations = []
+            for station in sorted(self._station_sorted, key=natural_sort_key):
+                entries = self._station_sorted[station]
+                if include_hidden:
+                    count = len(entries)
+                else:
+                    count = sum(1 for _, _, pid in entries if not self.patients.is_hidden(self._index[pid]))
+                if count:
+                    stations.append((station, count))
+            return stations
+
+    def iter_station_patients(self, station: str, include_hidden: bool = False, summary: bool = False) -> Iterator[Patient]:
+        """Wie iter_sorted_patients, aber nur für eine Station (über deren Teilindex)."""
+        if include_hidden:
+            self.load_archive()
+        get = self.patients.summary if summary else self.patients.__getitem__
+        with self._lock:
+            ordered = [
+                get(i) for i in (self._index[pid] for _, _, pid in self._station_sorted.get(station, ()))
+                if include_hidden or not self.patients.is_hidden(i)
+            ]
+        yield from ordered
+
+    def sort_patients(self, patients_list: Iterable[Patient]) -> List[Patient]:
         """Sortiert Patienten nach Bettplatz (natürliche Sortierung)."""
-        return sorted(
-            patients_list, 
-            key=lambda p: natural_sort_key(p.bettplatz)
-        )
+        return sorted(patients_list, key=self.sort_key)
+
+    def sort_key(self, patient: Patient) -> tuple:
+        """Sortierschlüssel nach Bettplatz (aus dem Cache, falls aktuell)."""
+        entry = self._sort_entries.get(patient.id)
+        if entry is not None and entry[0] == patient.bettplatz:
+            return entry[1]
+        # Unbekannte Patienten: gleiche Schlüssel behalten ihre Reihenfolge (stabile Sortierung)
+        return (tuple(natural_sort_key(patient.bettplatz)), self._sort_seq, "")
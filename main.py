@@ -1,14 +1,22 @@
+import time
+# Startzeit vor allen übrigen Importen festhalten (Zeitmessung des Programmstarts)
+STARTED = time.perf_counter()
+from startup_timing import STARTUP_LOG_ENV, StartupTimer
+startup = StartupTimer(STARTED)
 import flet as ft
 import os
+import atexit
 from data_manager import DataManager, Patient
-from utils import get_resource_path
+from utils import find_patient_file, get_cache_dir, get_resource_path
 from components.sidebar import Sidebar
 from components.dialogs import open_quick_add_dialog, open_uebergabe_dialog
 from views.home_view import get_home_view
 from views.patient_view import get_patient_view
-from views.export_view import get_export_view
+startup.mark("importe")
 
 def main(page: ft.Page):
+    # Start der Flet-Laufzeit bzw. des Clients getrennt vom Laden der Daten messen
+    startup.mark("flet")
     # App Konfiguration
     page.title = "Patienten Übersicht"
     page.theme_mode = ft.ThemeMode.LIGHT
@@ -16,10 +24,43 @@ def main(page: ft.Page):
     page.window.height = 800
     page.window.icon = get_resource_path("logo.png")
     
-    # Data Manager initialisieren
-    dm = DataManager("patients.yaml")
+    # Data Manager initialisieren (Autosave gebündelt im Hintergrund, Deltas im Journal,
+    # ausgeblendete Patienten im Archiv).
+    # Liegt eine patients.db (SQLite) bzw. ein Ordner patients.d (eine Datei je Patient)
+    # neben der App, wird dieser statt der patients.yaml verwendet.
+    # Der Start-Snapshot (lokal) erspart bei unveränderter Datei das Parsen und Validieren.
+    dm = DataManager(find_patient_file(), write_delay=0.5, max_write_delay=3.0, journal=True, archive=True, snapshot_dir=get_cache_dir())
+    atexit.register(dm.close)
+    startup.mark("laden")
+
+    def show_save_error(ex):
+        # Änderungen bleiben ausstehend, der Hintergrund-Writer versucht es erneut
+        page.overlay.append(ft.SnackBar(
+            content=ft.Text(f"Speichern fehlgeschlagen, neuer Versuch läuft: {ex}"),
+            bgcolor=ft.Colors.RED_700,
+            open=True
+        ))
+        page.update()
+
+    dm.add_save_error_listener(show_save_error)
+
+    async def on_window_event(e):
+        if e.type == ft.WindowEventType.CLOSE:
+            try:
+                dm.close()
+            finally:
+                # Auch wenn das letzte Speichern scheitert, muss sich das Fenster schließen lassen
+                await page.window.destroy()
+
+    page.window.prevent_close = True
+    page.window.on_event = on_window_event
 
     def navigate_to(view_name, patient_id=None):
+        # Beim Verlassen einer Ansicht ausstehende Änderungen sofort schreiben
+        try:
+            dm.flush()
+        except Exception as ex:
+            show_save_error(ex)
         page.session.store.set("current_view", view_name)
         if patient_id:
             page.session.store.set("current_patient_id", patient_id)
@@ -40,6 +81,8 @@ def main(page: ft.Page):
     # UI Komponenten
     sidebar = Sidebar(dm, on_navigate=navigate_to, on_add_patient=add_new_patient)
     content_area = ft.Container(expand=True, padding=15)
+    # Aufgeklappte Stationen der Übersicht bleiben beim Wechsel zwischen Ansichten erhalten
+    expanded_stations = set()
     
     layout = ft.Row([
         ft.Container(sidebar, bgcolor=ft.Colors.SURFACE_CONTAINER, padding=5),
@@ -56,7 +99,8 @@ def main(page: ft.Page):
                 on_navigate=navigate_to, 
                 on_quick_add=on_quick_add,
                 on_edit_uebergabe=on_edit_uebergabe,
-                update_sidebar=sidebar.update_sidebar
+                update_sidebar=sidebar.update_sidebar,
+                expanded_stations=expanded_stations
             )
         elif view_name == "patient":
             pid = page.session.store.get("current_patient_id")
@@ -67,12 +111,30 @@ def main(page: ft.Page):
                 update_sidebar=sidebar.update_sidebar
             )
         elif view_name == "export":
+            # Export-Ansicht erst beim ersten Öffnen importieren
+            from views.export_view import get_export_view
             content_area.content = get_export_view(page, dm, on_navigate=navigate_to)
             
         page.update()
 
+    def on_external_change(changed_ids):
+        # Änderungen anderer Arbeitsplätze: nur betroffene Ansichten aktualisieren
+        sidebar.update_sidebar()
+        view_name = page.session.store.get("current_view") or "home"
+        if view_name == "home":
+            content_area.content.data()
+        elif view_name == "patient" and page.session.store.get("current_patient_id") in changed_ids:
+            update_view()
+            return
+        page.update()
+
     page.add(layout)
     update_view()
+    startup.mark("darstellung")
+    startup.write(os.environ.get(STARTUP_LOG_ENV))
+    # Gemeinsame Datei (z.B. Netzlaufwerk) regelmäßig auf fremde Änderungen prüfen
+    dm.add_change_listener(on_external_change)
+    dm.start_watching(interval=2.0)
 
 if __name__ == "__main__":
     # Assets Verzeichnis für Logo etc.
@@ -0,0 +1,81 @@
+"""Kommandozeile ohne GUI (kein Flet-Import), z.B. für die Schichtübergabe per Skript.
+
+Aufruf:
+    python -m patient_tool export --fields name,bettplatz,diagnosen --format txt --only-active
+    python -m patient_tool export --format pdf -o uebergabe.pdf --stations
+    python -m patient_tool convert patients.yaml patients.db
+"""
+import argparse
+import sys
+from data_manager import convert_storage, iter_stored_patients
+from utils import DEFAULT_EXPORT_FIELDS, EXPORT_FIELD_ORDER, find_patient_file, iter_patient_export, natural_sort_key
+
+EXPORT_FIELDS = ["name", *EXPORT_FIELD_ORDER]
+
+def parse_fields(value):
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in EXPORT_FIELDS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unbekannte Felder: {', '.join(unknown)} (verfügbar: {', '.join(EXPORT_FIELDS)})")
+    return fields
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="patient_tool", description="Patienten Tool ohne Oberfläche")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Patienten als Text oder PDF exportieren")
+    export.add_argument("--file", default=None, help="Patientendatei (Standard: wie die App patients.db, patients.d oder patients.yaml neben der App)")
+    export.add_argument("--fields", type=parse_fields, default=DEFAULT_EXPORT_FIELDS,
+                        help=f"Kommagetrennte Felder (Standard: {','.join(DEFAULT_EXPORT_FIELDS)})")
+    export.add_argument("--format", choices=["txt", "pdf"], default="txt")
+    export.add_argument("--only-active", action="store_true", help="Ausgeblendete Patienten weglassen")
+    export.add_argument("--order", choices=["bett", "datei"], default="bett",
+                        help="bett: nach Bettplatz sortiert; datei: Dateireihenfolge, konstanter Speicherbedarf")
+    export.add_argument("--stations", action="store_true", help="PDF mit einem Abschnitt je Station")
+    export.add_argument("-o", "--output", default=None, help="Zieldatei (Text: Standard ist stdout)")
+
+    convert = commands.add_parser("convert", help="Patientendatei in ein anderes Format übertragen (YAML <-> SQLite)")
+    convert.add_argument("source", help="Quelldatei (.yaml oder .db)")
+    convert.add_argument("target", help="Zieldatei (.yaml oder .db), wird überschrieben")
+    return parser
+
+def select_patients(args):
+    # Das Archiv enthält nur ausgeblendete Patienten
+    patients = iter_stored_patients(args.file or find_patient_file(), include_archive=not args.only_active)
+    if args.only_active:
+        patients = (p for p in patients if not p.hidden)
+    if args.order == "bett":
+        # Sortieren braucht alle ausgewählten Patienten gleichzeitig
+        patients = iter(sorted(patients, key=lambda p: natural_sort_key(p.bettplatz)))
+    return patients
+
+def export(args):
+    patients = select_patients(args)
+    if args.format == "pdf":
+        if not args.output:
+            raise SystemExit("Für den PDF-Export ist --output erforderlich.")
+        from utils import create_patient_pdf, create_station_pdf
+        create_pdf = create_station_pdf if args.stations else create_patient_pdf
+        create_pdf(list(patients), args.fields, args.output)
+        return 0
+
+    chunks = iter_patient_export(patients, args.fields)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.writelines(chunks)
+    else:
+        sys.stdout.writelines(chunks)
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "export":
+        return export(args)
+    if args.command == "convert":
+        count = convert_storage(args.source, args.target)
+        print(f"{count} Patienten nach {args.target} übertragen", file=sys.stderr)
+        return 0
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
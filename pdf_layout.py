@@ -0,0 +1,199 @@
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from fpdf import FPDF
+from fpdf.fonts import CORE_FONTS_CHARWIDTHS
+
+# Seitengeometrie (A4, mm) – entspricht den FPDF-Standardwerten
+PAGE_WIDTH = 210
+PAGE_HEIGHT = 297
+MARGIN = 10
+CELL_MARGIN = MARGIN / 10
+TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN - 2 * CELL_MARGIN
+
+FONT_SIZE = 10
+LINE_HEIGHT = 5
+BLOCK_SPACING = 5
+TITLE_HEIGHT = 10
+# Erste Zeile unterhalb eines Seitentitels
+CONTENT_START_Y = MARGIN + TITLE_HEIGHT + 5
+FOOTER_FONT_SIZE = 8
+# Unterer Rand für die Blockplanung bzw. den automatischen Umbruch
+MARGIN_BOTTOM = 20
+AUTO_BREAK_MARGIN = 15
+PAGE_BOTTOM = PAGE_HEIGHT - MARGIN_BOTTOM
+PAGE_BREAK_TRIGGER = PAGE_HEIGHT - AUTO_BREAK_MARGIN
+
+_PT_TO_MM = 25.4 / 72
+
+class PdfExportCancelled(Exception):
+    """Die PDF-Erzeugung wurde über das Abbruch-Event beendet."""
+
+def check_cancelled(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise PdfExportCancelled()
+
+class PdfLine(NamedTuple):
+    y: float
+    text: str
+    bold: bool
+
+class PdfPage(NamedTuple):
+    lines: List[PdfLine]
+    separators: List[float]
+    title: Optional[str] = None
+
+class GlyphWidths:
+    """Zeichenbreiten einer Helvetica-Variante (Latin-1) in mm; Tabellen werden je Schnitt/Größe gecacht."""
+
+    _tables: Dict[Tuple[str, float], Dict[str, float]] = {}
+
+    def __init__(self, bold: bool = False, size: float = FONT_SIZE):
+        key = ("helveticaB" if bold else "helvetica", size)
+        table = self._tables.get(key)
+        if table is None:
+            scale = size * _PT_TO_MM / 1000
+            table = {c: w * scale for c, w in CORE_FONTS_CHARWIDTHS[key[0]].items()}
+            self._tables[key] = table
+        self.table = table
+        self._default = table[" "]
+
+    def width(self, text: str) -> float:
+        get = self.table.get
+        default = self._default
+        return sum(get(c, default) for c in text)
+
+    def wrap(self, text: str, max_width: float = TEXT_WIDTH) -> List[str]:
+        """Bricht eine Zeile an Leerzeichen um (zu lange Wörter zeichenweise), wie FPDF.multi_cell."""
+        if self.width(text) <= max_width:
+            return [text]
+        get = self.table.get
+        default = self._default
+        lines = []
+        start = 0
+        sep = -1
+        width = 0.0
+        i = 0
+        n = len(text)
+        while i < n:
+            c = text[i]
+            if c == " ":
+                sep = i
+            width += get(c, default)
+            if width > max_width:
+                if sep == -1:
+                    if i == start:
+                        i += 1
+                    lines.append(text[start:i])
+                else:
+                    lines.append(text[start:sep])
+                    i = sep + 1
+                start = i
+                sep = -1
+                width = 0.0
+                continue
+            i += 1
+        if start < n:
+            lines.append(text[start:])
+        return lines
+
+def wrap_block(text: str, regular: Optional[GlyphWidths] = None, bold: Optional[GlyphWidths] = None) -> List[Tuple[str, bool]]:
+    """Bricht einen Patientenblock um; die erste Zeile (Name) ist fett."""
+    regular = regular or GlyphWidths()
+    bold = bold or GlyphWidths(bold=True)
+    wrapped = []
+    for i, line in enumerate(text.splitlines()):
+        metrics = bold if i == 0 else regular
+        wrapped.extend((part, i == 0) for part in metrics.wrap(line))
+    return wrapped
+
+def layout_blocks(texts: Sequence[str]) -> List[List[Tuple[str, bool]]]:
+    """Bricht mehrere Patientenblöcke um (z.B. eine Station)."""
+    regular = GlyphWidths()
+    bold = GlyphWidths(bold=True)
+    return [wrap_block(text, regular, bold) for text in texts]
+
+def paginate(blocks: Sequence[List[Tuple[str, bool]]], start_y: float, title: Optional[str] = None) -> List[PdfPage]:
+    """Verteilt umbrochene Blöcke auf Seiten, ohne Blöcke unnötig zu zerreißen.
+
+    Ist title gesetzt, erhält die erste Seite diesen Titel.
+    """
+    pages = [PdfPage([], [], title)]
+    y = start_y
+
+    def new_page():
+        pages.append(PdfPage([], []))
+        return MARGIN
+
+    for block in blocks:
+        needed_height = len(block) * LINE_HEIGHT + BLOCK_SPACING
+        # Prüfen ob der Block auf die Seite passt
+        if needed_height > (PAGE_BOTTOM - 20):  # Falls Patient > fast ganze Seite
+            if y > 30:  # Nur neue Seite wenn wir nicht schon am Anfang sind
+                y = new_page()
+        elif y + needed_height > PAGE_BOTTOM:
+            y = new_page()
+
+        for text, is_bold in block:
+            # Überlange Blöcke laufen auf der nächsten Seite weiter
+            if y + LINE_HEIGHT > PAGE_BREAK_TRIGGER:
+                y = new_page()
+            pages[-1].lines.append(PdfLine(y, text, is_bold))
+            y += LINE_HEIGHT
+        pages[-1].separators.append(y + 2)
+        y += BLOCK_SPACING
+    return pages
+
+def paginate_sections(sections: Sequence[Tuple[str, Sequence[List[Tuple[str, bool]]]]]) -> List[PdfPage]:
+    """Setzt mehrere Abschnitte (Titel, Blöcke) hintereinander; jeder beginnt auf einer neuen Seite."""
+    pages = []
+    for title, blocks in sections:
+        pages.extend(paginate(blocks, start_y=CONTENT_START_Y, title=title))
+    return pages
+
+def render_pdf(
+    pages: Sequence[PdfPage],
+    filepath: str,
+    progress: Optional[Callable[[float], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    page_numbers: bool = False,
+):
+    """Gibt vorab berechnete Seiten aus; Schriftwechsel nur bei Stilwechsel.
+
+    progress erhält den Anteil fertiger Seiten (0..1); ist cancel_event gesetzt,
+    wird mit PdfExportCancelled abgebrochen, bevor eine Datei geschrieben wird.
+    Mit page_numbers erhält jede Seite die Fußzeile "Seite x von y".
+    """
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=False)
+    pdf.set_draw_color(200, 200, 200)
+    current_style = None
+    text_x = MARGIN + CELL_MARGIN
+    # Grundlinie innerhalb einer Zeile (wie FPDF.cell: vertikal zentriert)
+    baseline_offset = 0.5 * LINE_HEIGHT + 0.3 * FONT_SIZE * _PT_TO_MM
+
+    for page_no, page in enumerate(pages):
+        check_cancelled(cancel_event)
+        pdf.add_page()
+        if page.title:
+            pdf.set_font("helvetica", style="B", size=14)
+            pdf.cell(0, TITLE_HEIGHT, page.title)
+            current_style = None
+        if page_numbers:
+            pdf.set_font("helvetica", size=FOOTER_FONT_SIZE)
+            pdf.set_xy(MARGIN, PAGE_HEIGHT - MARGIN - LINE_HEIGHT)
+            pdf.cell(PAGE_WIDTH - 2 * MARGIN, LINE_HEIGHT, f"Seite {page_no + 1} von {len(pages)}", align="C")
+            current_style = None
+        for line in page.lines:
+            style = "B" if line.bold else ""
+            if style != current_style:
+                pdf.set_font("helvetica", style=style, size=FONT_SIZE)
+                current_style = style
+            # text() statt cell(): gleiche Position wie eine linksbündige Zelle, ohne erneute Messung
+            pdf.text(text_x, line.y + baseline_offset, line.text)
+        for y in page.separators:
+            pdf.line(MARGIN, y, PAGE_WIDTH - MARGIN, y)
+        if progress:
+            progress((page_no + 1) / len(pages))
+
+    check_cancelled(cancel_event)
+    pdf.output(filepath)
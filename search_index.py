@@ -0,0 +1,296 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Alle durchsuchbaren Textfelder eines Patienten
+TEXT_FIELDS = (
+    "name",
+    "bettplatz",
+    "diagnosen",
+    "nebendiagnosen",
+    "operationen",
+    "weitere_operationen",
+    "kardiale_funktion",
+    "antiinfektiva",
+    "diagnostik",
+    "verlauf",
+    "probleme_aufgaben",
+    "uebergabe",
+)
+
+# Felder für die fehlertolerante Namens-/Bettplatzsuche
+FUZZY_FIELDS = ("name", "bettplatz")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Bis zu dieser Anzahl Kandidaten werden deren Token direkt geprüft, darüber wird
+# die Index-Abfrage mit den Kandidaten geschnitten
+NARROW_DIRECT_LIMIT = 32
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+def field_value(doc, field: str) -> str:
+    """Liest ein Feld aus einem Patienten oder aus dessen Rohdaten (dict)."""
+    value = doc.get(field) if isinstance(doc, dict) else getattr(doc, field, "")
+    return value or ""
+
+def tokenize(text: str) -> Set[str]:
+    """Zerlegt einen Text in normalisierte Suchbegriffe."""
+    if not text:
+        return set()
+    return set(_TOKEN_RE.findall(text.casefold()))
+
+def normalize(text: str) -> str:
+    """Vereinheitlicht Schreibweisen (Groß/Klein, Umlaute, ß, Akzente)."""
+    text = text.lower().translate(_UMLAUTS)
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def trigrams(word: str) -> Set[str]:
+    """Zerlegt ein Wort in Trigramme (mit Randmarkierung)."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def query_extends(previous: str, query: str) -> bool:
+    """True, wenn query die vorherige Anfrage nur verengt (Treffer ⊆ vorherige Treffer).
+
+    Das ist der Fall, wenn lediglich Zeichen angehängt wurden und dabei kein
+    neuer Feldfilter ("feld:") entstanden ist. Eine vorherige Anfrage ohne
+    Suchbegriff (z.B. "antiinfektiva:") hat nichts gefiltert.
+    """
+    has_terms = any(tokenize(term.rpartition(":")[2]) for term in previous.split())
+    return has_terms and query.startswith(previous) and query.count(":") == previous.count(":")
+
+class SearchIndex:
+    """Invertierter Index über die Textfelder der Patienten.
+
+    Unterstützt Präfix-Suche (``mero`` findet ``Meropenem``) und feldbezogene
+    Suche (``antiinfektiva:mero``). Mehrere Begriffe werden UND-verknüpft.
+    """
+
+    def __init__(self, fields: Iterable[str] = TEXT_FIELDS):
+        self.fields = tuple(fields)
+        # Feld -> Token -> Patienten-IDs
+        self._postings: Dict[str, Dict[str, Set[str]]] = {f: {} for f in self.fields}
+        # Feld -> sortierte Token-Liste für Präfix-Suche
+        self._vocab: Dict[str, List[str]] = {f: [] for f in self.fields}
+        # Patienten-ID -> Feld -> Token (zum gezielten Entfernen alter Einträge)
+        self._documents: Dict[str, Dict[str, Set[str]]] = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def clear(self):
+        self._postings = {f: {} for f in self.fields}
+        self._vocab = {f: [] for f in self.fields}
+        self._documents = {}
+
+    def update(self, patient, fields: Optional[Iterable[str]] = None):
+        """Indiziert einen Patienten (oder dessen Rohdaten) neu; nur geänderte Felder werden angefasst.
+
+        Mit fields werden nur diese Felder neu zerlegt, die übrigen bleiben unverändert.
+        """
+        patient_id = field_value(patient, "id")
+        old_doc = self._documents.get(patient_id)
+        if old_doc is None:
+            old_doc, fields = {}, None
+        new_doc = {}
+        for field in self.fields:
+            if fields is not None and field not in fields:
+                if field in old_doc:
+                    new_doc[field] = old_doc[field]
+                continue
+            new_tokens = tokenize(field_value(patient, field))
+            old_tokens = old_doc.get(field, set())
+            if new_tokens != old_tokens:
+                for token in old_tokens - new_tokens:
+                    self._remove_posting(field, token, patient_id)
+                for token in new_tokens - old_tokens:
+                    self._add_posting(field, token, patient_id)
+            if new_tokens:
+                new_doc[field] = new_tokens
+        self._documents[patient_id] = new_doc
+
+    def remove(self, patient_id: str):
+        """Entfernt alle Einträge eines Patienten aus dem Index."""
+        doc = self._documents.pop(patient_id, None)
+        if not doc:
+            return
+        for field, tokens in doc.items():
+            for token in tokens:
+                self._remove_posting(field, token, patient_id)
+
+    def has_terms(self, query: str) -> bool:
+        """False für Anfragen ohne Suchbegriff (leer, "-", "antiinfektiva:" während der Eingabe)."""
+        return bool(self._parse(query))
+
+    def search(self, query: str, candidates: Optional[Iterable[str]] = None) -> Optional[Set[str]]:
+        """Gibt die IDs aller Patienten zurück, die alle Suchbegriffe enthalten.
+
+        Mit candidates wird nur innerhalb dieser IDs gesucht (Verengung einer
+        vorherigen Trefferliste, siehe query_extends). Liefert None bei leerer Anfrage.
+        """
+        terms = self._parse(query)
+        if not terms:
+            return None
+        if candidates is not None:
+            if not isinstance(candidates, (set, frozenset)):
+                candidates = set(candidates)
+            if len(candidates) <= NARROW_DIRECT_LIMIT:
+                return {pid for pid in candidates if self._matches(pid, terms)}
+        result: Optional[Set[str]] = None
+        for fields, prefix in terms:
+            matches = self._match_prefix(fields, prefix)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result if candidates is None else result & candidates
+
+    def _parse(self, query: str) -> List[Tuple[Tuple[str, ...], str]]:
+        """Zerlegt eine Anfrage in (Felder, Präfix)-Paare."""
+        terms = []
+        for term in query.split():
+            field, _, value = term.rpartition(":")
+            field = field.casefold()
+            fields = (field,) if field in self._postings else self.fields
+            if field and field not in self._postings:
+                # Unbekanntes Feld -> Begriff als Ganzes suchen
+                value = term
+            for prefix in tokenize(value):
+                terms.append((fields, prefix))
+        return terms
+
+    def _matches(self, patient_id: str, terms: List[Tuple[Tuple[str, ...], str]]) -> bool:
+        doc = self._documents.get(patient_id)
+        if not doc:
+            return False
+        return all(
+            any(token.startswith(prefix) for field in fields for token in doc.get(field, ()))
+            for fields, prefix in terms
+        )
+
+    def _match_prefix(self, fields: Iterable[str], prefix: str) -> Set[str]:
+        matches: Set[str] = set()
+        for field in fields:
+            vocab = self._vocab[field]
+            postings = self._postings[field]
+            i = bisect_left(vocab, prefix)
+            while i < len(vocab) and vocab[i].startswith(prefix):
+                matches |= postings[vocab[i]]
+                i += 1
+        return matches
+
+    def _add_posting(self, field: str, token: str, patient_id: str):
+        postings = self._postings[field]
+        ids = postings.get(token)
+        if ids is None:
+            postings[token] = {patient_id}
+            insort(self._vocab[field], token)
+        else:
+            ids.add(patient_id)
+
+    def _remove_posting(self, field: str, token: str, patient_id: str):
+        postings = self._postings[field]
+        ids = postings.get(token)
+        if ids is None:
+            return
+        ids.discard(patient_id)
+        if not ids:
+            del postings[token]
+            vocab = self._vocab[field]
+            i = bisect_left(vocab, token)
+            if i < len(vocab) and vocab[i] == token:
+                del vocab[i]
+
+class TrigramIndex:
+    """Fehlertoleranter Index (Trigramme) über Name und Bettplatz.
+
+    "Mueler" findet "Müller": Beide Seiten werden normalisiert und über den
+    Anteil gemeinsamer Trigramme (Dice-Koeffizient) bewertet. Kandidaten kommen
+    ausschließlich aus den Trigramm-Postings, nicht aus einem Vergleich mit
+    allen Patienten.
+    """
+
+    def __init__(self, fields: Iterable[str] = FUZZY_FIELDS):
+        self.fields = tuple(fields)
+        # Trigramm -> Wörter, Wort -> Patienten-IDs, Patienten-ID -> Wörter
+        self._trigram_words: Dict[str, Set[str]] = {}
+        self._word_ids: Dict[str, Set[str]] = {}
+        self._doc_words: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._doc_words)
+
+    def clear(self):
+        self._trigram_words = {}
+        self._word_ids = {}
+        self._doc_words = {}
+
+    def update(self, patient):
+        """Indiziert Name und Bettplatz eines Patienten (oder dessen Rohdaten) neu."""
+        patient_id = field_value(patient, "id")
+        text = " ".join(field_value(patient, f) for f in self.fields)
+        new_words = set(_TOKEN_RE.findall(normalize(text)))
+        old_words = self._doc_words.get(patient_id, set())
+        for word in old_words - new_words:
+            self._remove_word(word, patient_id)
+        for word in new_words - old_words:
+            self._add_word(word, patient_id)
+        self._doc_words[patient_id] = new_words
+
+    def remove(self, patient_id: str):
+        for word in self._doc_words.pop(patient_id, set()):
+            self._remove_word(word, patient_id)
+
+    def search(self, query: str, limit: int = 20, min_score: float = 0.45) -> List[Tuple[str, float]]:
+        """Gibt (Patienten-ID, Score) absteigend nach Ähnlichkeit zurück."""
+        query_words = _TOKEN_RE.findall(normalize(query))
+        if not query_words:
+            return []
+        totals: Dict[str, float] = {}
+        for i, query_word in enumerate(query_words):
+            query_trigrams = trigrams(query_word)
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._trigram_words.get(trigram, ()))
+            # Bester Treffer je Patient für dieses Suchwort
+            best: Dict[str, float] = {}
+            for word, count in shared.items():
+                score = 2 * count / (len(query_trigrams) + len(trigrams(word)))
+                for pid in self._word_ids[word]:
+                    if score > best.get(pid, 0.0):
+                        best[pid] = score
+            if i == 0:
+                totals = best
+            else:
+                totals = {pid: totals[pid] + score for pid, score in best.items() if pid in totals}
+        ranked = [(pid, total / len(query_words)) for pid, total in totals.items()]
+        ranked = [r for r in ranked if r[1] >= min_score]
+        ranked.sort(key=lambda r: -r[1])
+        return ranked[:limit]
+
+    def _add_word(self, word: str, patient_id: str):
+        ids = self._word_ids.get(word)
+        if ids is None:
+            self._word_ids[word] = {patient_id}
+            for trigram in trigrams(word):
+                self._trigram_words.setdefault(trigram, set()).add(word)
+        else:
+            ids.add(patient_id)
+
+    def _remove_word(self, word: str, patient_id: str):
+        ids = self._word_ids.get(word)
+        if ids is None:
+            return
+        ids.discard(patient_id)
+        if ids:
+            return
+        del self._word_ids[word]
+        for trigram in trigrams(word):
+            words = self._trigram_words.get(trigram)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self._trigram_words[trigram]
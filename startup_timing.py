@@ -0,0 +1,46 @@
+"""Zeitmessung des Programmstarts (Importe, Laden, erste Darstellung).
+
+Nutzt nur die Standardbibliothek, damit main.py das Modul vor Flet & Co. importieren kann.
+"""
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Umgebungsvariable: Datei, an die je Start eine Zeile angehängt wird (Verlauf für Regressionen)
+STARTUP_LOG_ENV = "PATIENT_TOOL_STARTUP_LOG"
+
+class StartupTimer:
+    """Misst die Abschnitte des Programmstarts ab einem Startzeitpunkt (perf_counter)."""
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self.marks: List[Tuple[str, float]] = []
+
+    def mark(self, name: str):
+        """Schließt den Abschnitt name ab (Dauer seit der letzten Marke)."""
+        now = time.perf_counter()
+        self.marks.append((name, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self.start
+
+    def report(self) -> str:
+        parts = [f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.marks]
+        parts.append(f"gesamt={self.total * 1000:.0f}ms")
+        return " ".join(parts)
+
+    def write(self, log_filename: Optional[str] = None):
+        """Gibt den Bericht auf stderr aus und hängt ihn ggf. mit Zeitstempel an log_filename an."""
+        report = self.report()
+        print(f"Programmstart: {report}", file=sys.stderr)
+        if not log_filename:
+            return
+        try:
+            with open(log_filename, 'a', encoding='utf-8') as f:
+                f.write(f"{datetime.now().isoformat(timespec='seconds')} {report}\n")
+        except OSError:
+            pass
@@ -0,0 +1,687 @@
+import gzip
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+import yaml
+from datetime import datetime
+from contextlib import nullcontext
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence
+
+# libyaml (C) verwenden, falls verfügbar – um ein Vielfaches schneller als der reine Python-Parser
+_SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# Version des Dateiformats. Ab Version 2 sind alle Datensätze migriert (kein "station"-Feld mehr).
+FORMAT_VERSION = 2
+FORMAT_HEADER = "# patient-tool format:"
+
+def file_signature(path: str) -> Optional[tuple]:
+    """Änderungsmerkmal einer Datei (mtime, Größe); None, wenn sie fehlt.
+
+    Nur stat() – funktioniert auch auf Netzlaufwerken (SMB), wo es keine
+    Dateisystem-Benachrichtigungen gibt.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class FileLock:
+    """Sperrdatei, die Arbeitsplätze auf derselben Patientendatei gegeneinander sperrt.
+
+    Exklusives Anlegen (O_EXCL) funktioniert auch auf Netzlaufwerken (SMB).
+    Eine Sperre, die älter als stale_after Sekunden ist (z.B. nach einem
+    Absturz), wird übernommen; nach timeout Sekunden gibt es TimeoutError.
+    Verschachtelte Aufrufe derselben Instanz sperren nur einmal (Aufrufer
+    serialisieren ihre Threads selbst, siehe DataManager._io_lock).
+    """
+
+    def __init__(self, filename: str, timeout: float = 30.0, stale_after: float = 120.0, poll: float = 0.05):
+        self.filename = filename
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll = poll
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0:
+            self._acquire()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                os.remove(self.filename)
+            except FileNotFoundError:
+                pass
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except (FileExistsError, PermissionError):
+                try:
+                    if time.time() - os.path.getmtime(self.filename) > self.stale_after:
+                        os.remove(self.filename)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Patientendatei ist gesperrt ({self.filename})")
+                time.sleep(self.poll)
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(f"{socket.gethostname()} {os.getpid()}\n")
+            return
+
+def read_format_version(stream) -> int:
+    """Liest die Formatversion aus der ersten Zeile (0 = Datei ohne Kopfzeile)."""
+    line = stream.readline()
+    if line.startswith(FORMAT_HEADER):
+        try:
+            return int(line[len(FORMAT_HEADER):])
+        except ValueError:
+            return 0
+    stream.seek(0)
+    return 0
+
+class StorageBackend:
+    """Persistenzschicht hinter dem DataManager.
+
+    Backends arbeiten mit Rohdaten (ein dict je Patient, wie Patient.model_dump());
+    Validierung und Migration bleiben im DataManager. incremental gibt an, ob
+    write_changes() einzelne Änderungen günstig schreiben kann; andernfalls
+    speichert der DataManager jeweils einen vollständigen Snapshot.
+    """
+
+    incremental = False
+    # Formatversion der zuletzt gelesenen Daten (siehe FORMAT_VERSION)
+    format_version = 0
+    # load() liefert nur Teil-Datensätze (siehe resolve_record)
+    partial_records = False
+
+    def exists(self) -> bool:
+        raise NotImplementedError
+
+    def load(self) -> List[dict]:
+        """Lädt alle Patienten in gespeicherter Reihenfolge."""
+        raise NotImplementedError
+
+    def iter_records(self) -> Iterator[dict]:
+        """Wie load(), aber einzeln und vollständig (Backends können hier streamen)."""
+        return iter(self.load())
+
+    def resolve_record(self, record: dict) -> dict:
+        """Ergänzt einen von load() gelieferten Teil-Datensatz zum vollständigen Datensatz."""
+        return record
+
+    def signature(self) -> tuple:
+        """Ändert sich, sobald ein anderer Prozess den Bestand schreibt (siehe file_signature)."""
+        return (file_signature(self.filename),)
+
+    def load_changes(self) -> List[dict]:
+        """Liest den Bestand erneut, um fremde Änderungen einzumischen (Standard: wie load())."""
+        return self.load()
+
+    def content_digest(self) -> Optional[str]:
+        """Prüfsumme über den gespeicherten Inhalt (Schlüssel für den Start-Snapshot); None: kein Snapshot."""
+        return None
+
+    def lock(self) -> ContextManager:
+        """Sperre über mehrere Arbeitsplätze für Einlesen fremder Änderungen und Schreiben (Standard: keine)."""
+        return nullcontext()
+
+    def save(self, records: List[dict]):
+        """Ersetzt den gesamten Bestand durch records."""
+        raise NotImplementedError
+
+    def write_changes(self, changes: Dict[str, dict]) -> bool:
+        """Schreibt geänderte Felder je Patient (neue Patienten mit allen Feldern).
+
+        Gibt True zurück, wenn das Backend einen vollständigen Snapshot empfiehlt
+        (z.B. zum Kompaktieren).
+        """
+        raise NotImplementedError
+
+    def delete(self, patient_id: str) -> bool:
+        """Löscht einen Patienten direkt. False: nur über einen vollständigen Snapshot möglich."""
+        return False
+
+    def close(self):
+        pass
+
+def iter_yaml_records(stream) -> Iterator[Any]:
+    """Liest die Einträge einer YAML-Liste einzeln, ohne das ganze Dokument im Speicher aufzubauen."""
+    loader = yaml.SafeLoader(stream)
+    try:
+        loader.get_event()  # StreamStart
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()  # DocumentStart
+        if not loader.check_event(yaml.SequenceStartEvent):
+            # Kein Listen-Dokument -> wie bisher vollständig laden
+            yield from loader.construct_document(loader.compose_node(None, None)) or []
+            return
+        loader.get_event()
+        while not loader.check_event(yaml.SequenceEndEvent):
+            yield loader.construct_document(loader.compose_node(None, None))
+    finally:
+        loader.dispose()
+
+def read_journal(journal_filename: str) -> Dict[str, dict]:
+    """Liest ein Journal und fasst die Deltas je Patient zusammen (Reihenfolge des ersten Auftretens)."""
+    changes: Dict[str, dict] = {}
+    if not os.path.exists(journal_filename):
+        return changes
+    with open(journal_filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Unvollständige letzte Zeile (z.B. Absturz beim Schreiben)
+                continue
+            changes.setdefault(entry["id"], {}).update(entry["changes"])
+    return changes
+
+class YamlStorage(StorageBackend):
+    """Eine YAML-Datei (Liste von Patienten), optional mit Journal.
+
+    Mit journal=True werden Änderungen als Delta-Zeilen an eine Log-Datei neben
+    der YAML angehängt und erst bei Überschreiten von journal_max_bytes in den
+    Snapshot übernommen.
+
+    Arbeitsplätze auf derselben Datei sperren sich über <datei>.lock (lock()):
+    Sonst könnte ein Kompaktieren das Journal samt zwischenzeitlich von anderen
+    angehängter Deltas löschen.
+    """
+
+    def __init__(self, filename: str, journal: bool = False, journal_max_bytes: int = 256 * 1024):
+        self.filename = filename
+        self.journal_filename = filename + ".journal"
+        self.journal_max_bytes = journal_max_bytes
+        self.incremental = journal
+        self._file_lock = FileLock(filename + ".lock")
+
+    def lock(self) -> ContextManager:
+        return self._file_lock
+
+    def exists(self) -> bool:
+        return os.path.exists(self.filename)
+
+    def load(self) -> List[dict]:
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            self.format_version = read_format_version(f)
+            data = yaml.load(f, Loader=_SafeLoader) or []
+        return self._replay_journal(data)
+
+    def iter_records(self) -> Iterator[dict]:
+        journal = read_journal(self.journal_filename)
+        if self.exists():
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                self.format_version = read_format_version(f)
+                for record in iter_yaml_records(f):
+                    changes = journal.pop(record.get("id"), None)
+                    if changes:
+                        record.update(changes)
+                    yield record
+        # Nur im Journal vorhandene (neue) Patienten
+        for pid, changes in journal.items():
+            yield {"id": pid, **changes}
+
+    def signature(self) -> tuple:
+        return (file_signature(self.filename), file_signature(self.journal_filename))
+
+    def content_digest(self) -> Optional[str]:
+        digest = hashlib.blake2b(digest_size=16)
+        for filename in (self.filename, self.journal_filename):
+            try:
+                with open(filename, 'rb') as f:
+                    digest.update(f.read())
+            except FileNotFoundError:
+                pass
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _replay_journal(self, data: List[dict]) -> List[dict]:
+        """Spielt die Delta-Einträge des Journals auf den Snapshot ein."""
+        journal = read_journal(self.journal_filename)
+        if not journal:
+            return data
+        records = {d.get("id"): d for d in data}
+        for pid, changes in journal.items():
+            record = records.get(pid)
+            if record is None:
+                record = {"id": pid}
+                records[pid] = record
+                data.append(record)
+            record.update(changes)
+        return data
+
+    def save(self, records: List[dict]):
+        # Atomar ersetzen: andere Arbeitsplätze lesen nie eine halb geschriebene Datei
+        _write_atomic(
+            self.filename,
+            f"{FORMAT_HEADER} {FORMAT_VERSION}\n"
+            + yaml.dump(records, Dumper=_SafeDumper, allow_unicode=True, sort_keys=False, default_flow_style=False)
+        )
+        self.format_version = FORMAT_VERSION
+        # Der Snapshot enthält jetzt alle Änderungen, das Journal ist überflüssig
+        if os.path.exists(self.journal_filename):
+            os.remove(self.journal_filename)
+
+    def write_changes(self, changes: Dict[str, dict]) -> bool:
+        if not changes:
+            return False
+        timestamp = datetime.now().isoformat(timespec="seconds")
+        lines = [
+            json.dumps({"id": pid, "ts": timestamp, "changes": fields}, ensure_ascii=False)
+            for pid, fields in changes.items()
+        ]
+        with open(self.journal_filename, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            journal_size = f.tell()
+        return journal_size > self.journal_max_bytes
+
+class SqliteStorage(StorageBackend):
+    """SQLite-Datenbank mit einer Zeile je Patient.
+
+    Änderungen werden zeilenweise geschrieben (UPSERT nur der geänderten
+    Spalten), Löschen betrifft nur die eine Zeile. Bettplatz, hidden und die
+    Unterstützungs-Flags sind indiziert.
+    """
+
+    incremental = True
+    # Zeilen entstehen immer aus validierten Patienten
+    format_version = FORMAT_VERSION
+
+    def __init__(self, filename: str, fields: Sequence[str], bool_fields: Sequence[str] = (), indexed_fields: Sequence[str] = ()):
+        self.filename = filename
+        self.fields = [f for f in fields if f != "id"]
+        self.bool_fields = set(bool_fields)
+        self.indexed_fields = list(indexed_fields)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.filename)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Der Hintergrund-Writer schreibt aus einem anderen Thread (serialisiert über _lock)
+            self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+            self._create_schema()
+        return self._conn
+
+    def _column_type(self, field: str) -> str:
+        return "INTEGER NOT NULL DEFAULT 0" if field in self.bool_fields else "TEXT NOT NULL DEFAULT ''"
+
+    def _create_schema(self):
+        columns = ", ".join(f'"{f}" {self._column_type(f)}' for f in self.fields)
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS patients (id TEXT PRIMARY KEY, position INTEGER NOT NULL, {columns})")
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(patients)")}
+            # Neue Modellfelder in bestehenden Datenbanken ergänzen
+            for f in self.fields:
+                if f not in existing:
+                    self._conn.execute(f'ALTER TABLE patients ADD COLUMN "{f}" {self._column_type(f)}')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_position ON patients (position)")
+            for f in self.indexed_fields:
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_patients_{f}" ON patients ("{f}")')
+
+    def _to_record(self, row) -> dict:
+        record = {"id": row[0]}
+        for f, value in zip(self.fields, row[1:]):
+            record[f] = bool(value) if f in self.bool_fields else value
+        return record
+
+    def _select_sql(self) -> str:
+        columns = ", ".join(f'"{f}"' for f in self.fields)
+        return f"SELECT id, {columns} FROM patients ORDER BY position"
+
+    def load(self) -> List[dict]:
+        with self._lock:
+            return [self._to_record(row) for row in self._connect().execute(self._select_sql())]
+
+    def iter_records(self) -> Iterator[dict]:
+        if not self.exists():
+            return
+        # Eigene Verbindung, damit das Streamen nicht mit Schreibzugriffen kollidiert
+        conn = sqlite3.connect(self.filename)
+        try:
+            for row in conn.execute(self._select_sql()):
+                yield self._to_record(row)
+        finally:
+            conn.close()
+
+    def save(self, records: List[dict]):
+        columns = ["id", "position", *self.fields]
+        placeholders = ", ".join("?" for _ in columns)
+        column_list = ", ".join(f'"{c}"' for c in columns)
+        rows = [
+            (r["id"], position, *(r.get(f, False if f in self.bool_fields else "") for f in self.fields))
+            for position, r in enumerate(records)
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM patients")
+                conn.executemany(f"INSERT INTO patients ({column_list}) VALUES ({placeholders})", rows)
+
+    def write_changes(self, changes: Dict[str, dict]) -> bool:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for pid, fields in changes.items():
+                    fields = {f: v for f, v in fields.items() if f in self.fields}
+                    if not fields:
+                        continue
+                    column_list = ", ".join(f'"{c}"' for c in fields)
+                    placeholders = ", ".join("?" for _ in fields)
+                    assignments = ", ".join(f'"{c}" = excluded."{c}"' for c in fields)
+                    # Neue Patienten werden hinten angehängt, bestehende nur in den geänderten Spalten aktualisiert
+                    conn.execute(
+                        f"INSERT INTO patients (id, position, {column_list}) "
+                        f"VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM patients), {placeholders}) "
+                        f"ON CONFLICT(id) DO UPDATE SET {assignments}",
+                        (pid, *fields.values())
+                    )
+        return False
+
+    def delete(self, patient_id: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
+        return True
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class PatientArchive:
+    """Komprimiertes Archiv (gzip, JSON Lines) für ausgeblendete Patienten.
+
+    put() und remove() hängen jeweils ein neues gzip-Member an, die Kosten
+    hängen also nur von den geänderten Patienten ab. Beim Laden gilt der
+    letzte Eintrag je ID; überwiegen veraltete Einträge, wird das Archiv
+    dabei neu geschrieben.
+
+    Die Member werden einzeln gelesen: Ein beschädigtes oder abgeschnittenes
+    Member (z.B. Absturz beim Anhängen) wird übersprungen, die folgenden
+    gelten weiter. Nach einem Lesefehler wird das Archiv nie neu geschrieben
+    (damaged), damit nichts verloren geht, was noch zu retten wäre.
+    """
+
+    # Kopf eines gzip-Members (Magic + Deflate), Wiederaufsetzpunkt nach Lesefehlern
+    GZIP_MAGIC = b"\x1f\x8b\x08"
+    READ_CHUNK = 16 * 1024
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        # Beim letzten load() beschädigte Member übersprungen
+        self.damaged = False
+
+    def exists(self) -> bool:
+        return os.path.exists(self.filename)
+
+    def load(self) -> List[dict]:
+        records: Dict[str, Optional[dict]] = {}
+        lines = 0
+        self.damaged = False
+        if not self.exists():
+            return []
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        for member in self._iter_members(data):
+            for line in member.decode('utf-8', errors='replace').splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                lines += 1
+                records[entry["id"]] = entry.get("record")
+        live = [r for r in records.values() if r is not None]
+        if not self.damaged and lines > 2 * len(live) + 100:
+            self.rewrite(live)
+        return live
+
+    def _iter_members(self, data: bytes) -> Iterator[bytes]:
+        """Entpackt die gzip-Member einzeln; beschädigte werden übersprungen (setzt damaged)."""
+        view = memoryview(data)
+        pos = 0
+        while pos < len(data):
+            decompressor = zlib.decompressobj(wbits=31)
+            chunks = []
+            end = pos
+            try:
+                while not decompressor.eof and end < len(data):
+                    chunks.append(decompressor.decompress(view[end:end + self.READ_CHUNK]))
+                    end += self.READ_CHUNK
+            except zlib.error:
+                pass
+            if decompressor.eof:
+                # Prüfsumme stimmt -> vollständiges Member; dahinter beginnt das nächste
+                yield b"".join(chunks)
+                pos = min(end, len(data)) - len(decompressor.unused_data)
+                continue
+            # Beschädigt oder abgeschnitten -> beim nächsten Member-Kopf weiterlesen
+            self.damaged = True
+            next_pos = data.find(self.GZIP_MAGIC, pos + 1)
+            if next_pos < 0:
+                return
+            pos = next_pos
+
+    def put(self, records: Sequence[dict]):
+        """Legt Patienten im Archiv ab bzw. aktualisiert sie."""
+        self._append([{"id": r["id"], "record": r} for r in records])
+
+    def remove(self, patient_ids: Iterable[str]):
+        self._append([{"id": pid} for pid in patient_ids])
+
+    def rewrite(self, records: Sequence[dict]):
+        tmp_filename = self.filename + ".tmp"
+        with gzip.open(tmp_filename, 'wt', encoding='utf-8') as f:
+            for r in records:
+                f.write(json.dumps({"id": r["id"], "record": r}, ensure_ascii=False) + "\n")
+        os.replace(tmp_filename, self.filename)
+
+    def _append(self, entries: List[dict]):
+        if not entries:
+            return
+        with gzip.open(self.filename, 'at', encoding='utf-8') as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+
+class ShardedStorage(StorageBackend):
+    """Ein Verzeichnis mit einer YAML-Datei je Patient (<id>.yaml) und einer Indexdatei.
+
+    Der Index (index.json) enthält nur die Felder für Listen und Sidebar
+    (index_fields, z.B. Name, Bettplatz, hidden, Flags). load() liefert diese
+    Teil-Datensätze; die vollständige Patientendatei wird erst über
+    resolve_record() gelesen. Eine Änderung schreibt nur die Datei des
+    betroffenen Patienten (und den Index, falls sich ein Indexfeld ändert).
+    """
+
+    incremental = True
+    format_version = FORMAT_VERSION
+    partial_records = True
+    INDEX_NAME = "index.json"
+
+    def __init__(self, directory: str, index_fields: Sequence[str]):
+        self.directory = directory
+        self.filename = directory
+        self.index_fields = ["id", *(f for f in index_fields if f != "id")]
+        self.index_filename = os.path.join(directory, self.INDEX_NAME)
+        self._lock = threading.Lock()
+        # Patienten-ID -> Indexeintrag (in gespeicherter Reihenfolge)
+        self._entries: Dict[str, dict] = {}
+        # IDs, deren vollständige Datei noch nicht gelesen wurde
+        self._partial: set = set()
+        # Zuletzt gesehene mtime je Patientendatei bzw. des Verzeichnisses beim Laden
+        # (erkennt fremde Änderungen, siehe load_changes)
+        self._mtimes: Dict[str, int] = {}
+        self._baseline_ns: Optional[int] = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_filename)
+
+    def _shard_filename(self, patient_id: str) -> str:
+        return os.path.join(self.directory, f"{patient_id}.yaml")
+
+    def _read_index(self) -> List[dict]:
+        with open(self.index_filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.format_version = data.get("version", 0)
+        return data.get("patients", [])
+
+    def load(self) -> List[dict]:
+        with self._lock:
+            entries = self._read_index()
+            self._entries = {e["id"]: e for e in entries}
+            self._partial = set(self._entries)
+            self._mtimes = {}
+            directory = file_signature(self.directory)
+            self._baseline_ns = directory[0] if directory else None
+            # Kopien ausgeben: der Aufrufer darf die Datensätze behalten, ohne den Index zu verändern
+            return [dict(e) for e in entries]
+
+    def resolve_record(self, record: dict) -> dict:
+        pid = record.get("id")
+        if pid not in self._partial:
+            return record
+        try:
+            mtime = os.stat(self._shard_filename(pid)).st_mtime_ns
+            full = self._read_shard(pid)
+        except FileNotFoundError:
+            # Datei fehlt (z.B. Absturz vor dem ersten Schreiben) -> Indexdaten behalten
+            return record
+        self._partial.discard(pid)
+        self._mtimes[pid] = mtime
+        return full
+
+    def signature(self) -> tuple:
+        # Atomares Ersetzen einer Patientendatei ändert die mtime des Verzeichnisses
+        return (file_signature(self.directory), file_signature(self.index_filename))
+
+    def load_changes(self) -> List[dict]:
+        """Liest den Index erneut; nur seit dem letzten Lesen/Schreiben geänderte Patientendateien werden gelesen.
+
+        Unveränderte Patienten werden wie bei load() als Teil-Datensätze geliefert.
+        """
+        with self._lock:
+            entries = self._read_index()
+            records = []
+            for entry in entries:
+                pid = entry["id"]
+                shard = file_signature(self._shard_filename(pid))
+                mtime = shard[0] if shard else None
+                known = self._mtimes.get(pid)
+                if known is not None:
+                    changed = mtime != known
+                else:
+                    # Noch nie gelesen: neuer Patient oder Datei jünger als der geladene Stand
+                    changed = mtime is not None and (
+                        pid not in self._entries or self._baseline_ns is None or mtime > self._baseline_ns
+                    )
+                if changed and mtime is not None:
+                    records.append(self._read_shard(pid))
+                    self._partial.discard(pid)
+                    self._mtimes[pid] = mtime
+                else:
+                    if pid not in self._entries:
+                        self._partial.add(pid)
+                    records.append(dict(entry))
+            self._entries = {e["id"]: e for e in entries}
+            return records
+
+    def iter_records(self) -> Iterator[dict]:
+        if not self.exists():
+            return
+        for entry in self._read_index():
+            yield self._read_shard(entry["id"])
+
+    def _read_shard(self, patient_id: str) -> dict:
+        with open(self._shard_filename(patient_id), 'r', encoding='utf-8') as f:
+            return yaml.load(f, Loader=_SafeLoader) or {"id": patient_id}
+
+    def _write_shard(self, record: dict):
+        filename = self._shard_filename(record["id"])
+        _write_atomic(
+            filename,
+            yaml.dump(record, Dumper=_SafeDumper, allow_unicode=True, sort_keys=False, default_flow_style=False)
+        )
+        # Eigene Änderung -> beim nächsten load_changes() nicht als fremd werten
+        self._mtimes[record["id"]] = os.stat(filename).st_mtime_ns
+
+    def _write_index(self):
+        data = {"version": FORMAT_VERSION, "patients": list(self._entries.values())}
+        _write_atomic(self.index_filename, json.dumps(data, ensure_ascii=False, indent=0))
+
+    def _index_entry(self, record: dict) -> dict:
+        return {f: record[f] for f in self.index_fields if f in record}
+
+    def save(self, records: List[dict]):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = {}
+            for record in records:
+                # Noch nicht gelesene Patienten sind auf der Platte bereits vollständig
+                if record["id"] not in self._partial:
+                    self._write_shard(record)
+                entries[record["id"]] = self._index_entry(record)
+            for pid in set(self._entries) - set(entries):
+                self._remove_shard(pid)
+            self._entries = entries
+            self._write_index()
+            self.format_version = FORMAT_VERSION
+
+    def write_changes(self, changes: Dict[str, dict]) -> bool:
+        with self._lock:
+            index_changed = False
+            for pid, fields in changes.items():
+                if pid in self._entries:
+                    record = self._read_shard(pid)
+                    record.update(fields)
+                else:
+                    record = {"id": pid, **fields}
+                self._write_shard(record)
+                self._partial.discard(pid)
+                entry = self._index_entry(record)
+                if self._entries.get(pid) != entry:
+                    self._entries[pid] = entry
+                    index_changed = True
+            if index_changed:
+                self._write_index()
+        return False
+
+    def delete(self, patient_id: str) -> bool:
+        with self._lock:
+            if self._entries.pop(patient_id, None) is not None:
+                self._write_index()
+            self._remove_shard(patient_id)
+            self._partial.discard(patient_id)
+        return True
+
+    def _remove_shard(self, patient_id: str):
+        self._mtimes.pop(patient_id, None)
+        try:
+            os.remove(self._shard_filename(patient_id))
+        except FileNotFoundError:
+            pass
+
+def _write_atomic(filename: str, text: str):
+    """Schreibt über eine temporäre Datei, damit nie eine halbe Datei zurückbleibt."""
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_filename, filename)
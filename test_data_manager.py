@@ -1,7 +1,10 @@
 import pytest
 import os
 import yaml
-from data_manager import DataManager, Patient
+import time
+import json
+from data_manager import DataManager, Patient, PatientList, iter_stored_patients
+from storage import iter_yaml_records
 
 @pytest.fixture
 def temp_yaml(tmp_path):
@@ -127,3 +130,704 @@ def test_backward_compatibility(temp_yaml):
     # falls sie noch nützlich sein könnten. 
     # Aber laut Anforderung "vollständig entfernen".
     # Wir prüfen hier nur, dass das Laden nicht abstürzt.
+
+def test_write_behind_merges_updates(temp_yaml):
+    dm = DataManager(temp_yaml, write_delay=10, max_write_delay=10)
+    p = Patient(name="Verlauf")
+    dm.add_patient(p)
+    for i in range(5):
+        p.verlauf = "x" * (i + 1)
+        dm.update_patient(p)
+
+    assert dm.pending_writes == 6
+    # Noch nichts geschrieben
+    assert DataManager(temp_yaml).patients == []
+
+    dm.flush()
+    assert dm.pending_writes == 0
+    dm2 = DataManager(temp_yaml)
+    assert dm2.patients[0].verlauf == "xxxxx"
+    dm.close()
+
+def test_write_behind_background_flush(temp_yaml):
+    dm = DataManager(temp_yaml, write_delay=0.05, max_write_delay=0.2)
+    dm.add_patient(Patient(name="Auto"))
+    deadline = time.monotonic() + 5
+    while dm.pending_writes and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert dm.pending_writes == 0
+    assert DataManager(temp_yaml).patients[0].name == "Auto"
+    dm.close()
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_write_behind_retries_after_save_error(temp_yaml, monkeypatch, journal):
+    import data_manager
+    monkeypatch.setattr(data_manager, "SAVE_RETRY_DELAY", 0.05)
+    dm = DataManager(temp_yaml, write_delay=0.01, max_write_delay=0.05, journal=journal)
+    errors = []
+    dm.add_save_error_listener(errors.append)
+    # Erster Schreibversuch scheitert (z.B. Netzlaufwerk kurz weg)
+    method = "write_changes" if journal else "save"
+    original = getattr(dm.storage, method)
+    def fail_once(*args):
+        monkeypatch.setattr(dm.storage, method, original)
+        raise OSError("Netzlaufwerk nicht erreichbar")
+    monkeypatch.setattr(dm.storage, method, fail_once)
+
+    p = Patient(name="Retry")
+    dm.add_patient(p)
+    deadline = time.monotonic() + 5
+    while (dm.pending_writes or not errors or dm.last_save_error) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [str(e) for e in errors] == ["Netzlaufwerk nicht erreichbar"]
+    assert dm._writer.is_alive()
+    assert dm.pending_writes == 0 and dm.last_save_error is None
+    assert DataManager(temp_yaml, journal=journal).patients == [p]
+    # Spätere Änderungen schreibt derselbe Writer weiterhin
+    p.verlauf = "weiter"
+    dm.update_patient(p)
+    deadline = time.monotonic() + 5
+    while dm.pending_writes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert DataManager(temp_yaml, journal=journal).patients[0].verlauf == "weiter"
+    dm.close()
+
+def test_close_flushes_pending(temp_yaml):
+    dm = DataManager(temp_yaml, write_delay=10, max_write_delay=10)
+    dm.add_patient(Patient(name="Exit"))
+    dm.close()
+    assert DataManager(temp_yaml).patients[0].name == "Exit"
+
+def test_journal_appends_deltas(temp_yaml):
+    dm = DataManager(temp_yaml, journal=True)
+    p = Patient(name="Journal", bettplatz="3")
+    dm.add_patient(p)
+    snapshot_size = os.path.getsize(temp_yaml)
+
+    p.verlauf = "stabil"
+    dm.update_patient(p)
+
+    # Snapshot bleibt unverändert, nur das Journal wächst
+    assert os.path.getsize(temp_yaml) == snapshot_size
+    with open(dm.journal_filename, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert entries[-1]["id"] == p.id
+    assert entries[-1]["changes"] == {"verlauf": "stabil"}
+
+    dm2 = DataManager(temp_yaml, journal=True)
+    assert dm2.patients[0].name == "Journal"
+    assert dm2.patients[0].verlauf == "stabil"
+
+def test_journal_compaction(temp_yaml):
+    dm = DataManager(temp_yaml, journal=True, journal_max_bytes=500)
+    p = Patient(name="Kompakt")
+    dm.add_patient(p)
+    for i in range(20):
+        p.verlauf = f"Tag {i}"
+        dm.update_patient(p)
+
+    assert not os.path.exists(dm.journal_filename) or os.path.getsize(dm.journal_filename) <= 500
+    with open(temp_yaml, encoding='utf-8') as f:
+        assert yaml.safe_load(f)[0]["verlauf"].startswith("Tag")
+    assert DataManager(temp_yaml).patients[0].verlauf == "Tag 19"
+
+def test_journal_ignores_truncated_line(temp_yaml):
+    dm = DataManager(temp_yaml, journal=True)
+    p = Patient(name="Crash")
+    dm.add_patient(p)
+    with open(dm.journal_filename, 'a', encoding='utf-8') as f:
+        f.write('{"id": "' + p.id + '", "chan')
+
+    dm2 = DataManager(temp_yaml, journal=True)
+    assert dm2.patients[0].name == "Crash"
+
+def test_id_index_consistency(temp_yaml):
+    dm = DataManager(temp_yaml)
+    patients = [Patient(name=f"P{i}") for i in range(5)]
+    for p in patients:
+        dm.add_patient(p)
+
+    assert dm.remove_patient(patients[1].id)
+    assert not dm.remove_patient(patients[1].id)
+    assert dm.get_patient_by_id(patients[1].id) is None
+    for p in patients[2:]:
+        assert dm.get_patient_by_id(p.id) is p
+
+    replacement = Patient(id=patients[3].id, name="Neu")
+    assert dm.update_patient(replacement)
+    assert dm.get_patient_by_id(patients[3].id).name == "Neu"
+    assert not dm.update_patient(Patient(name="Unbekannt"))
+
+    dm2 = DataManager(temp_yaml)
+    assert [p.name for p in dm2.patients] == ["P0", "P2", "Neu", "P4"]
+    assert dm2.get_patient_by_id(patients[4].id).name == "P4"
+
+def test_remove_first_patient_keeps_indexes(temp_yaml, monkeypatch):
+    dm = DataManager(temp_yaml)
+    patients = [Patient(name=f"P{i}", bettplatz=f"ITS{i % 2} {i}", ecmo=i % 2 == 1) for i in range(4)]
+    for p in patients:
+        dm.add_patient(p)
+    # Löschen an Position 0 verschiebt nur die Positionen, die Indizes werden nicht neu aufgebaut
+    monkeypatch.setattr(dm, "_rebuild_indexes", lambda: pytest.fail("vollständiger Neuaufbau"))
+    assert dm.remove_patient(patients[0].id)
+    assert [dm.get_patient_by_id(p.id) for p in patients[1:]] == patients[1:]
+    assert [p.name for p in dm.iter_sorted_patients()] == ["P2", "P1", "P3"]
+    assert [p.name for p in dm.find_by_support(any_of=["ecmo"])] == ["P1", "P3"]
+    assert dm.get_stations() == [("ITS0", 1), ("ITS1", 2)]
+    assert [p.name for p in dm.search_patients("P2", fuzzy=False)] == ["P2"]
+
+def _lookup_time(dm, ids, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for pid in ids:
+            dm.get_patient_by_id(pid)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def test_lookup_cost_flat_on_large_file(tmp_path):
+    def make_file(name, count):
+        path = os.path.join(tmp_path, name)
+        data = [{"id": f"id-{i}", "name": f"P{i}", "bettplatz": str(i)} for i in range(count)]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)  # JSON ist gültiges YAML und schneller zu erzeugen
+        return DataManager(path)
+
+    small = make_file("small.yaml", 100)
+    large = make_file("large.yaml", 50_000)
+    assert len(large.patients) == 50_000
+
+    small_ids = [f"id-{i % 100}" for i in range(2_000)]
+    large_ids = [f"id-{(i * 7919) % 50_000}" for i in range(2_000)]
+    # Lineare Suche wäre hier ~500x langsamer
+    assert _lookup_time(large, large_ids) < 10 * _lookup_time(small, small_ids)
+
+def test_search_patients_all_fields(temp_yaml):
+    dm = DataManager(temp_yaml)
+    p1 = Patient(name="Alpha", antiinfektiva="Meropenem")
+    p2 = Patient(name="Beta", diagnosen="PFO")
+    dm.add_patient(p1)
+    dm.add_patient(p2)
+
+    assert dm.search_patients("mero") == [p1]
+    assert dm.search_patients("antiinfektiva:mero") == [p1]
+    assert dm.search_patients("diagnosen:mero") == []
+
+    p2.antiinfektiva = "Meropenem"
+    dm.update_patient(p2)
+    assert dm.search_patients("mero") == [p1, p2]
+
+    dm.remove_patient(p1.id)
+    assert dm.search_patients("mero") == [p2]
+
+def test_search_patients_typo_tolerant(temp_yaml):
+    dm = DataManager(temp_yaml)
+    mueller = Patient(name="Müller", bettplatz="3")
+    dm.add_patient(Patient(name="Meier", bettplatz="4"))
+    dm.add_patient(mueller)
+
+    assert dm.search_patients("Mueler") == [mueller]
+    assert dm.search_patients("Mueler", fuzzy=False) == []
+    assert dm.fuzzy_search_patients("muller") == [mueller]
+
+def test_maintained_sort_order(temp_yaml):
+    dm = DataManager(temp_yaml)
+    p1 = Patient(name="P1", bettplatz="ITS 10")
+    p2 = Patient(name="P2", bettplatz="ITS 2")
+    p3 = Patient(name="P3", bettplatz="ITS 1", hidden=True)
+    for p in (p1, p2, p3):
+        dm.add_patient(p)
+
+    assert [p.name for p in dm.iter_sorted_patients()] == ["P2", "P1"]
+    assert [p.name for p in dm.iter_sorted_patients(include_hidden=True)] == ["P3", "P2", "P1"]
+
+    p1.bettplatz = "ITS 0"
+    dm.update_patient(p1)
+    assert [p.name for p in dm.iter_sorted_patients()] == ["P1", "P2"]
+
+    dm.remove_patient(p1.id)
+    assert [p.name for p in dm.iter_sorted_patients()] == ["P2"]
+    assert [p.name for p in DataManager(temp_yaml).iter_sorted_patients(include_hidden=True)] == ["P3", "P2"]
+
+def test_sort_is_stable_for_equal_beds(temp_yaml):
+    dm = DataManager(temp_yaml)
+    names = [f"Neu {i}" for i in range(5)]
+    for name in names:
+        dm.add_patient(Patient(name=name))
+    assert [p.name for p in dm.iter_sorted_patients()] == names
+    assert [p.name for p in dm.sort_patients(reversed(dm.patients))] == names
+
+def test_revision_counter(temp_yaml):
+    dm = DataManager(temp_yaml)
+    p = Patient(name="Rev")
+    dm.add_patient(p)
+    first = dm.get_revision(p.id)
+
+    p.verlauf = "neu"
+    dm.update_patient(p)
+    assert dm.get_revision(p.id) == first + 1
+    # Ohne Änderung bleibt die Revision
+    dm.update_patient(p)
+    assert dm.get_revision(p.id) == first + 1
+    assert dm.get_revision("unbekannt") == 0
+
+def test_patient_tracks_dirty_fields():
+    p = Patient(name="A", ecmo=False)
+    assert p.dirty_fields == frozenset()
+    p.name = "B"
+    p.ecmo = False  # unverändert
+    p.verlauf = "neu"
+    assert p.dirty_fields == {"name", "verlauf"}
+    # Änderungsstand gehört nicht zu den Daten
+    assert p == Patient(id=p.id, name="B", verlauf="neu")
+    assert p.pop_dirty_fields() == {"name", "verlauf"}
+    assert p.dirty_fields == frozenset()
+
+def test_update_writes_only_dirty_fields(temp_yaml, monkeypatch):
+    dm = DataManager(temp_yaml, journal=True, write_delay=10)
+    p = Patient(name="Delta", verlauf="alt")
+    dm.add_patient(p)
+    dm.flush()
+
+    p.verlauf = "neu"
+    p.ecmo = True
+    dm.update_patient(p)
+    assert dm.get_dirty_fields(p.id) == {"verlauf", "ecmo"}
+    # Name unverändert -> Trigramm-Index wird nicht angefasst
+    monkeypatch.setattr(dm._fuzzy_index, "update", lambda doc: pytest.fail("unerwartete Aktualisierung"))
+    p.uebergabe = "Angehörige"
+    dm.update_patient(p)
+    dm.flush()
+    assert dm.get_dirty_fields(p.id) == set()
+    with open(dm.journal_filename, encoding='utf-8') as f:
+        last = json.loads(f.readlines()[-1])
+    assert last["changes"] == {"verlauf": "neu", "ecmo": True, "uebergabe": "Angehörige"}
+    assert dm.search_patients("angehörige", fuzzy=False) == [p]
+    dm.close()
+
+def test_iter_stored_patients_matches_load(tmp_path):
+    filename = os.path.join(tmp_path, "patients.yaml")
+    dm = DataManager(filename, journal=True)
+    for i in range(5):
+        dm.add_patient(Patient(name=f"P{i}", bettplatz=f"B{i}", verlauf="Zeile 1\nZeile 2"))
+    p = dm.patients[2]
+    p.name = "Geändert"
+    dm.update_patient(p)
+    dm.close()
+
+    streamed = list(iter_stored_patients(filename))
+    assert streamed == DataManager(filename).patients
+    assert streamed[2].name == "Geändert"
+
+def test_iter_yaml_records_matches_safe_load():
+    import io
+    for text in ["", "[]\n", "- a: 1\n- b: [1, 2]\n- c\n"]:
+        assert list(iter_yaml_records(io.StringIO(text))) == (yaml.safe_load(text) or [])
+
+def test_save_writes_format_header(temp_yaml):
+    dm = DataManager(temp_yaml)
+    dm.add_patient(Patient(name="Max"))
+    with open(temp_yaml, encoding='utf-8') as f:
+        assert f.readline().startswith("# patient-tool format: 2")
+
+def test_versioned_file_skips_migration(temp_yaml):
+    with open(temp_yaml, 'w', encoding='utf-8') as f:
+        f.write("# patient-tool format: 2\n")
+        yaml.dump([{"id": "1", "name": "Max", "bettplatz": "12", "station": "ITS 1"}], f)
+    assert DataManager(temp_yaml).patients[0].bettplatz == "12"
+
+def test_hidden_patients_validated_lazily(temp_yaml):
+    dm = DataManager(temp_yaml)
+    active = Patient(name="Aktiv", bettplatz="2")
+    hidden = Patient(name="Entlassen", bettplatz="1", hidden=True, verlauf="Zeile 1\nZeile 2")
+    dm.add_patient(active)
+    dm.add_patient(hidden)
+
+    loaded = DataManager(temp_yaml)
+    assert isinstance(loaded.patients.raw(1), dict)
+    assert loaded.get_active_patients() == [active]
+    assert [p.id for p in loaded.iter_sorted_patients()] == [active.id]
+    assert isinstance(loaded.patients.raw(1), dict)
+    # Suche findet auch nicht validierte Patienten
+    assert [p.id for p in loaded.search_patients("entlassen")] == [hidden.id]
+    assert loaded.get_patient_by_id(hidden.id) == hidden
+
+    # Speichern übernimmt Rohdaten unverändert
+    loaded = DataManager(temp_yaml)
+    loaded.save()
+    assert DataManager(temp_yaml).patients == [active, hidden]
+
+def test_patient_list_validates_on_every_access():
+    a, b, c = (Patient(name=n) for n in "ABC")
+    def raw_list():
+        return PatientList(p.model_dump() for p in (a, b, c))
+
+    assert list(reversed(raw_list())) == [c, b, a]
+    patients = raw_list()
+    assert b in patients and Patient(name="X") not in patients
+    # Rohdaten mit anderer id werden für Vergleiche nicht validiert
+    assert isinstance(patients.raw(2), dict)
+    assert patients.index(b) == 1 and patients.count(c) == 1
+    assert patients.pop() == c and patients.pop(0) == a
+    assert all(isinstance(p, Patient) for p in raw_list().copy())
+    assert raw_list() + [a] == [a, b, c, a]
+    assert not raw_list() != [a, b, c]
+    with pytest.raises(ValueError):
+        raw_list().index(Patient(name="X"))
+
+    # Keine geerbten list-Methoden, die Rohdaten herausgeben
+    patients = raw_list()
+    assert not hasattr(patients, "remove") and not hasattr(patients, "sort")
+    with pytest.raises(TypeError):
+        patients * 2
+    with pytest.raises(TypeError):
+        patients[0] = a.model_dump()
+    assert "{" not in repr(raw_list()) and a.name in repr(raw_list())
+    del patients[1]
+    assert patients == [a, c] and [a] + raw_list() == [a, a, b, c]
+
+def _hot_ids(filename):
+    with open(filename, encoding='utf-8') as f:
+        return [r["id"] for r in yaml.safe_load(f) or []]
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_archive_hide_and_unhide(temp_yaml, journal):
+    dm = DataManager(temp_yaml, journal=journal, archive=True)
+    active = Patient(name="Aktiv")
+    leaving = Patient(name="Entlassen", diagnosen="Sepsis")
+    dm.add_patient(active)
+    dm.add_patient(leaving)
+    leaving.hidden = True
+    dm.update_patient(leaving)
+    dm.close()
+
+    # Die Patientendatei enthält nur noch aktive Patienten
+    assert _hot_ids(temp_yaml) == [active.id]
+    dm = DataManager(temp_yaml, journal=journal, archive=True)
+    assert [p.id for p in dm.patients] == [active.id]
+    assert not dm._archive_loaded
+
+    # Suche lädt das Archiv nach
+    found = dm.search_patients("sepsis")
+    assert [p.id for p in found] == [leaving.id]
+    found[0].hidden = False
+    dm.update_patient(found[0])
+    dm.close()
+
+    dm = DataManager(temp_yaml, journal=journal, archive=True)
+    assert {p.id for p in dm.patients} == {active.id, leaving.id}
+    dm.load_archive()
+    assert len(dm.patients) == 2
+
+def test_archive_moves_hidden_patients_on_load(temp_yaml):
+    dm = DataManager(temp_yaml)
+    dm.add_patient(Patient(name="Aktiv"))
+    dm.add_patient(Patient(name="Alt", hidden=True))
+
+    dm = DataManager(temp_yaml, archive=True)
+    assert [p.name for p in dm.patients] == ["Aktiv"]
+    assert len(_hot_ids(temp_yaml)) == 1
+    assert [p.name for p in dm.iter_sorted_patients(include_hidden=True)] == ["Aktiv", "Alt"]
+
+def test_archive_remove_patient(temp_yaml):
+    dm = DataManager(temp_yaml, archive=True)
+    p = Patient(name="Alt", hidden=True)
+    dm.add_patient(p)
+    dm.load_archive()
+    assert dm.remove_patient(p.id)
+
+    dm = DataManager(temp_yaml, archive=True)
+    dm.load_archive()
+    assert dm.patients == []
+
+@pytest.fixture(params=["patients.yaml", "journal", "patients.db", "patients.d"])
+def shared_file(request, tmp_path):
+    """Patientendatei, die zwei Instanzen (Arbeitsplätze) gemeinsam nutzen: (Dateiname, Journal)."""
+    if request.param == "journal":
+        return str(tmp_path / "patients.yaml"), True
+    return str(tmp_path / request.param), False
+
+def test_external_changes_merged_by_field(shared_file):
+    filename, journal = shared_file
+    a = DataManager(filename, journal=journal)
+    p = Patient(name="Müller", bettplatz="ITS1 1")
+    a.add_patient(p)
+    b = DataManager(filename, journal=journal, write_delay=60)
+    seen = []
+    b.add_change_listener(seen.append)
+    mine = b.get_patient_by_id(p.id)
+
+    p.diagnosen = "Sepsis"
+    a.update_patient(p)
+    # B bearbeitet ein anderes Feld desselben Patienten, noch nicht gespeichert
+    mine.verlauf = "stabil"
+    b.update_patient(mine)
+
+    assert b.check_external_changes() == {p.id}
+    assert seen == [{p.id}]
+    # Fremde Änderung eingemischt, lokale bleibt; das Objekt wird nicht ersetzt
+    assert b.get_patient_by_id(p.id) is mine
+    assert (mine.diagnosen, mine.verlauf) == ("Sepsis", "stabil")
+    assert b.search_patients("sepsis", fuzzy=False) == [mine]
+
+    b.flush()
+    assert a.check_external_changes() == {p.id}
+    assert a.get_patient_by_id(p.id).verlauf == "stabil"
+    b.close()
+    a.close()
+    stored = {q.id: q for q in iter_stored_patients(filename)}
+    assert (stored[p.id].diagnosen, stored[p.id].verlauf) == ("Sepsis", "stabil")
+
+def test_merge_keeps_input_not_yet_updated(temp_yaml):
+    a = DataManager(temp_yaml)
+    p = Patient(name="Müller", verlauf="alt")
+    a.add_patient(p)
+    b = DataManager(temp_yaml)
+    mine = b.get_patient_by_id(p.id)
+
+    p.verlauf = "von A"
+    a.update_patient(p)
+    # Eingabe in B gesetzt, der Watcher mischt vor update_patient ein
+    mine.verlauf = "von B"
+    assert b.check_external_changes() == {p.id}
+    assert mine.verlauf == "von B"
+    b.update_patient(mine)
+    b.close()
+    a.close()
+    assert next(iter_stored_patients(temp_yaml)).verlauf == "von B"
+
+def test_lost_journal_writes_are_reapplied(temp_yaml):
+    a = DataManager(temp_yaml, journal=True)
+    p = Patient(name="Müller", bettplatz="ITS1 1")
+    a.add_patient(p)
+    b = DataManager(temp_yaml, journal=True)
+    mine = b.get_patient_by_id(p.id)
+    mine.uebergabe = "Angehörige anrufen"
+    b.update_patient(mine)
+
+    # Anderer Arbeitsplatz kompaktiert ohne B's Delta (Journal samt Übergabe verworfen)
+    a.storage.save([q.model_dump() for q in a.patients])
+    assert next(iter_stored_patients(temp_yaml)).uebergabe == ""
+
+    b.check_external_changes()
+    assert mine.uebergabe == "Angehörige anrufen"
+    b.flush()
+    assert next(iter_stored_patients(temp_yaml)).uebergabe == "Angehörige anrufen"
+    # Bewusst anderswo geändert -> gilt wie bisher
+    a.check_external_changes()
+    theirs = a.get_patient_by_id(p.id)
+    theirs.uebergabe = "erledigt"
+    a.update_patient(theirs)
+    b.check_external_changes()
+    assert mine.uebergabe == "erledigt"
+
+def test_writes_wait_for_lock_of_other_workstation(temp_yaml):
+    dm = DataManager(temp_yaml, journal=True)
+    p = Patient(name="A")
+    dm.add_patient(p)
+    dm.storage.lock().timeout = 0.1
+    lock_filename = temp_yaml + ".lock"
+    with open(lock_filename, "w") as f:
+        f.write("anderer-pc 1\n")
+    p.verlauf = "neu"
+    with pytest.raises(TimeoutError):
+        dm.update_patient(p)
+    # Änderung bleibt ausstehend und wird nach Freigabe geschrieben
+    assert dm.get_dirty_fields(p.id) == {"verlauf"}
+    os.remove(lock_filename)
+    dm.flush()
+    assert next(iter_stored_patients(temp_yaml)).verlauf == "neu"
+    assert not os.path.exists(lock_filename)
+
+def test_external_add_remove_and_conflict(shared_file):
+    filename, journal = shared_file
+    a = DataManager(filename, journal=journal)
+    keep = Patient(name="Bleibt", bettplatz="ITS1 2", uebergabe="alt")
+    gone = Patient(name="Geht", bettplatz="ITS1 1")
+    a.add_patient(keep)
+    a.add_patient(gone)
+    b = DataManager(filename, journal=journal, write_delay=60)
+    mine = b.get_patient_by_id(keep.id)
+
+    new = Patient(name="Neu", bettplatz="ITS1 3")
+    a.add_patient(new)
+    a.remove_patient(gone.id)
+    keep.uebergabe = "von A"
+    a.update_patient(keep)
+    mine.uebergabe = "von B"
+    b.update_patient(mine)
+
+    assert b.check_external_changes() == {keep.id, gone.id, new.id}
+    assert [q.name for q in b.iter_sorted_patients()] == ["Bleibt", "Neu"]
+    # Gleiches Feld auf beiden Seiten geändert -> lokale Eingabe gewinnt und wird geschrieben
+    assert mine.uebergabe == "von B"
+    b.close()
+    a.check_external_changes()
+    assert a.get_patient_by_id(keep.id).uebergabe == "von B"
+    a.close()
+
+def test_unchanged_file_is_not_reread(temp_yaml, monkeypatch):
+    dm = DataManager(temp_yaml, journal=True)
+    dm.add_patient(Patient(name="Test"))
+    def fail():
+        raise AssertionError("Datei unverändert, kein erneutes Lesen erwartet")
+    monkeypatch.setattr(dm.storage, "load_changes", fail)
+    # Eigene Schreibvorgänge gelten nicht als fremde Änderung
+    assert dm.check_external_changes() == set()
+
+def test_watcher_polls_in_background(temp_yaml):
+    a = DataManager(temp_yaml)
+    b = DataManager(temp_yaml)
+    b.start_watching(interval=0.05)
+    p = Patient(name="Neu")
+    a.add_patient(p)
+    deadline = time.monotonic() + 5
+    while b.get_patient_by_id(p.id) is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    b.close()
+    assert b.get_patient_by_id(p.id) is not None
+
+def _names(patients):
+    return [p.name for p in patients]
+
+def test_support_cohorts_and_counts(temp_yaml):
+    dm = DataManager(temp_yaml, archive=True)
+    dm.add_patient(Patient(name="A", bettplatz="ITS1 3", ecmo=True, invasive_beatmung=True, sedierung=True))
+    dm.add_patient(Patient(name="B", bettplatz="ITS1 1", impella=True, invasive_beatmung=True))
+    dm.add_patient(Patient(name="C", bettplatz="ITS1 2", crrt=True))
+    dm.add_patient(Patient(name="Alt", bettplatz="ITS1 4", ecmo=True, hidden=True))
+
+    assert _names(dm.find_by_support(any_of=["ecmo", "impella"])) == ["B", "A"]
+    assert _names(dm.find_by_support(all_of=["invasive_beatmung"], none_of=["sedierung"])) == ["B"]
+    counts = dm.count_support()
+    assert (counts["invasive_beatmung"], counts["ecmo"], counts["niv"]) == (2, 1, 0)
+    assert dm.count_support(include_hidden=True)["ecmo"] == 2
+    with pytest.raises(ValueError):
+        dm.find_by_support(any_of=["station"])
+    assert dm.support_ids(all_of=["ecmo"]) == {p.id for p in dm.find_by_support(all_of=["ecmo"])}
+
+    # Änderungen und Löschungen halten die Bitmengen aktuell
+    c = next(p for p in dm.patients if p.name == "C")
+    c.ecmo = True
+    dm.update_patient(c)
+    b = next(p for p in dm.patients if p.name == "B")
+    dm.remove_patient(b.id)
+    assert _names(dm.find_by_support(any_of=["ecmo", "impella"])) == ["C", "A"]
+    dm.close()
+
+    # Archiv wird für include_hidden nachgeladen
+    dm = DataManager(temp_yaml, archive=True)
+    assert dm.count_support()["ecmo"] == 2
+    assert _names(dm.find_by_support(all_of=["ecmo"], include_hidden=True)) == ["C", "A", "Alt"]
+
+def test_station_sub_indexes(temp_yaml):
+    dm = DataManager(temp_yaml)
+    beds = {"A": "ITS2 1", "B": "ITS1 10", "C": "ITS1 2", "D": "IMC 3/1"}
+    patients = {name: Patient(name=name, bettplatz=bed) for name, bed in beds.items()}
+    for p in patients.values():
+        dm.add_patient(p)
+    dm.add_patient(Patient(name="Alt", bettplatz="IMC 4", hidden=True))
+
+    assert dm.get_bed_key(patients["D"].id) == ("IMC", "3", "1")
+    assert dm.get_stations() == [("IMC", 1), ("ITS1", 2), ("ITS2", 1)]
+    assert dm.get_stations(include_hidden=True)[0] == ("IMC", 2)
+    assert _names(dm.iter_station_patients("ITS1")) == ["C", "B"]
+
+    # Verlegung: nur die beiden betroffenen Teilindizes ändern sich
+    a = patients["A"]
+    a.bettplatz = "ITS1 5"
+    dm.update_patient(a)
+    assert dm.get_stations() == [("IMC", 1), ("ITS1", 3)]
+    assert _names(dm.iter_station_patients("ITS1")) == ["C", "A", "B"]
+    dm.remove_patient(patients["C"].id)
+    assert _names(dm.iter_station_patients("ITS1")) == ["A", "B"]
+
+def test_startup_snapshot(temp_yaml, tmp_path):
+    cache = os.path.join(tmp_path, "cache")
+    dm = DataManager(temp_yaml, journal=True)
+    dm.add_patient(Patient(name="Müller", bettplatz="ITS1 2", ecmo=True))
+    dm.add_patient(Patient(name="Schmidt", bettplatz="ITS2 1"))
+    dm.close()
+
+    # Erster Start liest die Datei und legt den Snapshot an, der zweite nutzt ihn
+    first = DataManager(temp_yaml, journal=True, snapshot_dir=cache)
+    assert not first.loaded_from_snapshot
+    second = DataManager(temp_yaml, journal=True, snapshot_dir=cache)
+    assert second.loaded_from_snapshot
+    assert second.patients == first.patients
+    assert _names(second.iter_sorted_patients()) == ["Müller", "Schmidt"]
+    assert second.get_stations() == [("ITS1", 1), ("ITS2", 1)]
+    assert _names(second.find_by_support(any_of=["ecmo"])) == ["Müller"]
+    assert _names(second.search_patients("schmi")) == ["Schmidt"]
+
+    # Eigene Änderungen landen beim Beenden im Snapshot
+    p = second.search_patients("schmi")[0]
+    p.bettplatz = "ITS1 1"
+    second.update_patient(p)
+    second.close()
+    third = DataManager(temp_yaml, journal=True, snapshot_dir=cache)
+    assert third.loaded_from_snapshot
+    assert third.get_stations() == [("ITS1", 2)]
+
+    # Fremde Änderung der Datei macht den Snapshot ungültig
+    other = DataManager(temp_yaml, journal=True)
+    other.add_patient(Patient(name="Neu"))
+    other.close()
+    fourth = DataManager(temp_yaml, journal=True, snapshot_dir=cache)
+    assert not fourth.loaded_from_snapshot
+    assert len(fourth.patients) == 3
+
+def test_startup_snapshot_ignores_broken_file(temp_yaml, tmp_path):
+    cache = os.path.join(tmp_path, "cache")
+    DataManager(temp_yaml).add_patient(Patient(name="A"))
+    dm = DataManager(temp_yaml, snapshot_dir=cache)
+    with open(dm.snapshot_filename, 'wb') as f:
+        f.write(b"kaputt")
+    dm2 = DataManager(temp_yaml, snapshot_dir=cache)
+    assert not dm2.loaded_from_snapshot
+    assert dm2.patients[0].name == "A"
+
+def test_startup_snapshot_with_loaded_archive(temp_yaml, tmp_path):
+    cache = os.path.join(tmp_path, "cache")
+    options = dict(journal=True, archive=True, snapshot_dir=cache)
+    dm = DataManager(temp_yaml, **options)
+    for i, name in enumerate(["Anna", "Bernd", "Clara", "Dora"]):
+        dm.add_patient(Patient(name=name, bettplatz=f"ITS{i % 2} {i}", ecmo=i % 2 == 0, hidden=name == "Bernd"))
+    dm.close()
+
+    # Sitzung wie in der App: ausblenden, bearbeiten, suchen (lädt das Archiv)
+    dm = DataManager(temp_yaml, **options)
+    clara = dm.search_patients("clara", fuzzy=False)[0]
+    clara.hidden = True
+    dm.update_patient(clara)
+    dora = dm.get_patient_by_id(next(p.id for p in dm.patients if p.name == "Dora"))
+    dora.bettplatz = "ITS0 9"
+    dm.update_patient(dora)
+    assert [p.name for p in dm.search_patients("bernd", fuzzy=False)] == ["Bernd"]
+    dm.close()
+
+    cached = DataManager(temp_yaml, **options)
+    assert cached.loaded_from_snapshot
+    fresh = DataManager(temp_yaml, journal=True, archive=True)
+    assert cached.patients == fresh.patients
+    assert _names(cached.iter_sorted_patients()) == _names(fresh.iter_sorted_patients()) == ["Anna", "Dora"]
+    assert cached.get_stations() == fresh.get_stations() == [("ITS0", 2)]
+    assert _names(cached.find_by_support(any_of=["ecmo"])) == ["Anna"]
+    assert _names(cached.fuzzy_search_patients("Dorra")) == ["Dora"]
+    # Archiv wird wie gewohnt erst bei der Suche nachgeladen
+    assert _names(cached.search_patients("clara", fuzzy=False)) == ["Clara"]
+    assert cached.count_support(include_hidden=True)["ecmo"] == 2
+
+def test_search_without_terms_lists_active_sorted(temp_yaml):
+    dm = DataManager(temp_yaml, archive=True)
+    for name, bed in (("B", "ITS 2"), ("A", "ITS 1")):
+        dm.add_patient(Patient(name=name, bettplatz=bed))
+    dm.add_patient(Patient(name="Archiv", hidden=True))
+    dm = DataManager(temp_yaml, archive=True)
+    for query in ("", "-", "antiinfektiva:", "name: "):
+        assert _names(dm.search_patients(query)) == ["A", "B"]
+    # Weder Archiv geladen noch Rohdaten validiert
+    assert not dm._archive_loaded
+    assert _names(dm.search_patients("antiinfektiva: archiv")) == ["Archiv"]
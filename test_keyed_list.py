@@ -0,0 +1,80 @@
+import flet as ft
+from components.keyed_list import KeyedList
+from data_manager import Patient
+
+def _keyed_list(**kwargs):
+    built = []
+
+    def build(p):
+        built.append(p.id)
+        return ft.Text(p.name)
+
+    rows = KeyedList(ft.ListView(), build=build, signature=lambda p: p.name, **kwargs)
+    return rows, built
+
+def test_reconcile_reuses_unchanged_rows():
+    a, b, c = Patient(name="A"), Patient(name="B"), Patient(name="C")
+    rows, built = _keyed_list()
+    assert rows.reconcile([a, b, c])
+    first = list(rows.container.controls)
+    assert built == [a.id, b.id, c.id]
+
+    # Gleiche Daten -> keine Änderung, nichts neu gebaut
+    built.clear()
+    assert not rows.reconcile([a, b, c])
+    assert built == []
+
+    # Umsortieren und Entfernen verwendet bestehende Controls weiter
+    assert rows.reconcile([c, a])
+    assert rows.container.controls == [first[2], first[0]]
+    assert built == []
+
+def test_reconcile_rebuilds_only_changed_rows():
+    a, b = Patient(name="A"), Patient(name="B")
+    rows, built = _keyed_list()
+    rows.reconcile([a, b])
+    first = list(rows.container.controls)
+
+    built.clear()
+    b.name = "B2"
+    rows.reconcile([a, b])
+    assert built == [b.id]
+    assert rows.container.controls[0] is first[0]
+    assert rows.container.controls[1].value == "B2"
+
+def test_reconcile_patches_in_place():
+    a, b = Patient(name="A"), Patient(name="B")
+
+    def patch(control, p):
+        control.value = p.name
+
+    rows = KeyedList(ft.Column(), build=lambda p: ft.Text(p.name), signature=lambda p: p.name, patch=patch)
+    rows.reconcile([a, b])
+    first = list(rows.container.controls)
+
+    a.name = "A2"
+    assert not rows.reconcile([a, b])  # Reihenfolge unverändert, nur Inhalt gepatcht
+    assert rows.container.controls == first
+    assert first[0].value == "A2"
+
+def test_paging_builds_only_visible_rows():
+    patients = [Patient(name=f"P{i}") for i in range(250)]
+    rows, built = _keyed_list(page_size=100)
+    rows.reconcile(patients)
+
+    assert len(built) == 100
+    assert rows.remaining == 150
+    assert len(rows.container.controls) == 101  # inkl. "weitere laden"
+
+    assert rows.load_more()
+    assert len(built) == 200
+    rows.load_more()
+    assert rows.remaining == 0
+    assert not rows.load_more()
+    assert len(rows.container.controls) == 250
+
+    # Neue Anfrage -> zurück auf die erste Seite, vorhandene Zeilen werden wiederverwendet
+    built.clear()
+    rows.reconcile(patients[:150], reset=True)
+    assert built == []
+    assert len(rows.container.controls) == 101
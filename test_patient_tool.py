@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from data_manager import DataManager, Patient
+from patient_tool import main
+
+def make_data(tmp_path):
+    filename = os.path.join(tmp_path, "patients.yaml")
+    dm = DataManager(filename, journal=True)
+    dm.add_patient(Patient(name="Zweiter", bettplatz="ITS1 10", diagnosen="Sepsis"))
+    dm.add_patient(Patient(name="Erster", bettplatz="ITS1 2", hidden=True))
+    patient = Patient(name="Dritter", bettplatz="IMC 1")
+    dm.add_patient(patient)
+    # Letzte Änderung nur im Journal
+    patient.diagnosen = "Pneumonie"
+    dm.update_patient(patient)
+    dm.close()
+    return filename
+
+def test_export_txt(tmp_path):
+    filename = make_data(tmp_path)
+    output = os.path.join(tmp_path, "export.txt")
+    assert main(["export", "--file", filename, "--fields", "name,diagnosen", "-o", output]) == 0
+    with open(output, encoding="utf-8") as f:
+        text = f.read()
+
+    assert text.index("Name: Dritter") < text.index("Name: Erster") < text.index("Name: Zweiter")
+    assert "    Pneumonie" in text
+    assert text.count("-" * 40) == 3
+
+def test_export_only_active_file_order(tmp_path, capsys):
+    filename = make_data(tmp_path)
+    main(["export", "--file", filename, "--fields", "name", "--only-active", "--order", "datei"])
+    out = capsys.readouterr().out
+
+    assert "Erster" not in out
+    assert out.index("Zweiter") < out.index("Dritter")
+
+def test_export_pdf(tmp_path):
+    filename = make_data(tmp_path)
+    output = os.path.join(tmp_path, "export.pdf")
+    main(["export", "--file", filename, "--format", "pdf", "--stations", "-o", output])
+    with open(output, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+
+def test_cli_does_not_import_gui_or_pdf():
+    code = "import sys, patient_tool; print('flet' in sys.modules, 'fpdf' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.stdout.split() == ["False", "False"]
+
+def test_convert_to_sqlite(tmp_path):
+    filename = make_data(tmp_path)
+    target = os.path.join(tmp_path, "patients.db")
+    assert main(["convert", filename, target]) == 0
+    assert [p.name for p in DataManager(target).patients] == [p.name for p in DataManager(filename).patients]
+
+def test_export_defaults_to_converted_file(tmp_path, monkeypatch, capsys):
+    import utils
+    monkeypatch.setattr(utils, "get_resource_path", lambda name: os.path.join(tmp_path, name))
+    filename = make_data(tmp_path)
+    main(["convert", filename, os.path.join(tmp_path, "patients.db")])
+    # Nach der Umwandlung arbeitet die App mit patients.db -> Export ohne --file ebenfalls
+    dm = DataManager(os.path.join(tmp_path, "patients.db"))
+    patient = next(p for p in dm.patients if p.name == "Zweiter")
+    patient.name = "Nur in der Datenbank"
+    dm.update_patient(patient)
+    dm.close()
+    main(["export", "--fields", "name"])
+    assert "Nur in der Datenbank" in capsys.readouterr().out
@@ -0,0 +1,126 @@
+import os
+import threading
+import warnings
+import pytest
+from fpdf import FPDF
+from data_manager import Patient
+from pdf_layout import CONTENT_START_Y, GlyphWidths, LINE_HEIGHT, MARGIN, PdfExportCancelled, paginate, paginate_sections, wrap_block
+from utils import create_patient_pdf, create_station_pdf, create_station_pdfs, group_by_station
+
+def test_wrap_matches_multi_cell():
+    pdf = FPDF()
+    pdf.add_page()
+    lines = [
+        "",
+        "    Kurz",
+        "    " + "Meropenem 1 g 3x täglich seit 01.03., Vancomycin nach Spiegel " * 4,
+        "x" * 250,
+        "Wort " * 60 + "   ",
+    ]
+    for bold in (False, True):
+        pdf.set_font("helvetica", style="B" if bold else "", size=10)
+        metrics = GlyphWidths(bold=bold)
+        for line in lines:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                expected = pdf.multi_cell(pdf.w - 2 * pdf.l_margin, 5, line, split_only=True)
+            assert metrics.wrap(line) == expected
+
+def test_wrap_block_marks_name_bold():
+    block = wrap_block("Name: Max\n  Diagnosen:\n    Sepsis")
+    assert block == [("Name: Max", True), ("  Diagnosen:", False), ("    Sepsis", False)]
+
+def test_paginate_keeps_blocks_together():
+    block = [("Name", True)] + [("Zeile", False)] * 9  # 50 mm + Abstand
+    pages = paginate([block] * 6, start_y=25)
+
+    assert len(pages) == 2
+    # Kein Block wird über eine Seitengrenze verteilt
+    assert len(pages[0].lines) % len(block) == 0
+    assert pages[1].lines[0].y == MARGIN
+    assert pages[1].lines[0].bold
+
+def test_paginate_splits_oversized_block():
+    block = [("Name", True)] + [("Zeile", False)] * 80
+    pages = paginate([block], start_y=25)
+    assert len(pages) == 2
+    assert sum(len(p.lines) for p in pages) == 81
+    assert all(line.y + LINE_HEIGHT <= 282 for p in pages for line in p.lines)
+
+def test_create_patient_pdf(tmp_path):
+    filepath = os.path.join(tmp_path, "export.pdf")
+    patients = [Patient(name=f"P{i}", diagnosen="Sepsis → ARDS") for i in range(50)]
+    create_patient_pdf(patients, ["name", "diagnosen"], filepath)
+    with open(filepath, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+
+def test_create_patient_pdf_progress(tmp_path):
+    filepath = os.path.join(tmp_path, "export.pdf")
+    reported = []
+    create_patient_pdf([Patient(name=f"P{i}") for i in range(20)], ["name"], filepath, progress=reported.append)
+    assert reported == sorted(reported)
+    assert reported[-1] == 1
+
+def test_create_patient_pdf_cancel(tmp_path):
+    filepath = os.path.join(tmp_path, "export.pdf")
+    cancel_event = threading.Event()
+
+    def progress(fraction):
+        if fraction > 0.3:
+            cancel_event.set()
+
+    with pytest.raises(PdfExportCancelled):
+        create_patient_pdf([Patient(name=f"P{i}") for i in range(20)], ["name"], filepath,
+                           progress=progress, cancel_event=cancel_event)
+    assert not os.path.exists(filepath)
+
+def test_paginate_sections_start_on_new_page():
+    block = [("Name", True), ("Zeile", False)]
+    pages = paginate_sections([("ITS1", [block] * 30), ("ITS2", [block])])
+
+    assert [p.title for p in pages] == ["ITS1", None, "ITS2"]
+    assert pages[2].lines[0].y == CONTENT_START_Y
+
+def test_group_by_station():
+    patients = [Patient(name="A", bettplatz="ITS1 1"), Patient(name="B", bettplatz="IMC 3"), Patient(name="C", bettplatz="ITS1 2")]
+    groups = group_by_station(patients)
+    assert list(groups) == ["ITS1", "IMC"]
+    assert [p.name for p in groups["ITS1"]] == ["A", "C"]
+
+def _page_count(filepath):
+    with open(filepath, "rb") as f:
+        return f.read().count(b"/Type /Page\n")
+
+def test_create_station_pdf_merges_stations(tmp_path):
+    filepath = os.path.join(tmp_path, "stationen.pdf")
+    patients = [Patient(name=f"P{i}", bettplatz=f"{station} {i}") for station in ("ITS1", "ITS2", "IMC") for i in range(5)]
+    reported = []
+    create_station_pdf(patients, ["name", "bettplatz"], filepath, progress=reported.append)
+
+    # Eine Seite je Station, fortlaufend nummeriert
+    assert _page_count(filepath) == 3
+    assert reported[-1] == pytest.approx(1.0)
+
+def test_create_station_pdfs_writes_one_file_per_station(tmp_path):
+    patients = [Patient(name="A", bettplatz="ITS1 1"), Patient(name="B", bettplatz="IMC 3"), Patient(name="C")]
+    paths = create_station_pdfs(patients, ["name"], str(tmp_path), prefix="Export")
+
+    assert [os.path.basename(p) for p in paths] == ["Export_ITS1.pdf", "Export_IMC.pdf", "Export_ohne_Station.pdf"]
+    assert all(_page_count(p) == 1 for p in paths)
+
+def test_create_station_pdf_cancel(tmp_path):
+    filepath = os.path.join(tmp_path, "stationen.pdf")
+    cancel = threading.Event()
+    cancel.set()
+    patients = [Patient(name="A", bettplatz="ITS1 1"), Patient(name="B", bettplatz="IMC 3")]
+    with pytest.raises(PdfExportCancelled):
+        create_station_pdf(patients, ["name"], filepath, cancel_event=cancel)
+    assert not os.path.exists(filepath)
+
+def test_create_station_pdfs_unique_filenames(tmp_path):
+    # Stationen, die zum selben Dateinamen bereinigt werden, überschreiben sich nicht
+    patients = [Patient(name="A", bettplatz="ITS-A/1 3"), Patient(name="B", bettplatz="ITS-A.1 4"), Patient(name="C", bettplatz="its-a_1 2")]
+    paths = create_station_pdfs(patients, ["name"], str(tmp_path), prefix="Export")
+
+    assert [os.path.basename(p) for p in paths] == ["Export_ITS-A_1.pdf", "Export_ITS-A_1_2.pdf", "Export_its-a_1_3.pdf"]
+    assert all(_page_count(p) == 1 for p in paths)
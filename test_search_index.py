@@ -0,0 +1,132 @@
+import time
+from search_index import SearchIndex, TrigramIndex, normalize, query_extends, tokenize
+from data_manager import Patient
+
+def _index(*patients):
+    index = SearchIndex()
+    for p in patients:
+        index.update(p)
+    return index
+
+def test_tokenize():
+    assert tokenize("Z.n. PFO-Verschluss, Meropenem") == {"z", "n", "pfo", "verschluss", "meropenem"}
+    assert tokenize("") == set()
+
+def test_prefix_search_across_fields():
+    a = Patient(name="Anna", antiinfektiva="Meropenem 1g")
+    b = Patient(name="Bernd", diagnosen="PFO")
+    index = _index(a, b)
+
+    assert index.search("mero") == {a.id}
+    assert index.search("pfo") == {b.id}
+    assert index.search("ANN") == {a.id}
+    assert index.search("xyz") == set()
+    assert index.search("") is None
+
+def test_field_scoped_search():
+    a = Patient(name="Meropenem-Fan", diagnosen="Sepsis")
+    b = Patient(name="Bernd", antiinfektiva="Meropenem")
+    index = _index(a, b)
+
+    assert index.search("mero") == {a.id, b.id}
+    assert index.search("antiinfektiva:mero") == {b.id}
+    assert index.search("antiinfektiva:mero sepsis") == set()
+    assert index.search("name:mero sepsis") == {a.id}
+
+def test_incremental_update_and_remove():
+    a = Patient(name="Anna", antiinfektiva="Pip/Taz")
+    index = _index(a)
+
+    a.antiinfektiva = "Meropenem"
+    index.update(a)
+    assert index.search("pip") == set()
+    assert index.search("mero") == {a.id}
+
+    index.remove(a.id)
+    assert index.search("anna") == set()
+    assert len(index) == 0
+
+def test_update_only_given_fields():
+    a = Patient(name="Anna", antiinfektiva="Pip/Taz", verlauf="stabil")
+    index = _index(a)
+
+    a.antiinfektiva = "Meropenem"
+    a.verlauf = "instabil"
+    index.update(a, fields={"antiinfektiva"})
+    assert index.search("mero") == {a.id}
+    # Nicht genannte Felder behalten ihre bisherigen Einträge
+    assert index.search("verlauf:stabil") == {a.id}
+    assert index.search("instabil") == set()
+
+def test_normalize():
+    assert normalize("Müller-Lüdenscheidt") == "mueller-luedenscheidt"
+    assert normalize("Weiß") == "weiss"
+    assert normalize("José") == "jose"
+
+def test_trigram_typo_tolerance():
+    mueller = Patient(name="Müller, Hans", bettplatz="ITS2 12")
+    meier = Patient(name="Meier, Eva", bettplatz="ITS2 3")
+    index = TrigramIndex()
+    index.update(mueller)
+    index.update(meier)
+
+    ranked = index.search("Mueler")
+    assert ranked[0][0] == mueller.id
+    assert all(pid != meier.id for pid, _ in ranked)
+    assert index.search("muller hans")[0][0] == mueller.id
+    assert index.search("its")  # Bettplatz ist mitindiziert
+    assert index.search("zzz") == []
+
+def test_trigram_update_and_remove():
+    p = Patient(name="Schmidt")
+    index = TrigramIndex()
+    index.update(p)
+    p.name = "Schulz"
+    index.update(p)
+    assert index.search("Schmitt") == []
+    assert index.search("Schultz")[0][0] == p.id
+
+    index.remove(p.id)
+    assert index.search("Schulz") == []
+    assert len(index) == 0
+
+def test_query_extends():
+    assert query_extends("mer", "mero")
+    assert query_extends("mero", "mero sep")
+    assert not query_extends("", "mero")
+    assert not query_extends("mero", "mer")
+    assert not query_extends("name", "name:x")
+    # Vorherige Anfrage ohne Suchbegriff hat nichts gefiltert
+    assert not query_extends("antiinfektiva:", "antiinfektiva:m")
+    assert not query_extends("-", "-m")
+
+def test_search_within_candidates():
+    a = Patient(name="Anna", antiinfektiva="Meropenem")
+    b = Patient(name="Bernd", antiinfektiva="Meropenem")
+    index = _index(a, b)
+
+    assert index.search("mero", candidates=[a.id]) == {a.id}
+    assert index.search("antiinfektiva:mero anna", candidates=[a.id, b.id]) == {a.id}
+    assert index.search("mero", candidates=["unbekannt"]) == set()
+
+def _best_time(func, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def test_narrowing_not_slower_than_lookup():
+    words = ["meropenem", "metoprolol", "morphin", "midazolam", "pneumonie", "sepsis", "heparin"]
+    index = _index(*(
+        Patient(name=f"Muster {i}", verlauf=" ".join(f"{words[(i + j) % len(words)]}{j}" for j in range(20)))
+        for i in range(3000)
+    ))
+    for previous, query in (("m", "me"), ("mero", "meropenem")):
+        candidates = index.search(previous)
+        narrowed = _best_time(lambda: index.search(query, candidates))
+        plain = _best_time(lambda: index.search(query))
+        assert index.search(query, candidates) == index.search(query)
+        # Großzügige Toleranz gegen Messrauschen; die direkte Prüfung je Kandidat war ~50x langsamer
+        assert narrowed < plain * 3
@@ -0,0 +1,64 @@
+import os
+import threading
+import pytest
+from components.search_pipeline import SearchPipeline
+from data_manager import DataManager, Patient
+
+@pytest.fixture
+def dm(tmp_path):
+    dm = DataManager(os.path.join(tmp_path, "test_patients.yaml"))
+    dm.add_patient(Patient(name="Müller", antiinfektiva="Meropenem"))
+    dm.add_patient(Patient(name="Meier", antiinfektiva="Metronidazol"))
+    return dm
+
+def test_synchronous_without_debounce(dm):
+    delivered = []
+    search = SearchPipeline(dm, on_results=lambda q, r: delivered.append((q, r)), debounce=0)
+
+    search.submit("me")
+    assert [p.name for p in delivered[-1][1]] == ["Müller", "Meier"]
+    search.submit("mero")
+    assert [p.name for p in delivered[-1][1]] == ["Müller"]
+    search.submit("")
+    assert delivered[-1] == ("", None)
+
+def test_narrowing_uses_previous_results(dm, monkeypatch):
+    calls = []
+    original = dm.search_patients
+
+    def spy(query, fuzzy=True, within=None):
+        calls.append((query, None if within is None else sorted(within)))
+        return original(query, fuzzy=fuzzy, within=within)
+
+    monkeypatch.setattr(dm, "search_patients", spy)
+    search = SearchPipeline(dm, on_results=lambda q, r: None, debounce=0)
+    search.submit("me")
+    search.submit("mer")
+    search.submit("antiinfektiva:mer")
+
+    assert calls[0][1] is None
+    assert len(calls[1][1]) == 2  # nur innerhalb der Treffer von "me"
+    assert calls[2][1] is None  # neuer Feldfilter -> volle Suche
+
+def test_debounce_delivers_only_latest(dm):
+    delivered = []
+    done = threading.Event()
+
+    def on_results(query, results):
+        delivered.append(query)
+        done.set()
+
+    search = SearchPipeline(dm, on_results=on_results, debounce=0.05)
+    for query in ("m", "mu", "mue", "muel"):
+        search.submit(query)
+
+    assert done.wait(5)
+    assert delivered == ["muel"]
+
+def test_cancel_discards_pending(dm):
+    delivered = []
+    search = SearchPipeline(dm, on_results=lambda q, r: delivered.append(q), debounce=0.05)
+    search.submit("mero")
+    search.cancel()
+    threading.Event().wait(0.2)
+    assert delivered == []
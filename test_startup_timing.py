@@ -0,0 +1,17 @@
+import pytest
+from startup_timing import StartupTimer
+
+def test_startup_timer_report_and_log(tmp_path, capsys):
+    timer = StartupTimer(start=0.0)
+    timer.mark("importe")
+    timer.mark("laden")
+    assert [name for name, _ in timer.marks] == ["importe", "laden"]
+    assert timer.total == pytest.approx(sum(seconds for _, seconds in timer.marks))
+
+    log = tmp_path / "startup.log"
+    timer.write(str(log))
+    timer.write(str(log))
+    assert "importe=" in capsys.readouterr().err
+    lines = log.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert lines[0].endswith(timer.report())
@@ -0,0 +1,38 @@
+import flet as ft
+from components.station_groups import StationGroups
+from data_manager import Patient
+
+def _groups(patients, expanded=None):
+    built = []
+
+    def build(p):
+        built.append(p.id)
+        return ft.Text(p.name)
+
+    by_station = {}
+    for station, p in patients:
+        by_station.setdefault(station, []).append(p)
+    groups = StationGroups(ft.ListView(), build=build, signature=lambda p: p.name, expanded=expanded)
+    groups.reconcile(((s, len(ps)) for s, ps in by_station.items()), by_station.get)
+    return groups, built
+
+def test_rows_built_only_when_expanded():
+    a, b, c = Patient(name="A"), Patient(name="B"), Patient(name="C")
+    groups, built = _groups([("ITS1", a), ("ITS1", b), ("ITS2", c)])
+    assert len(groups.container.controls) == 2
+    assert built == []
+
+    groups.toggle("ITS2")
+    assert built == [c.id]
+    assert groups.expanded == {"ITS2"}
+
+    # Zuklappen verwirft die Zeilen wieder
+    groups.toggle("ITS2")
+    assert groups._groups["ITS2"].body.controls == []
+
+def test_single_station_always_expanded():
+    a = Patient(name="A")
+    expanded = set()
+    groups, built = _groups([("ITS1", a)], expanded)
+    assert built == [a.id]
+    assert groups.is_expanded("ITS1")
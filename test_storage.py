@@ -0,0 +1,200 @@
+import gzip
+import pytest
+import json
+import os
+import sqlite3
+from data_manager import DataManager, Patient, convert_storage, open_storage
+from storage import FileLock, PatientArchive, SqliteStorage, YamlStorage
+
+def test_open_storage_by_extension(tmp_path):
+    assert isinstance(open_storage(os.path.join(tmp_path, "p.yaml")), YamlStorage)
+    assert isinstance(open_storage(os.path.join(tmp_path, "p.db")), SqliteStorage)
+
+def test_sqlite_roundtrip(tmp_path):
+    filename = os.path.join(tmp_path, "patients.db")
+    dm = DataManager(filename)
+    first = Patient(name="Eins", bettplatz="ITS1 1", ecmo=True, verlauf="Zeile 1\nZeile 2")
+    second = Patient(name="Zwei", bettplatz="ITS1 2")
+    dm.add_patient(first)
+    dm.add_patient(second)
+    first.name = "Eins geändert"
+    dm.update_patient(first)
+    dm.close()
+
+    loaded = DataManager(filename)
+    assert [p.name for p in loaded.patients] == ["Eins geändert", "Zwei"]
+    assert loaded.patients[0].ecmo is True
+    assert loaded.patients[0].verlauf == "Zeile 1\nZeile 2"
+    loaded.remove_patient(second.id)
+    loaded.close()
+    assert [p.id for p in DataManager(filename).patients] == [first.id]
+
+def test_sqlite_update_writes_changed_columns_only(tmp_path):
+    filename = os.path.join(tmp_path, "patients.db")
+    dm = DataManager(filename)
+    patient = Patient(name="Eins")
+    dm.add_patient(patient)
+
+    statements = []
+    dm.storage._conn.set_trace_callback(statements.append)
+    patient.diagnosen = "Sepsis"
+    dm.update_patient(patient)
+    dm.close()
+
+    upserts = [s for s in statements if s.startswith("INSERT")]
+    assert len(upserts) == 1
+    assert '"diagnosen"' in upserts[0] and '"name"' not in upserts[0]
+
+def test_sqlite_indexes(tmp_path):
+    filename = os.path.join(tmp_path, "patients.db")
+    DataManager(filename).close()
+    with sqlite3.connect(filename) as conn:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_patients_bettplatz", "idx_patients_hidden", "idx_patients_ecmo"} <= indexes
+
+def test_convert_yaml_sqlite_yaml(tmp_path):
+    yaml_file = os.path.join(tmp_path, "patients.yaml")
+    db_file = os.path.join(tmp_path, "patients.db")
+    back_file = os.path.join(tmp_path, "back.yaml")
+    dm = DataManager(yaml_file)
+    for i in range(3):
+        dm.add_patient(Patient(name=f"P{i}", hidden=i == 1, crrt=i == 2))
+    dm.close()
+
+    assert convert_storage(yaml_file, db_file) == 3
+    assert convert_storage(db_file, back_file) == 3
+    assert DataManager(back_file).patients == DataManager(yaml_file).patients
+
+def test_yaml_write_changes_requests_compaction(tmp_path):
+    storage = YamlStorage(os.path.join(tmp_path, "p.yaml"), journal=True, journal_max_bytes=100)
+    assert storage.write_changes({"a": {"name": "kurz"}}) is False
+    assert storage.write_changes({"a": {"verlauf": "x" * 200}}) is True
+
+def test_archive_last_entry_wins(tmp_path):
+    archive = PatientArchive(os.path.join(tmp_path, "p.archive.jsonl.gz"))
+    archive.put([{"id": "a", "name": "Alt"}, {"id": "b", "name": "B"}])
+    archive.put([{"id": "a", "name": "Neu"}])
+    archive.remove(["b"])
+    assert archive.load() == [{"id": "a", "name": "Neu"}]
+
+def test_archive_compacts_on_load(tmp_path):
+    archive = PatientArchive(os.path.join(tmp_path, "p.archive.jsonl.gz"))
+    for i in range(150):
+        archive.put([{"id": "a", "version": i}])
+    size = os.path.getsize(archive.filename)
+    assert archive.load() == [{"id": "a", "version": 149}]
+    assert os.path.getsize(archive.filename) < size
+    assert archive.load() == [{"id": "a", "version": 149}]
+
+def test_archive_ignores_truncated_member(tmp_path):
+    archive = PatientArchive(os.path.join(tmp_path, "p.archive.jsonl.gz"))
+    archive.put([{"id": "a"}])
+    with open(archive.filename, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00abc")
+    assert archive.load() == [{"id": "a"}]
+
+def _gzip_member(entries):
+    return gzip.compress("".join(json.dumps(e) + "\n" for e in entries).encode("utf-8"))
+
+def test_archive_skips_torn_member_followed_by_appends(tmp_path):
+    archive = PatientArchive(os.path.join(tmp_path, "p.archive.jsonl.gz"))
+    archive.put([{"id": "a"}])
+    # Abgebrochenes Anhängen, danach weitere Änderungen
+    torn = _gzip_member([{"id": "b", "record": {"id": "b", "text": "x" * 5000}}])
+    with open(archive.filename, "ab") as f:
+        f.write(torn[:len(torn) // 2])
+    archive.put([{"id": "c"}])
+    archive.remove(["a"])
+    assert archive.load() == [{"id": "c"}]
+    assert archive.damaged
+
+def test_archive_not_rewritten_after_read_error(tmp_path):
+    archive = PatientArchive(os.path.join(tmp_path, "p.archive.jsonl.gz"))
+    for version in range(150):
+        archive.put([{"id": "a", "version": version}])
+    member = _gzip_member([{"id": "b", "record": {"id": "b"}}])
+    # Beschädigtes Member (falsche Prüfsumme) mitten im Archiv
+    with open(archive.filename, "ab") as f:
+        f.write(member[:-8] + b"\0" * 8)
+    archive.put([{"id": "c"}])
+    size = os.path.getsize(archive.filename)
+    assert archive.load() == [{"id": "a", "version": 149}, {"id": "c"}]
+    assert os.path.getsize(archive.filename) == size
+
+def test_sharded_update_rewrites_only_one_file(tmp_path, monkeypatch):
+    directory = os.path.join(tmp_path, "patients.d")
+    dm = DataManager(directory)
+    first = Patient(name="Eins", bettplatz="1")
+    second = Patient(name="Zwei", bettplatz="2")
+    dm.add_patient(first)
+    dm.add_patient(second)
+    assert sorted(os.listdir(directory)) == sorted(["index.json", f"{first.id}.yaml", f"{second.id}.yaml"])
+
+    written = []
+    original = dm.storage._write_index
+    monkeypatch.setattr(dm.storage, "_write_shard", lambda r: written.append(r["id"]))
+    monkeypatch.setattr(dm.storage, "_write_index", lambda: written.append("index") or original())
+    first.verlauf = "stabil"
+    dm.update_patient(first)
+    assert written == [first.id]
+
+    first.ecmo = True
+    dm.update_patient(first)
+    assert written == [first.id, first.id, "index"]
+
+def test_sharded_lists_from_index_only(tmp_path, monkeypatch):
+    directory = os.path.join(tmp_path, "patients.d")
+    dm = DataManager(directory)
+    patient = Patient(name="Eins", bettplatz="1", diagnosen="Sepsis", ecmo=True)
+    dm.add_patient(patient)
+    dm.add_patient(Patient(name="Zwei", bettplatz="2"))
+
+    dm = DataManager(directory)
+    reads = []
+    original = dm.storage._read_shard
+    monkeypatch.setattr(dm.storage, "_read_shard", lambda pid: reads.append(pid) or original(pid))
+    summaries = list(dm.iter_sorted_patients(summary=True))
+    assert [(p.name, p.ecmo) for p in summaries] == [("Eins", True), ("Zwei", False)]
+    assert reads == []
+
+    # Die Patientenansicht lädt den vollständigen Datensatz
+    assert dm.get_patient_by_id(patient.id) == patient
+    assert reads == [patient.id]
+
+    # Der Volltextindex entsteht bei der ersten Suche
+    assert [p.id for p in dm.search_patients("sepsis", fuzzy=False)] == [patient.id]
+
+def test_sharded_remove_and_convert(tmp_path):
+    yaml_file = os.path.join(tmp_path, "patients.yaml")
+    directory = os.path.join(tmp_path, "patients.d")
+    dm = DataManager(yaml_file)
+    for i in range(3):
+        dm.add_patient(Patient(name=f"P{i}", verlauf="Zeile 1\nZeile 2"))
+    assert convert_storage(yaml_file, directory) == 3
+
+    sharded = DataManager(directory)
+    assert sharded.patients == dm.patients
+    removed = dm.patients[1].id
+    sharded.remove_patient(removed)
+    assert not os.path.exists(os.path.join(directory, f"{removed}.yaml"))
+    assert [p.name for p in DataManager(directory).patients] == ["P0", "P2"]
+
+def test_file_lock_nested_stale_and_timeout(tmp_path):
+    filename = os.path.join(tmp_path, "p.yaml.lock")
+    lock = FileLock(filename, timeout=0.1)
+    with lock:
+        with lock:
+            assert os.path.exists(filename)
+        assert os.path.exists(filename)
+        with pytest.raises(TimeoutError):
+            with FileLock(filename, timeout=0.1):
+                pass
+    assert not os.path.exists(filename)
+
+    # Verwaiste Sperre (Absturz) wird nach stale_after übernommen
+    with open(filename, "w") as f:
+        f.write("alt\n")
+    os.utime(filename, (0, 0))
+    with FileLock(filename, timeout=0.1, stale_after=60):
+        pass
+    assert not os.path.exists(filename)
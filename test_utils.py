@@ -1,4 +1,6 @@
-from utils import format_patient_export, get_current_date_prefix, sanitize_for_pdf
+import os
+import utils
+from utils import EXPORT_SEPARATOR, find_patient_file, iter_patient_export, ExportCache, format_patient_export, format_patient_field, get_current_date_prefix, parse_bettplatz, sanitize_for_pdf, station_of, support_labels, support_mask, SUPPORT_BITS
 from data_manager import Patient
 from datetime import datetime
 
@@ -33,3 +35,70 @@ def test_sanitize_for_pdf():
     assert "\u2192" not in sanitized
     assert "->" in sanitized
     assert "?" in sanitized # \u263a (Smiley) ist nicht in Latin-1 und sollte durch ? ersetzt werden
+
+def test_format_patient_field():
+    p = Patient(name="Max", bettplatz="1", verlauf="Zeile 1\nZeile 2", ecmo=True)
+    assert format_patient_field(p, "bettplatz") == ["  Bettplatz: 1"]
+    assert format_patient_field(p, "unterstuetzung") == ["  Unterstützung: ECMO"]
+    assert format_patient_field(p, "verlauf") == ["  Verlauf:", "    Zeile 1", "    Zeile 2"]
+    assert format_patient_field(p, "diagnosen") == []
+
+def test_export_cache_matches_format(monkeypatch):
+    import utils
+    p = Patient(name="Max", bettplatz="1", diagnosen="Sepsis", verlauf="stabil")
+    cache = ExportCache()
+    fields = ["name", "diagnosen"]
+    assert cache.block(p, 1, fields) == format_patient_export(p, fields)
+
+    formatted = []
+    original = utils.format_patient_field
+    monkeypatch.setattr(utils, "format_patient_field", lambda pat, f: formatted.append(f) or original(pat, f))
+
+    # Gleiche Revision und Felder -> aus dem Cache
+    cache.block(p, 1, fields)
+    assert formatted == []
+
+    # Zusätzliches Feld -> nur dieses wird formatiert
+    fields = ["name", "diagnosen", "verlauf"]
+    block = cache.block(p, 1, fields)
+    assert formatted == ["verlauf"]
+    assert block == format_patient_export(p, fields)
+
+    # Neue Revision -> Abschnitte werden neu formatiert
+    p.diagnosen = "Pneumonie"
+    assert "Pneumonie" in cache.block(p, 2, fields)
+
+def test_station_of():
+    assert station_of("ITS2 12") == "ITS2"
+    assert station_of("ITS 1 12") == "ITS 1"
+    assert station_of("A3") == "A"
+    assert station_of("12") == ""
+    assert station_of("") == ""
+
+def test_iter_patient_export_streams_blocks():
+    patients = (Patient(name=f"P{i}") for i in range(3))
+    chunks = list(iter_patient_export(patients, ["name"]))
+    assert chunks == [f"Name: P{i}\n{EXPORT_SEPARATOR}\n" for i in range(3)]
+
+def test_support_mask():
+    p = Patient(ecmo=True, sedierung=True)
+    mask = support_mask(p)
+    assert mask == SUPPORT_BITS["ecmo"] | SUPPORT_BITS["sedierung"]
+    # Rohdaten liefern dieselbe Maske
+    assert support_mask(p.model_dump()) == mask == p.support_mask
+    assert support_labels(mask) == ["ECMO", "Sedierung"]
+
+def test_parse_bettplatz():
+    assert parse_bettplatz("ITS2 12") == ("ITS2", "", "12")
+    assert parse_bettplatz("ITS2 3/12") == ("ITS2", "3", "12")
+    assert parse_bettplatz("ITS 1 12") == ("ITS 1", "", "12")
+    assert parse_bettplatz("A-3") == ("A", "", "3")
+    assert parse_bettplatz("") == ("", "", "")
+
+def test_find_patient_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "get_resource_path", lambda name: os.path.join(tmp_path, name))
+    assert find_patient_file() == os.path.join(tmp_path, "patients.yaml")
+    os.mkdir(tmp_path / "patients.d")
+    assert find_patient_file() == os.path.join(tmp_path, "patients.d")
+    (tmp_path / "patients.db").touch()
+    assert find_patient_file() == os.path.join(tmp_path, "patients.db")
@@ -2,7 +2,9 @@ import os
 import sys
 import re
 from datetime import datetime
-from fpdf import FPDF
+
+# Anteil der Layout-Stufe am Gesamtfortschritt der PDF-Erzeugung
+LAYOUT_SHARE = 0.6
 
 def get_resource_path(filename):
     if getattr(sys, 'frozen', False):
@@ -19,64 +21,180 @@ def get_resource_path(filename):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, filename)
 
+# Patientendateien neben der App in der Reihenfolge, in der sie gesucht werden:
+# SQLite bzw. Ordner mit einer Datei je Patient (nach Umwandlung), sonst die YAML-Datei
+PATIENT_FILES = ("patients.db", "patients.d", "patients.yaml")
+
+def find_patient_file():
+    """Pfad der Patientendatei neben der App (siehe PATIENT_FILES); Standard ist patients.yaml."""
+    for name in PATIENT_FILES[:-1]:
+        path = get_resource_path(name)
+        if os.path.exists(path):
+            return path
+    return get_resource_path(PATIENT_FILES[-1])
+
+def get_cache_dir():
+    """Lokales Cache-Verzeichnis des Benutzers (bewusst nicht neben der EXE, die auf einem Netzlaufwerk liegen kann)."""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "patient-tool")
+
 def natural_sort_key(s):
     return [int(text) if text.isdigit() else text.lower()
             for text in re.split('([0-9]+)', s)]
 
+def station_of(bettplatz):
+    """Stationsanteil eines Bettplatzes ("ITS2 12" -> "ITS2", "ITS 1 12" -> "ITS 1", "A3" -> "A")."""
+    parts = (bettplatz or "").split()
+    if len(parts) > 1:
+        return " ".join(parts[:-1])
+    if not parts:
+        return ""
+    # Ohne Leerzeichen: führende Nicht-Ziffern bilden die Station
+    return re.match(r"\D*", parts[0]).group().rstrip(" -/")
+
+def parse_bettplatz(bettplatz):
+    """Zerlegt einen Bettplatz in (Station, Zimmer, Bett); fehlende Teile sind leer.
+
+    "ITS2 12" -> ("ITS2", "", "12"), "ITS2 3/12" -> ("ITS2", "3", "12"), "A3" -> ("A", "", "3")
+    """
+    station = station_of(bettplatz)
+    parts = (bettplatz or "").split()
+    if not parts:
+        return ("", "", "")
+    rest = (parts[-1] if len(parts) > 1 else parts[0][len(station):]).strip("/.- ")
+    # Zimmer und Bett durch "/", "." oder "-" getrennt
+    match = re.match(r"(.+?)[/.-](.+)", rest)
+    room, bed = match.groups() if match else ("", rest)
+    return (station, room, bed)
+
+def group_by_station(patients):
+    """Teilt (sortierte) Patienten nach Station auf; Reihenfolge der ersten Vorkommen bleibt erhalten."""
+    groups = {}
+    for p in patients:
+        groups.setdefault(station_of(p.bettplatz), []).append(p)
+    return groups
+
 def get_current_date_prefix():
     return f"[{datetime.now().strftime('%d.%m.')}]"
 
+# Unterstützungs-Checkboxen mit Export-Label
+MEDICAL_FIELDS = {
+    "invasive_beatmung": "Beatmung",
+    "niv": "NIV",
+    "hfnc": "HFNC",
+    "crrt": "CRRT",
+    "ecmo": "ECMO",
+    "impella": "Impella",
+    "vasopressoren": "Vasopressoren",
+    "inotropika": "Inotropika",
+    "ihd": "iHD",
+    "sedierung": "Sedierung"
+}
+
+# Unterstützungs-Flags in Bit-Reihenfolge: Bit i der Bitmaske steht für SUPPORT_FLAGS[i]
+SUPPORT_FLAGS = tuple(MEDICAL_FIELDS)
+SUPPORT_BITS = {flag: 1 << i for i, flag in enumerate(SUPPORT_FLAGS)}
+
+def support_mask(patient):
+    """Packt die Unterstützungs-Flags eines Patienten (bzw. dessen Rohdaten) in eine Bitmaske."""
+    get = patient.get if isinstance(patient, dict) else patient.__dict__.get
+    mask = 0
+    for flag, bit in SUPPORT_BITS.items():
+        if get(flag):
+            mask |= bit
+    return mask
+
+def support_labels(mask):
+    """Export-Labels der in mask gesetzten Flags (in SUPPORT_FLAGS-Reihenfolge)."""
+    return [MEDICAL_FIELDS[flag] for flag, bit in SUPPORT_BITS.items() if mask & bit]
+
+# Textfelder mit Export-Label (in Ausgabereihenfolge)
+EXPORT_FIELD_LABELS = {
+    "diagnosen": "Diagnosen",
+    "nebendiagnosen": "Nebendiagnosen",
+    "operationen": "Operationen",
+    "weitere_operationen": "Weitere Operationen",
+    "kardiale_funktion": "Kardiale Funktion",
+    "antiinfektiva": "Antiinfektiva",
+    "diagnostik": "Diagnostik",
+    "verlauf": "Verlauf",
+    "probleme_aufgaben": "Probleme/Aufgaben",
+    "uebergabe": "Übergabe"
+}
+
+# Reihenfolge der Abschnitte unterhalb der Namenszeile
+EXPORT_FIELD_ORDER = ["bettplatz", "unterstuetzung", *EXPORT_FIELD_LABELS]
+
+# Standardauswahl der Export-Felder
+DEFAULT_EXPORT_FIELDS = ["name", "unterstuetzung", "diagnosen", "nebendiagnosen", "operationen", "kardiale_funktion", "antiinfektiva", "uebergabe"]
+
+# Trennlinie zwischen zwei Patienten im Text-Export
+EXPORT_SEPARATOR = "-" * 40
+
+def format_patient_field(patient, field):
+    """Gibt die Export-Zeilen eines einzelnen Feldes zurück (leer, falls nichts auszugeben ist)."""
+    if field == "bettplatz":
+        return [f"  Bettplatz: {patient.bettplatz}"]
+    if field == "unterstuetzung":
+        active_supports = support_labels(support_mask(patient))
+        if active_supports:
+            return [f"  Unterstützung: {', '.join(active_supports)}"]
+        return []
+    label = EXPORT_FIELD_LABELS.get(field)
+    value = getattr(patient, field, None) if label else None
+    if not value:
+        return []
+    return [f"  {label}:"] + [f"    {line}" for line in value.splitlines()]
+
 def format_patient_export(patient, fields_to_include):
-    lines = []
-    lines.append(f"Name: {patient.name}")
-    if "bettplatz" in fields_to_include:
-        lines.append(f"  Bettplatz: {patient.bettplatz}")
-    
-    # Neue Checkbox-Felder
-    medical_fields = {
-        "invasive_beatmung": "Beatmung",
-        "niv": "NIV",
-        "hfnc": "HFNC",
-        "crrt": "CRRT",
-        "ecmo": "ECMO",
-        "impella": "Impella",
-        "vasopressoren": "Vasopressoren",
-        "inotropika": "Inotropika",
-        "ihd": "iHD",
-        "sedierung": "Sedierung"
-    }
-    
-    active_supports = []
-    for key, label in medical_fields.items():
-        if getattr(patient, key, False):
-            active_supports.append(label)
-    
-    if active_supports and "unterstuetzung" in fields_to_include:
-        lines.append(f"  Unterstützung: {', '.join(active_supports)}")
-
-    field_mapping = {
-        "diagnosen": "Diagnosen",
-        "nebendiagnosen": "Nebendiagnosen",
-        "operationen": "Operationen",
-        "weitere_operationen": "Weitere Operationen",
-        "kardiale_funktion": "Kardiale Funktion",
-        "antiinfektiva": "Antiinfektiva",
-        "diagnostik": "Diagnostik",
-        "verlauf": "Verlauf",
-        "probleme_aufgaben": "Probleme/Aufgaben",
-        "uebergabe": "Übergabe"
-    }
-    
-    for key, label in field_mapping.items():
-        if key in fields_to_include:
-            value = getattr(patient, key)
-            if value:
-                lines.append(f"  {label}:")
-                for line in value.splitlines():
-                    lines.append(f"    {line}")
-    
+    lines = [f"Name: {patient.name}"]
+    for field in EXPORT_FIELD_ORDER:
+        if field in fields_to_include:
+            lines.extend(format_patient_field(patient, field))
     return "\n".join(lines)
 
+def iter_patient_export(patients, fields_to_include):
+    """Erzeugt den Text-Export blockweise (je Patient ein Block inkl. Trennlinie).
+
+    Da patients ein beliebiger Iterator sein darf, bleibt der Speicherbedarf
+    beim Schreiben in eine Datei unabhängig von der Anzahl der Patienten.
+    """
+    for patient in patients:
+        yield f"{format_patient_export(patient, fields_to_include)}\n{EXPORT_SEPARATOR}\n"
+
+class ExportCache:
+    """Zwischenspeicher für formatierte Export-Blöcke.
+
+    Blöcke sind nach Patienten-ID, Revision und Feldauswahl gecacht, die
+    einzelnen Feldabschnitte nach Patienten-ID und Revision. Ändert sich nur
+    die Feldauswahl, wird lediglich der neue Abschnitt formatiert.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._segments = {}
+
+    def block(self, patient, revision, fields_to_include):
+        fields_key = frozenset(fields_to_include)
+        cached = self._blocks.get(patient.id)
+        if cached and cached[0] == revision and cached[1] == fields_key:
+            return cached[2]
+        lines = [f"Name: {patient.name}"]
+        for field in EXPORT_FIELD_ORDER:
+            if field in fields_key:
+                lines.extend(self._segment(patient, revision, field))
+        text = "\n".join(lines)
+        self._blocks[patient.id] = (revision, fields_key, text)
+        return text
+
+    def _segment(self, patient, revision, field):
+        key = (patient.id, field)
+        cached = self._segments.get(key)
+        if cached is None or cached[0] != revision:
+            cached = (revision, format_patient_field(patient, field))
+            self._segments[key] = cached
+        return cached[1]
+
 def sanitize_for_pdf(text):
     """Ersetzt Unicode-Sonderzeichen durch PDF-kompatible ASCII-Zeichen."""
     if not text:
@@ -102,69 +220,105 @@ def sanitize_for_pdf(text):
     # (FPDF Helvetica nutzt Latin-1)
     return text.encode('latin-1', 'replace').decode('latin-1')
 
-def create_patient_pdf(patients, fields_to_include, filepath):
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("helvetica", size=10)
-    
-    line_height = 5
-    # Nutze etwas Puffer für den unteren Rand
-    margin_bottom = 20
-    page_height = 297 - margin_bottom 
-    
-    pdf.set_font("helvetica", style="B", size=14)
-    pdf.cell(0, 10, f"Patientenliste - Stand {datetime.now().strftime('%d.%m.%Y %H:%M')}", ln=True)
-    pdf.ln(5)
-    
-    for patient in patients:
-        # Text für diesen Patienten generieren
-        patient_text = format_patient_export(patient, fields_to_include)
-        patient_text = sanitize_for_pdf(patient_text)
-        lines = patient_text.splitlines()
-        
-        # Höhenberechnung
-        # fpdf2 multiline text handling: we can use multi_cell with split_only=True to get lines
-        # But here we already have lines. Let's check how long they are to handle wrapping.
-        
-        needed_height = 0
-        formatted_lines = []
-        for line in lines:
-            # Wir müssen prüfen, ob eine Zeile im PDF umbrechen würde
-            # Multi_cell split_only gibt uns die Anzahl der Zeilen zurück
-            # Da wir 10pt Helvetica nutzen, ist die Breite begrenzt.
-            w = pdf.w - 2 * pdf.l_margin
-            # split_text_to_lines ist eine interne Methode oder wir nutzen multi_cell
-            # Einfacher: wir gehen davon aus, dass die meisten Zeilen passen, 
-            # aber zur Sicherheit schätzen wir es.
-            
-            # Bei Schriftgröße 10pt passen ca. 80-100 Zeichen in eine Zeile.
-            # Da Patientenakten oft kurze Stichpunkte sind, passen sie meistens.
-            wrapped = pdf.multi_cell(w, line_height, line, split_only=True)
-            for w_line in wrapped:
-                formatted_lines.append(w_line)
-                needed_height += line_height
-        
-        needed_height += 5 # Abstand nach Patient
-        
-        # Prüfen ob der Block auf die Seite passt
-        if needed_height > (page_height - 20): # Falls Patient > fast ganze Seite
-             if pdf.get_y() > 30: # Nur neue Seite wenn wir nicht schon am Anfang sind
-                pdf.add_page()
-        elif pdf.get_y() + needed_height > page_height:
-            pdf.add_page()
-            
-        # Patientenblock rendern
-        for i, line in enumerate(formatted_lines):
-            if i == 0:
-                pdf.set_font("helvetica", style="B", size=10)
-            else:
-                pdf.set_font("helvetica", style="", size=10)
-            
-            pdf.cell(0, line_height, line, ln=True)
-            
-        pdf.set_draw_color(200, 200, 200)
-        pdf.line(pdf.l_margin, pdf.get_y() + 2, pdf.w - pdf.r_margin, pdf.get_y() + 2)
-        pdf.ln(5) 
-        
-    pdf.output(filepath)
+def create_patient_pdf(patients, fields_to_include, filepath, progress=None, cancel_event=None):
+    """Erstellt die A4-PDF.
+
+    progress (optional) wird mit dem Fortschritt 0..1 aufgerufen; über
+    cancel_event (threading.Event) lässt sich die Erzeugung abbrechen
+    (PdfExportCancelled).
+    """
+    # fpdf erst bei Bedarf laden (Start der App bzw. des Text-Exports bleibt schnell)
+    from pdf_layout import CONTENT_START_Y, GlyphWidths, check_cancelled, paginate, render_pdf, wrap_block
+
+    # 1. Layout: Blöcke in einem Durchgang mit gecachten Glyphbreiten umbrechen
+    regular = GlyphWidths()
+    bold = GlyphWidths(bold=True)
+    blocks = []
+    for i, patient in enumerate(patients):
+        check_cancelled(cancel_event)
+        text = sanitize_for_pdf(format_patient_export(patient, fields_to_include))
+        blocks.append(wrap_block(text, regular, bold))
+        if progress:
+            progress(LAYOUT_SHARE * (i + 1) / len(patients))
+
+    # 2. Seitenumbrüche vorab bestimmen (Titel + Abstand oben)
+    pages = paginate(blocks, start_y=CONTENT_START_Y, title=f"Patientenliste - Stand {_timestamp()}")
+
+    # 3. Zeichnen
+    render_progress = (lambda f: progress(LAYOUT_SHARE + (1 - LAYOUT_SHARE) * f)) if progress else None
+    render_pdf(pages, filepath, progress=render_progress, cancel_event=cancel_event)
+
+def _timestamp():
+    return datetime.now().strftime('%d.%m.%Y %H:%M')
+
+def _station_title(station, timestamp):
+    return f"{station or 'Ohne Station'} - Patientenliste - Stand {timestamp}"
+
+def _station_texts(patients, fields_to_include):
+    return [sanitize_for_pdf(format_patient_export(p, fields_to_include)) for p in patients]
+
+def _render_station_file(texts, title, filepath):
+    """Eine Station komplett als eigene Datei."""
+    from pdf_layout import CONTENT_START_Y, layout_blocks, paginate, render_pdf
+    render_pdf(paginate(layout_blocks(texts), start_y=CONTENT_START_Y, title=title), filepath)
+    return filepath
+
+def _run_jobs(func, jobs, progress=None, cancel_event=None):
+    """Führt func(*job) für alle jobs nacheinander aus und gibt die Ergebnisse zurück.
+
+    progress erhält den Anteil fertiger Jobs; cancel_event bricht vor dem nächsten Job ab.
+    """
+    from pdf_layout import check_cancelled
+    results = []
+    for job in jobs:
+        check_cancelled(cancel_event)
+        results.append(func(*job))
+        if progress:
+            progress(len(results) / len(jobs))
+    return results
+
+def _station_filenames(stations, directory, prefix):
+    """Dateipfade je Station; gleich bereinigte Namen (z.B. "ITS 1" und "ITS/1") erhalten _2, _3 ..."""
+    paths = []
+    used = set()
+    for station in stations:
+        safe_station = re.sub(r"[^\w-]+", "_", station).strip("_") or "ohne_Station"
+        name = safe_station
+        n = 1
+        # Windows unterscheidet Groß-/Kleinschreibung in Dateinamen nicht
+        while name.lower() in used:
+            n += 1
+            name = f"{safe_station}_{n}"
+        used.add(name.lower())
+        paths.append(os.path.join(directory, f"{prefix}_{name}.pdf"))
+    return paths
+
+def create_station_pdf(patients, fields_to_include, filepath, progress=None, cancel_event=None):
+    """Erstellt eine PDF mit einem Abschnitt pro Station (jeweils ab neuer Seite, fortlaufend nummeriert).
+
+    Die Stationen werden einzeln umbrochen und anschließend in einem Durchgang
+    ausgegeben, damit die Seitenzahlen ("Seite x von y") über das ganze Dokument stimmen.
+    """
+    from pdf_layout import layout_blocks, paginate_sections, render_pdf
+    groups = group_by_station(patients)
+    timestamp = _timestamp()
+    jobs = [(_station_texts(group, fields_to_include),) for group in groups.values()]
+
+    layout_progress = (lambda f: progress(LAYOUT_SHARE * f)) if progress else None
+    station_blocks = _run_jobs(layout_blocks, jobs, layout_progress, cancel_event)
+
+    pages = paginate_sections([
+        (_station_title(station, timestamp), blocks) for station, blocks in zip(groups, station_blocks)
+    ])
+    render_progress = (lambda f: progress(LAYOUT_SHARE + (1 - LAYOUT_SHARE) * f)) if progress else None
+    render_pdf(pages, filepath, progress=render_progress, cancel_event=cancel_event, page_numbers=True)
+
+def create_station_pdfs(patients, fields_to_include, directory, prefix="Patienten_Export", progress=None, cancel_event=None):
+    """Erstellt je Station eine eigene PDF und gibt die Dateipfade zurück."""
+    groups = group_by_station(patients)
+    timestamp = _timestamp()
+    jobs = [
+        (_station_texts(group, fields_to_include), _station_title(station, timestamp), filepath)
+        for (station, group), filepath in zip(groups.items(), _station_filenames(groups, directory, prefix))
+    ]
+    return _run_jobs(_render_station_file, jobs, progress, cancel_event)
@@ -1,8 +1,10 @@
 import flet as ft
 import os
+import threading
+from bisect import bisect_left
 from datetime import datetime
 from data_manager import DataManager
-from utils import format_patient_export, create_patient_pdf, get_resource_path
+from utils import DEFAULT_EXPORT_FIELDS, EXPORT_SEPARATOR, ExportCache, create_patient_pdf, create_station_pdf, create_station_pdfs, get_resource_path
 from typing import Callable
 
 def get_export_view(page: ft.Page, dm: DataManager, on_navigate: Callable):
@@ -26,8 +28,7 @@ def get_export_view(page: ft.Page, dm: DataManager, on_navigate: Callable):
     }
     
     # Standardauswahl für Felder
-    default_fields = ["name", "unterstuetzung", "diagnosen", "nebendiagnosen", "operationen", "kardiale_funktion", "antiinfektiva", "uebergabe"]
-    selected_fields = {k: (k in default_fields) for k in fields_config.keys()}
+    selected_fields = {k: (k in DEFAULT_EXPORT_FIELDS) for k in fields_config.keys()}
 
     export_preview = ft.TextField(
         multiline=True,
@@ -40,49 +41,127 @@ def get_export_view(page: ft.Page, dm: DataManager, on_navigate: Callable):
         dense=True
     )
 
-    def update_export_preview():
-        included_patients = [p for p in dm.patients if selected_patients.get(p.id)]
-        sorted_p = dm.sort_patients(included_patients)
-        included_fields = [k for k, v in selected_fields.items() if v]
-        
-        full_text = []
-        for p in sorted_p:
-            full_text.append(format_patient_export(p, included_fields))
-            full_text.append("-" * 40)
-        
-        export_preview.value = "\n".join(full_text)
+    # Formatierte Blöcke je Patient (gecacht nach ID, Revision und Feldauswahl)
+    export_cache = ExportCache()
+    # Aktuell in der Vorschau enthaltene Patienten (nach Bettplatz sortiert) und ihre Blöcke
+    preview_ids = []
+    preview_blocks = []
+
+    def included_fields():
+        return [k for k, v in selected_fields.items() if v]
+
+    def render_block(pid):
+        p = dm.get_patient_by_id(pid)
+        return export_cache.block(p, dm.get_revision(pid), included_fields())
+
+    def refresh_preview_text():
+        separator = "\n" + EXPORT_SEPARATOR
+        export_preview.value = "\n".join(block + separator for block in preview_blocks)
         try:
             if export_preview.page:
                 export_preview.update()
         except Exception:
             pass
 
+    def update_export_preview():
+        # Auswählbar sind nur aktive Patienten -> ausgeblendete müssen nicht geladen werden
+        preview_ids[:] = [p.id for p in dm.iter_sorted_patients() if selected_patients.get(p.id)]
+        preview_blocks[:] = [render_block(pid) for pid in preview_ids]
+        refresh_preview_text()
+
     def on_patient_toggle(pid, val):
         selected_patients[pid] = val
-        update_export_preview()
+        # Nur den Block dieses Patienten einfügen bzw. entfernen
+        if pid in preview_ids:
+            i = preview_ids.index(pid)
+            del preview_ids[i]
+            del preview_blocks[i]
+        if val:
+            key = dm.sort_key(dm.get_patient_by_id(pid))
+            keys = [dm.sort_key(dm.get_patient_by_id(x)) for x in preview_ids]
+            i = bisect_left(keys, key)
+            preview_ids.insert(i, pid)
+            preview_blocks.insert(i, render_block(pid))
+        refresh_preview_text()
 
     def on_field_toggle(fid, val):
         selected_fields[fid] = val
-        update_export_preview()
+        # Blöcke neu zusammensetzen; formatiert wird nur der Abschnitt des umgeschalteten Feldes
+        preview_blocks[:] = [render_block(pid) for pid in preview_ids]
+        refresh_preview_text()
 
     def copy_to_clipboard(_):
         page.clipboard.set(export_preview.value)
         show_snack_bar(page, "In Zwischenablage kopiert!")
 
-    def print_to_pdf(_):
-        included_patients = [p for p in dm.patients if selected_patients.get(p.id)]
-        sorted_p = dm.sort_patients(included_patients)
-        included_fields = [k for k, v in selected_fields.items() if v]
+    # PDF-Erzeugung läuft in einem Hintergrund-Thread (UI bleibt bedienbar)
+    pdf_progress = ft.ProgressBar(value=0, expand=True)
+    pdf_cancel_event = threading.Event()
+    pdf_status = ft.Row([
+        ft.Text("PDF wird erstellt...", size=12),
+        pdf_progress,
+        ft.TextButton("Abbrechen", on_click=lambda _: pdf_cancel_event.set())
+    ], visible=False, spacing=10)
+
+    def set_pdf_running(running):
+        print_btn.disabled = running
+        station_menu.disabled = running
+        pdf_status.visible = running
+        pdf_progress.value = 0
+        page.update()
+
+    def on_pdf_progress(fraction):
+        # Nur in sichtbaren Schritten (1 %) an den Client senden
+        if fraction - (pdf_progress.value or 0) >= 0.01 or fraction >= 1:
+            pdf_progress.value = fraction
+            try:
+                if pdf_progress.page:
+                    pdf_progress.update()
+            except Exception:
+                pass
+
+    def print_to_pdf(_, mode="single"):
+        """mode: "single" (eine Liste), "stations" (ein Dokument, Abschnitt je Station) oder "station_files"."""
+        sorted_p = [dm.get_patient_by_id(pid) for pid in preview_ids]
+        fields = included_fields()
         
-        filename = f"Patienten_Export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        filename = f"Patienten_Export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if mode != "station_files":
+            filename += ".pdf"
         filepath = get_resource_path(filename)
-        
+
+        pdf_cancel_event.clear()
+        set_pdf_running(True)
+        page.run_thread(build_pdf, sorted_p, fields, filepath, filename, mode)
+
+    def build_pdf(sorted_p, fields, filepath, filename, mode):
         try:
-            create_patient_pdf(sorted_p, included_fields, filepath)
+            # fpdf erst beim ersten PDF-Export laden (verkürzt den Programmstart)
+            from pdf_layout import PdfExportCancelled
+        except Exception as ex:
+            show_snack_bar(page, f"PDF-Export nicht verfügbar: {str(ex)}", is_error=True)
+            set_pdf_running(False)
+            return
+        try:
+            if mode == "station_files":
+                # Dateien je Station nebeneinander ablegen, anschließend den Ordner öffnen
+                directory = os.path.dirname(filepath)
+                paths = create_station_pdfs(sorted_p, fields, directory, prefix=filename, progress=on_pdf_progress, cancel_event=pdf_cancel_event)
+                open_file(directory)
+                show_snack_bar(page, f"{len(paths)} PDFs erstellt: {filename}_*.pdf")
+                return
+            if mode == "stations":
+                create_station_pdf(sorted_p, fields, filepath, progress=on_pdf_progress, cancel_event=pdf_cancel_event)
+            else:
+                create_patient_pdf(sorted_p, fields, filepath, progress=on_pdf_progress, cancel_event=pdf_cancel_event)
             open_file(filepath)
             show_snack_bar(page, f"PDF erstellt: {filename}")
+        except PdfExportCancelled:
+            show_snack_bar(page, "PDF-Export abgebrochen.")
         except Exception as ex:
             show_snack_bar(page, f"Fehler beim PDF-Export: {str(ex)}", is_error=True)
+        finally:
+            set_pdf_running(False)
 
     def show_snack_bar(page, message, is_error=False):
         page.overlay.append(ft.SnackBar(
@@ -99,7 +178,8 @@ def get_export_view(page: ft.Page, dm: DataManager, on_navigate: Callable):
             import subprocess
             cmd = ['open', path] if os.uname().sysname == 'Darwin' else ['xdg-open', path]
             try:
-                subprocess.run(cmd)
+                # Nicht auf den PDF-Viewer warten
+                subprocess.Popen(cmd)
             except:
                 pass
 
@@ -122,6 +202,17 @@ def get_export_view(page: ft.Page, dm: DataManager, on_navigate: Callable):
         ) for key, label in fields_config.items()
     ], wrap=True, spacing=5)
 
+    print_btn = ft.IconButton(ft.Icons.PRINT, icon_size=20, on_click=print_to_pdf, tooltip="Als A4-PDF drucken")
+    station_menu = ft.PopupMenuButton(
+        icon=ft.Icons.LOCAL_HOSPITAL,
+        icon_size=20,
+        tooltip="PDF nach Stationen",
+        items=[
+            ft.PopupMenuItem(content="Nach Stationen (ein Dokument)", on_click=lambda e: print_to_pdf(e, "stations")),
+            ft.PopupMenuItem(content="Eine PDF je Station", on_click=lambda e: print_to_pdf(e, "station_files")),
+        ]
+    )
+
     selection_tile = ft.ExpansionTile(
         title=ft.Text("Patienten & Parameter auswählen", size=13, weight=ft.FontWeight.BOLD),
         expanded=False,
@@ -152,8 +243,10 @@ def get_export_view(page: ft.Page, dm: DataManager, on_navigate: Callable):
             ft.Text("3. Ergebnis (Copy-Paste / Drucken)", size=12, weight=ft.FontWeight.BOLD),
             ft.Row([
                 ft.IconButton(ft.Icons.COPY, icon_size=20, on_click=copy_to_clipboard, tooltip="In Zwischenablage kopieren"),
-                ft.IconButton(ft.Icons.PRINT, icon_size=20, on_click=print_to_pdf, tooltip="Als A4-PDF drucken")
+                print_btn,
+                station_menu
             ], spacing=0)
         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+        pdf_status,
         export_preview
     ], expand=True, horizontal_alignment=ft.CrossAxisAlignment.STRETCH, spacing=10)
@@ -1,12 +1,23 @@
 import flet as ft
 from data_manager import DataManager, Patient
-from typing import Callable
+from typing import Callable, Optional, Set
+from components.keyed_list import KeyedList, update_if_mounted
+from components.search_pipeline import SearchPipeline
+from components.station_groups import StationGroups
+from utils import SUPPORT_BITS
 
-def get_home_view(dm: DataManager, on_navigate: Callable, on_quick_add: Callable, on_edit_uebergabe: Callable, update_sidebar: Callable):
+# Anzahl der Zeilen, die pro Seite gebaut werden (weitere beim Scrollen)
+PAGE_SIZE = 50
+# Wartezeit nach dem letzten Tastendruck, bevor gesucht wird (Sekunden)
+SEARCH_DEBOUNCE = 0.15
+
+def get_home_view(dm: DataManager, on_navigate: Callable, on_quick_add: Callable, on_edit_uebergabe: Callable, update_sidebar: Callable,
+                  expanded_stations: Optional[Set[str]] = None):
     search_field = ft.TextField(
         label="Patient suchen...", 
+        hint_text="z.B. Müller, mero oder antiinfektiva:mero",
         prefix_icon=ft.Icons.SEARCH,
-        on_change=lambda e: update_patient_list(e.control.value),
+        on_change=lambda e: search.submit(e.control.value),
         text_size=13,
         label_style=ft.TextStyle(size=12),
         dense=True
@@ -19,88 +30,167 @@ def get_home_view(dm: DataManager, on_navigate: Callable, on_quick_add: Callable
         style=ft.ButtonStyle(padding=10)
     )
 
-    patient_list_container = ft.Column(scroll=ft.ScrollMode.AUTO, expand=True, spacing=5)
+    # ListView + KeyedList mit page_size: Es werden nur sichtbare Seiten gebaut.
+    # Ohne Suchbegriff nach Stationen gruppiert (eigene Liste, Zeilen erst beim Aufklappen).
+    patient_list_container = ft.ListView(expand=True, spacing=5, visible=False)
+    station_list_container = ft.ListView(expand=True, spacing=5)
 
-    def update_patient_list(query=""):
-        if query:
-            patients = dm.search_patients(query)
-        else:
-            patients = dm.get_active_patients()
-        
-        sorted_patients = dm.sort_patients(patients)
-        
-        rows = []
-        for p in sorted_patients:
-            # Medizinische Tags erstellen
-            medical_tags = []
-            tag_configs = [
-                # Beatmung (Blau)
-                ("invasive_beatmung", "Beatmung", ft.Colors.BLUE_800),
-                ("niv", "NIV", ft.Colors.BLUE_800),
-                ("hfnc", "HFNC", ft.Colors.BLUE_800),
-                # Nierenersatz (Orange)
-                ("crrt", "CRRT", ft.Colors.ORANGE_800),
-                ("ihd", "iHD", ft.Colors.ORANGE_800),
-                # Kreislaufunterstützung mechanisch (Rot)
-                ("ecmo", "ECMO", ft.Colors.RED_800),
-                ("impella", "Impella", ft.Colors.RED_800),
-                # Medikamente (Grün)
-                ("vasopressoren", "Vaso", ft.Colors.GREEN_800),
-                ("inotropika", "Ino", ft.Colors.GREEN_800),
-                ("sedierung", "Sed", ft.Colors.GREEN_800),
-            ]
-            
-            for field, label, color in tag_configs:
-                if getattr(p, field):
-                    medical_tags.append(
-                        ft.Container(
-                            content=ft.Text(label, size=10, color=ft.Colors.WHITE, weight=ft.FontWeight.BOLD),
-                            bgcolor=color,
-                            padding=ft.padding.symmetric(horizontal=5, vertical=2),
-                            border_radius=5
-                        )
+    tag_configs = [
+        # Beatmung (Blau)
+        ("invasive_beatmung", "Beatmung", ft.Colors.BLUE_800),
+        ("niv", "NIV", ft.Colors.BLUE_800),
+        ("hfnc", "HFNC", ft.Colors.BLUE_800),
+        # Nierenersatz (Orange)
+        ("crrt", "CRRT", ft.Colors.ORANGE_800),
+        ("ihd", "iHD", ft.Colors.ORANGE_800),
+        # Kreislaufunterstützung mechanisch (Rot)
+        ("ecmo", "ECMO", ft.Colors.RED_800),
+        ("impella", "Impella", ft.Colors.RED_800),
+        # Medikamente (Grün)
+        ("vasopressoren", "Vaso", ft.Colors.GREEN_800),
+        ("inotropika", "Ino", ft.Colors.GREEN_800),
+        ("sedierung", "Sed", ft.Colors.GREEN_800),
+    ]
+
+    def row_signature(p: Patient):
+        # Alles, was in einer Zeile angezeigt wird – ändert sich nichts davon, bleibt das Control bestehen
+        return (p.name, p.bettplatz, p.hidden, p.support_mask)
+
+    def build_patient_row(p: Patient):
+        # Medizinische Tags erstellen
+        medical_tags = []
+        mask = p.support_mask
+        for field, label, color in tag_configs:
+            if mask & SUPPORT_BITS[field]:
+                medical_tags.append(
+                    ft.Container(
+                        content=ft.Text(label, size=10, color=ft.Colors.WHITE, weight=ft.FontWeight.BOLD),
+                        bgcolor=color,
+                        padding=ft.padding.symmetric(horizontal=5, vertical=2),
+                        border_radius=5
                     )
+                )
+
+        return ft.Container(
+            content=ft.Row([
+                ft.IconButton(
+                    icon=ft.Icons.ADD_CIRCLE_OUTLINE, 
+                    icon_color=ft.Colors.GREEN,
+                    tooltip="Quick Add",
+                    on_click=lambda _, pid=p.id: on_quick_add(pid)
+                ),
+                ft.IconButton(
+                    icon=ft.Icons.EDIT_NOTE, 
+                    icon_color=ft.Colors.BLUE,
+                    tooltip="Übergabe bearbeiten",
+                    on_click=lambda _, pid=p.id: on_edit_uebergabe(pid)
+                ),
+                ft.Column([
+                    ft.Text(f"{p.name} ({p.bettplatz})", size=13, weight=ft.FontWeight.BOLD),
+                    ft.Row(medical_tags, spacing=5, wrap=True) if medical_tags else ft.Container()
+                ], expand=True),
+                ft.IconButton(
+                    icon=ft.Icons.VISIBILITY_OFF if not p.hidden else ft.Icons.VISIBILITY, 
+                    icon_size=18,
+                    tooltip="Hide/Unhide",
+                    on_click=lambda _, pid=p.id: toggle_hide(pid)
+                ),
+            ]),
+            padding=2,
+            border=ft.Border.all(1, ft.Colors.OUTLINE_VARIANT),
+            border_radius=8,
+            on_click=lambda _, pid=p.id: on_navigate("patient", pid),
+            ink=True
+        )
+
+    # Facetten je Unterstützungs-Flag (UND-verknüpft). Filter und Zahlen kommen aus den
+    # Flag-Bitmengen des DataManagers, die bei jeder Änderung eines Flags mitgeführt werden.
+    selected_flags = set()
+    facet_chips = {
+        field: ft.Chip(
+            label=ft.Text(label, size=11),
+            data=label,
+            selected_color=ft.Colors.SECONDARY_CONTAINER,
+            on_select=lambda _, f=field: toggle_facet(f),
+        )
+        for field, label, _ in tag_configs
+    }
+    facet_row = ft.Row(list(facet_chips.values()), spacing=5, wrap=True)
+
+    def update_facets():
+        # Anzahl aktiver Patienten je Flag innerhalb der gewählten Facetten
+        counts = dm.count_support(all_of=selected_flags)
+        for field, chip in facet_chips.items():
+            chip.label.value = f"{chip.data} {counts[field]}"
+            chip.selected = field in selected_flags
+        update_if_mounted(facet_row)
+
+    def toggle_facet(field):
+        selected_flags.symmetric_difference_update({field})
+        update_patient_list(search_field.value)
+
+    # Eine Zeile pro Patienten-ID; nur geänderte Zeilen werden neu gebaut
+    patient_rows = KeyedList(
+        patient_list_container,
+        build=build_patient_row,
+        signature=row_signature,
+        page_size=PAGE_SIZE
+    )
+    station_groups = StationGroups(
+        station_list_container,
+        build=build_patient_row,
+        signature=row_signature,
+        expanded=expanded_stations,
+        page_size=PAGE_SIZE
+    )
+    last_query = [None]
+
+    def show_stations():
+        # Zeilen zeigen nur Name, Bettplatz, Status und Flags -> Übersichtsdaten genügen
+        if selected_flags:
+            groups = {}
+            for p in dm.find_by_support(all_of=selected_flags, summary=True):
+                groups.setdefault(dm.get_bed_key(p.id)[0], []).append(p)
+            station_groups.reconcile(((s, len(ps)) for s, ps in groups.items()), groups.get)
+        else:
+            station_groups.reconcile(dm.get_stations(), lambda s: dm.iter_station_patients(s, summary=True))
+
+    def show_mode(grouped):
+        if station_list_container.visible != grouped:
+            station_list_container.visible = grouped
+            patient_list_container.visible = not grouped
+            update_if_mounted(station_list_container)
+            update_if_mounted(patient_list_container)
+
+    def show_patients(query, patients=None):
+        show_mode(patients is None)
+        if patients is None:
+            show_stations()
+            last_query[0] = None
+            update_facets()
+            return
+        if selected_flags:
+            # Suchtreffer (inkl. Archiv) auf die gewählten Facetten einschränken
+            allowed = dm.support_ids(all_of=selected_flags, include_hidden=True)
+            patients = [p for p in patients if p.id in allowed]
+        # Neue Suchanfrage bzw. Facettenauswahl -> wieder bei der ersten Seite beginnen
+        current = (query, frozenset(selected_flags))
+        patient_rows.reconcile(patients, reset=current != last_query[0])
+        last_query[0] = current
+        update_facets()
+
+    # Suche während der Eingabe: entprellt, veraltete Anfragen werden verworfen
+    search = SearchPipeline(dm, on_results=show_patients, debounce=SEARCH_DEBOUNCE)
+
+    def update_patient_list(query=""):
+        search.cancel()
+        # Treffer kommen bereits nach Bettplatz (bzw. Ähnlichkeit) sortiert
+        show_patients(query, dm.search_patients(query) if query else None)
 
-            c = ft.Container(
-                content=ft.Row([
-                    ft.IconButton(
-                        icon=ft.Icons.ADD_CIRCLE_OUTLINE, 
-                        icon_color=ft.Colors.GREEN,
-                        tooltip="Quick Add",
-                        on_click=lambda _, pid=p.id: on_quick_add(pid)
-                    ),
-                    ft.IconButton(
-                        icon=ft.Icons.EDIT_NOTE, 
-                        icon_color=ft.Colors.BLUE,
-                        tooltip="Übergabe bearbeiten",
-                        on_click=lambda _, pid=p.id: on_edit_uebergabe(pid)
-                    ),
-                    ft.Column([
-                        ft.Text(f"{p.name} ({p.bettplatz})", size=13, weight=ft.FontWeight.BOLD),
-                        ft.Row(medical_tags, spacing=5, wrap=True) if medical_tags else ft.Container()
-                    ], expand=True),
-                    ft.IconButton(
-                        icon=ft.Icons.VISIBILITY_OFF if not p.hidden else ft.Icons.VISIBILITY, 
-                        icon_size=18,
-                        tooltip="Hide/Unhide",
-                        on_click=lambda _, pat=p: toggle_hide(pat)
-                    ),
-                ]),
-                padding=2,
-                border=ft.Border.all(1, ft.Colors.OUTLINE_VARIANT),
-                border_radius=8,
-                on_click=lambda _, pid=p.id: on_navigate("patient", pid),
-                ink=True
-            )
-            rows.append(c)
-        patient_list_container.controls = rows
-        try:
-            if patient_list_container.page:
-                patient_list_container.update()
-        except Exception:
-            pass
-
-    def toggle_hide(patient: Patient):
+    def toggle_hide(patient_id: str):
+        patient = dm.get_patient_by_id(patient_id)
+        if not patient:
+            return
         patient.hidden = not patient.hidden
         dm.update_patient(patient)
         update_sidebar()
@@ -108,11 +198,16 @@ def get_home_view(dm: DataManager, on_navigate: Callable, on_quick_add: Callable
 
     update_patient_list()
     
-    return ft.Column([
+    view = ft.Column([
         ft.Row([
             ft.Text("Patienten Übersicht", size=20, weight=ft.FontWeight.BOLD), 
             export_btn
         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
         search_field,
+        facet_row,
+        station_list_container,
         patient_list_container
     ], expand=True, horizontal_alignment=ft.CrossAxisAlignment.STRETCH, spacing=10)
+    # Aktualisieren von außen (z.B. nach Änderungen anderer Arbeitsplätze); Suche bleibt erhalten
+    view.data = lambda: update_patient_list(search_field.value)
+    return view